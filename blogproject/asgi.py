@@ -12,5 +12,10 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blogproject.settings')
+# Each ASGI request runs its sync code in a fresh thread, so per-thread persistent
+# connections are never reused; pool them instead (see firstblog/backends/pool.py)
+os.environ.setdefault('DATABASE_POOL', 'True')
+# Serve the read-heavy pages from firstblog/async_views.py, which stay on the event loop
+os.environ.setdefault('ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
@@ -140,6 +140,7 @@ TINYMCE_DEFAULT_CONFIG = {
 }
 
 MIDDLEWARE = [
+    'firstblog.profiling.RequestProfilingMiddleware',
     "allauth.account.middleware.AccountMiddleware",
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -152,9 +153,10 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'blogproject.urls'
 
+# DjangoTemplates whose renders are timed by the request profiler (firstblog/profiling.py)
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'firstblog.profiling.ProfiledTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -174,17 +176,39 @@ WSGI_APPLICATION = 'blogproject.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
+# Connections stay open for DATABASE_CONN_MAX_AGE seconds and are checked before
+# reuse. DATABASE_POOL (set by blogproject/asgi.py) swaps in the pooled engines from
+# firstblog/backends, which outlive the per-request threads of an ASGI server.
+DATABASE_POOL = os.environ.get('DATABASE_POOL') == 'True'
+POOLED_DATABASE_ENGINES = {
+    'django.db.backends.mysql': 'firstblog.backends.mysql',
+    'django.db.backends.sqlite3': 'firstblog.backends.sqlite3',
+}
+# Idle connections each pool keeps (firstblog/backends/pool.py)
+DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE', 10))
+
 DATABASES = {
     'default': {
-        'ENGINE': os.environ.get('DATABASE_ENGINE'),
+        'ENGINE': POOLED_DATABASE_ENGINES.get(DATABASE_ENGINE, DATABASE_ENGINE) if DATABASE_POOL else DATABASE_ENGINE,
         'NAME': os.environ.get('DATABASE_NAME'),
         'USER': os.environ.get('DATABASE_USER'),
         'PASSWORD': os.environ.get('DATABASE_PASSWORD'),
         'HOST': os.environ.get('DATABASE_HOST'),
         'PORT': os.environ.get('DATABASE_PORT'),
+        # The pool does the reusing, so Django closes (returns) connections after each request
+        'CONN_MAX_AGE': 0 if DATABASE_POOL else int(os.environ.get('DATABASE_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': os.environ.get('DATABASE_CONN_HEALTH_CHECKS', 'True') == 'True',
     }
 }
 
+# SQLite test databases default to a shared in-memory one that threads cannot
+# write to concurrently; a file lets ConcurrentLikeTests (firstblog/tests.py) run.
+# Only test runs are affected.
+if DATABASE_ENGINE == 'django.db.backends.sqlite3':
+    DATABASES['default']['TEST'] = {
+        'NAME': os.environ.get('DATABASE_TEST_NAME', str(BASE_DIR / 'test_db.sqlite3')),
+    }
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -247,6 +271,58 @@ MEDIA_URL = '/media/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache
+# Local memory by default; point CACHE_BACKEND/CACHE_LOCATION at a shared backend
+# (e.g. django.core.cache.backends.redis.RedisCache) in production so all workers
+# share cached pages. (Pending post views are journaled in the database, not the cache.)
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'firstblog'),
+    }
+}
+
+# Seconds anonymous pages and sidebar/about fragments stay cached (see firstblog/caching.py)
+PAGE_CACHE_TIMEOUT = int(os.environ.get('PAGE_CACHE_TIMEOUT', 300))
+FRAGMENT_CACHE_TIMEOUT = int(os.environ.get('FRAGMENT_CACHE_TIMEOUT', 600))
+
+# Seconds an approximate result count from the cursor paginator is reused (see firstblog/pagination.py)
+APPROXIMATE_COUNT_TIMEOUT = int(os.environ.get('APPROXIMATE_COUNT_TIMEOUT', 300))
+
+# Seconds the first-served time behind a page's Last-Modified header is kept (see firstblog/caching.py)
+CONDITIONAL_GET_TIMEOUT = int(os.environ.get('CONDITIONAL_GET_TIMEOUT', 86400))
+
+# Buffered post view counting (see firstblog/view_counter.py)
+# Views are written to the database, after the response that finds them due, once this many
+# are pending or this many seconds have passed.
+VIEW_COUNT_FLUSH_SIZE = int(os.environ.get('VIEW_COUNT_FLUSH_SIZE', 100))
+VIEW_COUNT_FLUSH_INTERVAL = int(os.environ.get('VIEW_COUNT_FLUSH_INTERVAL', 60))
+
+# Widths (px) of the resized WebP/JPEG copies made of uploaded images (see firstblog/images.py)
+IMAGE_VARIANT_WIDTHS = [int(width) for width in os.environ.get('IMAGE_VARIANT_WIDTHS', '320,640,1024').split(',')]
+
+# Serve home, post, search, category and about pages from async views (see firstblog/async_views.py);
+# blogproject/asgi.py turns this on.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS') == 'True'
+
+# Request profiling (see firstblog/profiling.py)
+# Adds a Server-Timing header and a JSON log line per request; requests slower than
+# REQUEST_PROFILING_SLOW_MS also log their REQUEST_PROFILING_SLOW_QUERIES slowest statements.
+REQUEST_PROFILING = os.environ.get('REQUEST_PROFILING') == 'True'
+REQUEST_PROFILING_SLOW_MS = int(os.environ.get('REQUEST_PROFILING_SLOW_MS', 500))
+REQUEST_PROFILING_SLOW_QUERIES = int(os.environ.get('REQUEST_PROFILING_SLOW_QUERIES', 5))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'firstblog.profiling': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 
 
 
@@ -277,10 +353,13 @@ ACCOUNT_FORMS = {
     'reset_password_from_key': 'firstblog.forms.CustomResetPasswordKeyForm',
 }
 
+# Outside DEBUG mail is queued in the database and delivered by `manage.py send_queued_mail`
+# through QUEUED_EMAIL_BACKEND (see firstblog/mail.py).
 if DEBUG:
     EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 else:
-    EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+    EMAIL_BACKEND = 'firstblog.mail.QueuedEmailBackend'
+    QUEUED_EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
     EMAIL_HOST = os.environ.get('EMAIL_HOST')
     EMAIL_PORT = int(os.environ.get('EMAIL_PORT'))
     EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS') == 'True'
@@ -288,6 +367,8 @@ else:
     EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD')
 
 DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'webmaster@localhost')
+EMAIL_QUEUE_MAX_ATTEMPTS = int(os.environ.get('EMAIL_QUEUE_MAX_ATTEMPTS', 5))
+EMAIL_QUEUE_RETRY_DELAY = int(os.environ.get('EMAIL_QUEUE_RETRY_DELAY', 60))
 CONTACT_FORM_RECIPIENT_EMAIL = os.environ.get('CONTACT_FORM_RECIPIENT_EMAIL')
 
 # Provider specific settings
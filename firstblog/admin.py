@@ -1,6 +1,6 @@
 # admin.py - Add this to your existing admin.py
 # from django.contrib.admin import ModelAdmin
-from .models import BlogPost, PostLike, CustomUser, Comment, CommentLike, Category, UserPostView, AuthorApplication, AuthorProfile
+from .models import BlogPost, PostLike, CustomUser, Comment, CommentLike, Category, UserPostView, AuthorApplication, AuthorProfile, OutboundEmail
 from unfold.admin import ModelAdmin
 from django.utils import timezone
 # IMPORT ALLAUTH MODELS
@@ -19,6 +19,7 @@ from django.contrib.auth.models import Group
 
 class AuthorApplicationAdmin(ModelAdmin):
     list_display = ['user__username', 'user__email', 'status', 'date_applied']
+    list_select_related = ['user']
     list_filter = ['status', 'date_applied']
     list_editable = ['status']
     search_fields = ['name', 'email', 'bio']
@@ -36,6 +37,7 @@ class AuthorApplicationAdmin(ModelAdmin):
 
 class AuthorProfileAdmin(ModelAdmin):
     list_display = ['user', 'user__email', 'bio', 'website']
+    list_select_related = ['user']
     search_fields = ['user__username', 'bio']
     date_hierarchy = 'user__date_joined'
 
@@ -67,8 +69,10 @@ class CustomUserAdmin(BaseUserAdmin, ModelAdmin):
 
 class BlogPostAdmin(ModelAdmin):
     form = AdminBlogPostForm
-    list_display = ['id','title', 'status', 'category', 'author', 'date_created', 'get_comment_count',
+    # Counts are the stored counters (kept by signals and ``recount``), so they sort without a join
+    list_display = ['id','title', 'status', 'category', 'author', 'date_created', 'comment_count',
                     'likes_count', 'view_count']
+    list_select_related = ['author', 'category']
     list_display_links = ['id', 'title', 'category']
     list_filter = ['status', 'date_created', 'author', ('date_created', RangeDateFilter)]
     list_editable = ['status']
@@ -83,18 +87,21 @@ class BlogPostAdmin(ModelAdmin):
 
 class UserPostViewAdmin(ModelAdmin):
     list_display = ['user', 'post', 'viewed_at']
+    list_select_related = ['user', 'post']
     list_filter = ['viewed_at']
     search_fields = ['user__username', 'post__title']
     date_hierarchy = 'viewed_at'
 
 class PostLikeAdmin(ModelAdmin):
     list_display = ['user', 'post', 'date_created']
+    list_select_related = ['user', 'post__author']  # __str__ names the post's author
     list_filter = ['date_created']
-    search_fields = ['user__username', 'post__text']
+    search_fields = ['user__username', 'post__title']
     date_hierarchy = 'date_created'
 
 class CommentAdmin(ModelAdmin):
     list_display = ['get_short_text', 'author', 'post', 'parent', 'date_created', 'likes_count']
+    list_select_related = ['author', 'post', 'parent__author']  # a parent's __str__ names its author
     list_filter = ['date_created', 'author']
     search_fields = ['text', 'author__username', 'post__title']
     date_hierarchy = 'date_created'
@@ -106,6 +113,7 @@ class CommentAdmin(ModelAdmin):
 
 class CommentLikeAdmin(ModelAdmin):
     list_display = ['user', 'comment', 'date_created']
+    list_select_related = ['user', 'comment__author']
     list_filter = ['date_created']
     search_fields = ['user__username', 'comment__text']
     date_hierarchy = 'date_created'
@@ -117,6 +125,7 @@ class CategoryAdmin(ModelAdmin):
 
 class SocialAccountAdmin(ModelAdmin):
     list_display = ['user', 'provider', 'uid', 'last_login']
+    list_select_related = ['user']
     search_fields = ['user__username', 'user__email', 'uid']
     list_filter = ['provider']
     date_hierarchy = 'last_login'
@@ -127,15 +136,23 @@ class SocialAppAdmin(ModelAdmin):
 
 class SocialTokenAdmin(ModelAdmin):
     list_display = ['app', 'account', 'token', 'expires_at']
+    list_select_related = ['app', 'account__user']
     search_fields = ['app__name', 'account__user__username', 'token']
     date_hierarchy = 'expires_at'
 
 class EmailAddressAdmin(ModelAdmin):
     list_display = ['user', 'email', 'verified', 'primary']
+    list_select_related = ['user']
     search_fields = ['user__username', 'email']
     list_filter = ['verified', 'primary']
     # date_hierarchy = 'date_added'
 
+class OutboundEmailAdmin(ModelAdmin):
+    list_display = ['subject', 'to', 'status', 'attempts', 'next_attempt_at', 'date_created', 'date_sent']
+    list_filter = ['status', 'date_created']
+    search_fields = ['subject', 'to']
+    readonly_fields = ['attempts', 'last_error', 'date_created', 'date_sent']
+
 class customGroupAdmin(ModelAdmin):
     list_display = ['name']
     search_fields = ['name']
@@ -160,6 +177,7 @@ custom_admin_site.register(Group, customGroupAdmin)
 custom_admin_site.register(UserPostView, UserPostViewAdmin)
 custom_admin_site.register(AuthorApplication, AuthorApplicationAdmin)
 custom_admin_site.register(AuthorProfile, AuthorProfileAdmin)
+custom_admin_site.register(OutboundEmail, OutboundEmailAdmin)
 
 # Allauth Models
 custom_admin_site.register(SocialApp, SocialAppAdmin)
@@ -0,0 +1,211 @@
+# async_views.py
+"""
+Async versions of the read-heavy pages, for ASGI deployments.
+
+Under ASGI a sync view is handed to a worker thread for the whole request.
+These views stay on the event loop and only leave it for database work:
+queries go through the async ORM (``aget``, ``acount``, ``async for``) and
+the pieces that are only available synchronously (the search ranking,
+the view counter, the comment tree and template rendering) through
+``sync_to_async``. Independent reads, such as the three sidebar fragments,
+are awaited together with ``asyncio.gather``.
+
+Django's async ORM still runs each query on the request's single database
+thread, so gathering overlaps the cache lookups and the hops between the
+loop and that thread rather than the SQL itself; the gain is in not tying
+up a thread per request while it waits.
+
+They render the same templates with the same context as ``views.py``.
+``url.py`` routes to them when ``ASYNC_VIEWS`` is set (the default under
+``blogproject/asgi.py``).
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.db.models import aprefetch_related_objects
+from django.shortcuts import aget_object_or_404, redirect, render
+
+from . import search, site_stats
+from .caching import acached_fragment, cache_public_page, conditional_page
+from .comments import load_comment_tree
+from .models import BlogPost, Category, CustomUser, PostLike
+from .pagination import CursorPaginator, PARAM, apaginate
+from .views import record_cached_view
+
+arender = sync_to_async(render)
+asearch_posts = sync_to_async(search.search_posts)
+
+
+async def alist(queryset):
+    return [obj async for obj in queryset]
+
+
+async def sidebar_categories():
+    return await acached_fragment('sidebar:categories', ['categories'], lambda: alist(Category.objects.all()))
+
+
+async def sidebar_recent():
+    return await acached_fragment('sidebar:recent', ['recent'], lambda: alist(
+        BlogPost.objects.filter(status='published').only('id', 'title').order_by('-date_created')[:5]
+    ))
+
+
+async def sidebar_popular():
+    return await acached_fragment('sidebar:popular', ['popular'], lambda: alist(
+        BlogPost.objects.filter(status='published').only('id', 'title').order_by('-popularity_score')[:5]
+    ))
+
+
+@conditional_page('feed', 'categories', 'recent', 'popular', 'authors')
+@cache_public_page('feed', 'categories', 'recent', 'popular')
+async def home(request):
+    """Display all blog posts with comments and search functionality"""
+    posts_list = BlogPost.objects.filter(status='published').select_related('author').defer(*BlogPost.LISTING_DEFERRED).order_by('-date_updated', '-date_created')
+
+    search_query = request.GET.get('search', '').strip()
+    if search_query:
+        posts_list, search_terms = await asearch_posts(posts_list, search_query)
+        if search_terms:
+            posts_list = posts_list.order_by('-search_rank', '-date_created')
+
+    category_filter = request.GET.get('category', '').strip()
+    if category_filter:
+        posts_list = posts_list.filter(category__name=category_filter)
+
+    posts = await apaginate(request, posts_list, 5)
+    await aprefetch_related_objects(
+        posts.object_list,
+        'comments__author',
+        'comments__replies__author',
+    )
+
+    liked_post_ids = set()
+    if request.user.is_authenticated:
+        liked_post_ids = {post_id async for post_id in PostLike.objects.filter(
+            user=request.user, post__in=posts.object_list
+        ).values_list('post_id', flat=True)}
+    liked_by_user = {str(post.pk): post.pk in liked_post_ids for post in posts.object_list}
+
+    categories, recent_posts, popular_posts = await asyncio.gather(sidebar_categories(), sidebar_recent(), sidebar_popular())
+
+    context = {
+        'posts': posts,
+        'categories': categories,
+        'recent_posts': recent_posts,
+        'popular_posts': popular_posts,
+        'search_query': search_query,
+        'category_filter': category_filter,
+        'liked_by_user': liked_by_user,
+    }
+    return await arender(request, 'main/index.html', context)
+
+
+@conditional_page('post:{pk}', 'recent', 'authors', on_hit=record_cached_view)
+@cache_public_page('post:{pk}', on_hit=record_cached_view)
+async def post_detail(request, pk):
+    """Display a single blog post with all its comments"""
+    post = await aget_object_or_404(BlogPost.objects.select_related('author'), pk=pk)
+    user = request.user
+
+    if (post.status == 'draft' and post.author_id != user.pk and not user.is_staff) or \
+       (post.status == 'archived' and not (post.author_id == user.pk or user.is_superuser)):
+        messages.error(request, "You do not have permission to view this post.")
+        return redirect('home')
+
+    await sync_to_async(post.increment_view_count)(user)
+
+    async def liked():
+        return user.is_authenticated and await post.post_likes.filter(user=user).aexists()
+
+    comments, related_posts, liked_by_user = await asyncio.gather(
+        sync_to_async(load_comment_tree)(post, user),
+        alist(BlogPost.objects.filter(author_id=post.author_id).exclude(pk=post.pk).order_by('-date_created')[:3]),
+        liked(),
+    )
+
+    context = {
+        'post': post,
+        'comments': comments,
+        'related_posts': related_posts,
+        'liked_by_user': liked_by_user,
+    }
+    return await arender(request, 'main/post_detail.html', context)
+
+
+async def search_posts(request):
+    """Dedicated search page with advanced filtering"""
+    search_query = request.GET.get('q', '').strip()
+    category_filter = request.GET.get('category', '')
+    author_filter = request.GET.get('author', '')
+    sort_by = request.GET.get('sort', 'relevance' if search_query else '-date_created')
+
+    posts_list = BlogPost.objects.filter(status='published').select_related('author', 'search_document').defer(*BlogPost.LISTING_DEFERRED)
+
+    search_terms = []
+    if search_query:
+        posts_list, search_terms = await asearch_posts(posts_list, search_query)
+
+    if category_filter:
+        posts_list = posts_list.filter(category__name=category_filter)
+
+    if author_filter:
+        posts_list = posts_list.filter(author__username=author_filter)
+
+    valid_sorts = ['-date_created', 'date_created', '-date_updated', 'title', '-title']
+    if sort_by == 'relevance' and search_terms:
+        posts_list = posts_list.order_by('-search_rank', '-date_created')
+    elif sort_by in valid_sorts:
+        posts_list = posts_list.order_by(sort_by)
+    else:
+        posts_list = posts_list.order_by('-date_created')
+
+    paginator = CursorPaginator(posts_list, 10)
+    posts, total_results, categories, authors = await asyncio.gather(
+        paginator.aget_page(request.GET.get(PARAM), request),
+        paginator.aapproximate_count(),
+        alist(Category.objects.all()),
+        alist(CustomUser.objects.filter(blogpost__isnull=False).distinct()),
+    )
+
+    for post in posts:
+        document = getattr(post, 'search_document', None) if search_terms else None
+        post.search_snippet = search.highlight(document.text, search_terms) if document else ''
+
+    context = {
+        'posts': posts,
+        'categories': categories,
+        'authors': authors,
+        'search_query': search_query,
+        'category_filter': category_filter,
+        'author_filter': author_filter,
+        'sort_by': sort_by,
+        'total_results': total_results,
+    }
+    return await arender(request, 'main/search.html', context)
+
+
+@conditional_page('feed', 'categories', 'authors')
+@cache_public_page('feed', 'categories')
+async def category_posts(request, category_name):
+    """Display all posts in a specific category"""
+    category = await aget_object_or_404(Category, name=category_name)
+
+    posts_list = BlogPost.objects.filter(
+        category=category, status='published'
+    ).select_related('author').defer(*BlogPost.LISTING_DEFERRED).order_by('-date_created')
+
+    posts = await apaginate(request, posts_list, 10)
+
+    context = {
+        'category': category,
+        'posts': posts,
+    }
+    return await arender(request, 'main/category_posts.html', context)
+
+
+@cache_public_page('totals')
+async def about(request):
+    """Display about page"""
+    context = await acached_fragment('about:totals', ['totals'], site_stats.asite_totals)
+    return await arender(request, 'main/about.html', context)
@@ -0,0 +1,84 @@
+# author_stats.py
+"""
+Per-author statistics for the profile page.
+
+``author_stats`` reads everything the profile shows about an author's
+output in two aggregate queries: one over the author's posts grouped by
+category and status (post, like and view totals plus the category
+ranking fall out of it in Python) and one counting the comments on those
+posts. Readers who have not written anything get their suggested topics
+(categories of posts they liked or commented on) in one more query.
+
+The result is cached per author in the ``feed`` and ``categories`` groups,
+which every post, comment and like change already bumps (see
+``caching.py``), and in the author's ``author:{username}`` group, which
+the view counter bumps when it writes a batch of views.
+"""
+from collections import defaultdict
+
+from django.db.models import Count, Q, Sum
+
+from .caching import cached_fragment
+from .models import BlogPost, Category, Comment, PostLike
+
+TOP_CATEGORIES = 5
+
+
+class AuthorStats:
+    def __init__(self, published_posts, visible_posts, comments, likes, views, categories, suggested_topics):
+        self.published_posts = published_posts
+        self.visible_posts = visible_posts  # everything but archived posts, as the owner sees them
+        self.comments = comments
+        self.likes = likes
+        self.views = views
+        self.categories = categories  # (id, name, published posts), most posts first
+        self.suggested_topics = suggested_topics
+
+    @property
+    def top_categories(self):
+        return [category for category in self.categories if category[2]][:TOP_CATEGORIES]
+
+    @property
+    def category_ids(self):
+        return [pk for pk, _, _ in self.categories]
+
+
+def compute_author_stats(author_id, is_author):
+    rows = BlogPost.objects.filter(author_id=author_id).order_by().values('category_id', 'category__name', 'status').annotate(
+        posts=Count('pk'), likes=Sum('likes_count'), views=Sum('view_count'),
+    )
+    published = visible = likes = views = 0
+    by_category = defaultdict(int)
+    names = {}
+    for row in rows:
+        if row['status'] != 'archived':
+            visible += row['posts']
+        if row['status'] == 'published':
+            published += row['posts']
+            likes += row['likes'] or 0
+            views += row['views'] or 0
+        if row['category_id'] is not None:
+            names[row['category_id']] = row['category__name']
+            by_category[row['category_id']] += row['posts'] if row['status'] == 'published' else 0
+    categories = sorted(((pk, names[pk], count) for pk, count in by_category.items()), key=lambda item: (-item[2], item[1]))
+
+    comments = Comment.objects.filter(post__author_id=author_id).count()
+
+    suggested_topics = None
+    if not is_author:
+        engaged = BlogPost.objects.filter(
+            Q(pk__in=PostLike.objects.filter(user_id=author_id).values('post_id')) |
+            Q(pk__in=Comment.objects.filter(author_id=author_id).values('post_id'))
+        )
+        suggested_topics = list(Category.objects.filter(pk__in=engaged.values('category_id')).order_by('name'))
+
+    return AuthorStats(published, visible, comments, likes, views, categories, suggested_topics)
+
+
+def author_stats(author):
+    """Cached ``AuthorStats`` for ``author``"""
+    is_author = author.is_author
+    return cached_fragment(
+        f'author-stats:{author.pk}:{int(is_author)}', ['feed', 'categories', f'author:{author.username}'],
+        lambda: compute_author_stats(author.pk, is_author),
+    )
@@ -0,0 +1,8 @@
+"""
+Database engines that reuse connections through a process-wide pool.
+
+``firstblog.backends.mysql`` and ``firstblog.backends.sqlite3`` are the
+stock Django engines with ``PooledConnectionMixin`` (see ``pool.py``)
+mixed in. ``settings.py`` selects them when ``DATABASE_POOL`` is set, as
+``blogproject/asgi.py`` does.
+"""
@@ -0,0 +1,79 @@
+# pool.py
+"""
+Connection pooling for the stock database backends.
+
+Django keeps a persistent connection per thread (``CONN_MAX_AGE``). That
+works for WSGI worker threads, which serve request after request. Under
+ASGI, every request's sync code runs in a thread of its own, so a
+persistent connection is never seen again and a new one is opened for
+each request. With the mixin, closing a connection at the end of a
+request hands the raw driver connection to a pool shared by all threads.
+The next ``connect()`` takes it back, after a ``SELECT 1`` when
+``CONN_HEALTH_CHECKS`` is on. Open transactions are rolled back on the way
+in.
+
+The ``DATABASE_POOL_SIZE`` setting caps how many idle connections are
+kept; extra ones are closed. Pools are created lazily, so each worker
+process gets its own.
+"""
+import queue
+import threading
+from contextlib import closing
+
+from django.conf import settings
+
+
+class PooledConnectionMixin:
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    # True when the current connection came out of the pool rather than the driver
+    pool_reused = False
+
+    def connection_pool(self):
+        key = (self.alias, self.settings_dict['NAME'])  # the test runner renames NAME
+        with self._pools_lock:
+            if key not in self._pools:
+                self._pools[key] = queue.LifoQueue(maxsize=getattr(settings, 'DATABASE_POOL_SIZE', 10))
+            return self._pools[key]
+
+    def get_new_connection(self, conn_params):
+        pool = self.connection_pool()
+        while True:
+            try:
+                connection = pool.get_nowait()
+            except queue.Empty:
+                self.pool_reused = False
+                return super().get_new_connection(conn_params)
+            if not self.settings_dict['CONN_HEALTH_CHECKS'] or self.pooled_connection_usable(connection):
+                self.pool_reused = True
+                return connection
+            self.discard_connection(connection)
+
+    def _close(self):
+        connection = self.connection
+        if connection is None:
+            return
+        try:
+            connection.rollback()
+            self.connection_pool().put_nowait(connection)
+        except queue.Full:
+            super()._close()
+        except Exception:
+            self.discard_connection(connection)
+
+    @staticmethod
+    def pooled_connection_usable(connection):
+        try:
+            with closing(connection.cursor()) as cursor:
+                cursor.execute('SELECT 1')
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def discard_connection(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
@@ -0,0 +1,232 @@
+# benchmarks.py
+"""
+Query-count and latency benchmarks for every firstblog URL.
+
+``run_view_benchmarks`` seeds the database at each requested scale with
+``create_sample_posts``, drives every route in ``firstblog/url.py`` through
+the test client and records, per view and scale, the number of queries, the
+total SQL time and the p50/p95 response time. A view whose query count at a
+larger scale exceeds its count at the smallest scale is reported as a
+failure: its cost grows with the data instead of the page size.
+
+``run_index_benchmark`` times the main query patterns (with their EXPLAIN
+plans) on a seeded dataset, optionally first with the composite indexes
+from migration ``0024_query_pattern_indexes`` dropped. Other indexes are
+left alone.
+
+The caller is responsible for running against a disposable database (the
+benchmark commands create a test database; tests use their own).
+"""
+import json
+import statistics
+import time
+from contextlib import contextmanager
+from importlib import import_module
+from io import StringIO
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.operations import AddIndex
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import AuthorProfile, BlogPost, Category, Comment, CustomUser, UserPostView
+
+INDEX_MIGRATION = 'firstblog.migrations.0024_query_pattern_indexes'
+
+
+def seed(scale, seed=1):
+    """Load a dataset of ``scale`` posts with proportional users, comments, likes and views"""
+    call_command(
+        'create_sample_posts', users=max(10, scale // 2), posts=scale, comments=scale * 5, likes=scale * 5,
+        views=scale * 20, seed=seed, stdout=StringIO(),
+    )
+
+
+def actors():
+    """Users and objects the scenarios act on; the busiest ones so N+1 patterns show up"""
+    staff, _ = CustomUser.objects.get_or_create(
+        email='bench-staff@example.com', defaults={'username': 'bench-staff', 'is_staff': True}
+    )
+    AuthorProfile.objects.get_or_create(user=staff)
+    reader, _ = CustomUser.objects.get_or_create(email='bench-reader@example.com', defaults={'username': 'bench-reader'})
+
+    published = BlogPost.objects.filter(status='published')
+    post = published.order_by('-comment_count', 'pk').first()
+    author = CustomUser.objects.filter(pk=post.author_id).first()
+    category = Category.objects.annotate(total=Count('posts')).order_by('-total', 'pk').first()
+    comment = Comment.objects.filter(post=post, parent=None).order_by('pk').first()
+    archive = published.filter(author=author).exclude(pk=post.pk).values_list('pk', flat=True)[:3]
+    BlogPost.objects.filter(pk__in=list(archive)).update(status='archived')
+    return {
+        'staff': staff, 'reader': reader, 'author': author, 'post': post, 'category': category, 'comment': comment,
+        'search': post.title.split()[0],
+    }
+
+
+def scenarios(a):
+    """(name, user, method, url, data) for every route in firstblog/url.py"""
+    def fresh_comment():
+        return reverse('delete_comment', args=[Comment.objects.create(post=a['post'], author=a['reader'], text='Temporary').pk])
+
+    return [
+        ('signup', None, 'get', reverse('signup'), None),
+        ('login', None, 'get', reverse('login'), None),
+        ('logout', 'reader', 'get', reverse('logout'), None),
+        ('home', None, 'get', reverse('home'), None),
+        ('home (logged in)', 'reader', 'get', reverse('home'), None),
+        ('home search', None, 'get', reverse('home'), {'search': a['search']}),
+        ('post_detail', None, 'get', reverse('post_detail', args=[a['post'].pk]), None),
+        ('post_detail (logged in)', 'reader', 'get', reverse('post_detail', args=[a['post'].pk]), None),
+        ('create_post', 'staff', 'get', reverse('create_post'), None),
+        ('update_post', a['author'], 'get', reverse('update_post', args=[a['post'].pk]), None),
+        ('delete_post', a['author'], 'get', reverse('delete_post', args=[a['post'].pk]), None),
+        ('toggle_post_like', 'reader', 'post', reverse('toggle_post_like', args=[a['post'].pk]), None),
+        ('search_posts', None, 'get', reverse('search_posts'), {'q': a['search']}),
+        ('category_posts', None, 'get', reverse('category_posts', args=[a['category'].name]), None),
+        ('author_profile', 'reader', 'get', reverse('author_profile', args=[a['author'].username]), None),
+        ('author_profile (owner)', a['author'], 'get', reverse('author_profile', args=[a['author'].username]), None),
+        ('archived_posts', 'staff', 'get', reverse('archived_posts'), None),
+        ('add_comment_to_post', 'reader', 'post', reverse('add_comment_to_post', args=[a['post'].pk]), {'comment_text': 'Benchmark'}),
+        ('add_reply_to_comment', 'reader', 'post', reverse('add_reply_to_comment', args=[a['comment'].pk]), {'reply_text': 'Benchmark'}),
+        ('delete_comment', 'reader', 'post', fresh_comment, None),
+        ('toggle_comment_like', 'reader', 'post', reverse('toggle_comment_like', args=[a['comment'].pk]), None),
+        ('batch_likes', 'reader', 'post', reverse('batch_likes'), json.dumps({'operations': [
+            {'type': 'post', 'id': a['post'].pk, 'liked': True}, {'type': 'comment', 'id': a['comment'].pk, 'liked': True},
+        ]})),
+        ('user_dashboard', 'reader', 'get', reverse('user_dashboard'), None),
+        ('user_dashboard (author)', a['author'], 'get', reverse('user_dashboard'), None),
+        ('about', None, 'get', reverse('about'), None),
+        ('contact', None, 'get', reverse('contact'), None),
+        ('author_application', 'reader', 'get', reverse('author_application'), None),
+        ('view_comments', None, 'get', reverse('view_comments', args=[a['post'].pk]), None),
+    ]
+
+
+def measure(a, repeat):
+    """Run every scenario ``repeat`` times with a cold cache and summarise the last run's queries"""
+    results = {}
+    for name, user, method, url, data in scenarios(a):
+        client = Client()
+        if user is not None:
+            client.force_login(a[user] if isinstance(user, str) else user)
+
+        timings = []
+        for _ in range(repeat):
+            target = url() if callable(url) else url
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                if isinstance(data, str):
+                    response = getattr(client, method)(target, data, content_type='application/json')
+                else:
+                    response = getattr(client, method)(target, data or {})
+                timings.append((time.perf_counter() - start) * 1000)
+
+        timings.sort()
+        results[name] = {
+            'status': response.status_code,
+            'queries': len(queries),
+            'sql_ms': round(sum(float(query['time']) for query in queries.captured_queries) * 1000, 3),
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        }
+    return results
+
+
+def run_view_benchmarks(scales, repeat=5, reset=None):
+    """Seed each scale in turn and measure every view.
+
+    ``reset`` is called before seeding each scale after the first (for example
+    to flush the database); without it data accumulates between scales.
+    """
+    report = {'scales': list(scales), 'repeat': repeat, 'views': {}, 'failures': []}
+    for index, scale in enumerate(scales):
+        if index and reset:
+            reset()
+        seed(scale)
+        for name, result in measure(actors(), repeat).items():
+            report['views'].setdefault(name, {})[str(scale)] = result
+
+    smallest = str(scales[0])
+    for name, by_scale in report['views'].items():
+        baseline = by_scale[smallest]['queries']
+        for scale, result in by_scale.items():
+            if result['queries'] > baseline:
+                report['failures'].append(
+                    f"{name}: {result['queries']} queries at scale {scale} vs {baseline} at scale {smallest}"
+                )
+    return report
+
+
+def index_queries():
+    """Query pattern name -> queryset builder, aimed at the busiest post and viewer"""
+    post = BlogPost.objects.order_by('-comment_count').first()
+    viewer = UserPostView.objects.values_list('user', flat=True).first()
+    if post is None:
+        return {}
+    return {
+        'home feed': lambda: BlogPost.objects.filter(status='published').order_by('-date_updated', '-date_created')[:5],
+        'recent posts': lambda: BlogPost.objects.filter(status='published').order_by('-date_created')[:5],
+        'popular posts': lambda: BlogPost.objects.filter(status='published').order_by('-popularity_score')[:5],
+        'category page': lambda: BlogPost.objects.filter(category_id=post.category_id, status='published').order_by('-date_created')[:10],
+        'author posts': lambda: BlogPost.objects.filter(author_id=post.author_id, status='published').order_by('-date_created')[:10],
+        'admin by views': lambda: BlogPost.objects.order_by('-view_count', '-date_created')[:100],
+        'top-level comments': lambda: Comment.objects.filter(post=post, parent=None).order_by('date_created'),
+        'recently viewed': lambda: UserPostView.objects.filter(user_id=viewer).order_by('-viewed_at')[:5],
+    }
+
+
+def time_queries(queries, repeat, explain=True):
+    """``{name: {'median_ms', 'max_ms', 'plan'}}`` over ``repeat`` runs of each query"""
+    results = {}
+    for name, build in queries.items():
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            list(build())
+            timings.append((time.perf_counter() - start) * 1000)
+        results[name] = {
+            'median_ms': round(statistics.median(timings), 3),
+            'max_ms': round(max(timings), 3),
+            'plan': build().explain() if explain else None,
+        }
+    return results
+
+
+def composite_indexes():
+    """``(model, index)`` for every index added by ``INDEX_MIGRATION``"""
+    for operation in import_module(INDEX_MIGRATION).Migration.operations:
+        if isinstance(operation, AddIndex):
+            yield apps.get_model('firstblog', operation.model_name), operation.index
+
+
+@contextmanager
+def indexes_dropped():
+    """Drop the ``INDEX_MIGRATION`` indexes inside the block and recreate them after"""
+    indexes = list(composite_indexes())
+    with connection.schema_editor() as editor:
+        for model, index in indexes:
+            editor.remove_index(model, index)
+    try:
+        yield
+    finally:
+        with connection.schema_editor() as editor:
+            for model, index in indexes:
+                editor.add_index(model, index)
+
+
+def run_index_benchmark(scale, repeat=20, compare=False, explain=True):
+    """Seed ``scale`` posts and time the query patterns, without and then with the composite indexes if ``compare``"""
+    seed(scale)
+    queries = index_queries()
+    report = {'scale': scale, 'repeat': repeat, 'indexes': [index.name for _, index in composite_indexes()]}
+    if compare:
+        with indexes_dropped():
+            report['without'] = time_queries(queries, repeat, explain)
+    report['with'] = time_queries(queries, repeat, explain)
+    return report
@@ -0,0 +1,254 @@
+# caching.py
+"""
+Caching for public pages and expensive fragments.
+
+Cache keys carry the version of every group they depend on (``feed``,
+``categories``, ``post:<pk>`` ...). Content changes bump only the groups
+they affect (see ``signals.py``), so stale entries are never read again and
+simply expire. Versions start from a timestamp so an evicted version key can
+never bring an old entry back to life.
+
+The ``a``-prefixed helpers and ``cache_public_page`` on an ``async def``
+view do the same through the cache's async API (see ``async_views.py``).
+
+``conditional_page`` uses the same versions as HTTP validators: the ETag
+hashes the page's group versions with the viewer (and their CSRF secret,
+which the page embeds), and Last-Modified is when that ETag was first
+served. A revalidation with a matching ``If-None-Match`` or
+``If-Modified-Since`` gets ``304 Not Modified`` after one cache lookup,
+before the view runs a query or renders a template.
+"""
+import hashlib
+import time
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+KEY_PREFIX = 'firstblog'
+
+
+def page_timeout():
+    return getattr(settings, 'PAGE_CACHE_TIMEOUT', 300)
+
+
+def fragment_timeout():
+    return getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 600)
+
+
+def validator_timeout():
+    return getattr(settings, 'CONDITIONAL_GET_TIMEOUT', 86400)
+
+
+def _version_key(group):
+    return f'{KEY_PREFIX}:version:{group}'
+
+
+def get_versions(*groups):
+    """Current version of each group, creating missing ones"""
+    keys = {group: _version_key(group) for group in groups}
+    found = cache.get_many(keys.values())
+    versions = []
+    for group, key in keys.items():
+        version = found.get(key)
+        if version is None:
+            cache.add(key, time.time_ns(), timeout=None)
+            version = cache.get(key)
+        versions.append(str(version))
+    return versions
+
+
+async def aget_versions(*groups):
+    keys = {group: _version_key(group) for group in groups}
+    found = await cache.aget_many(keys.values())
+    versions = []
+    for group, key in keys.items():
+        version = found.get(key)
+        if version is None:
+            await cache.aadd(key, time.time_ns(), timeout=None)
+            version = await cache.aget(key)
+        versions.append(str(version))
+    return versions
+
+
+def invalidate(*groups):
+    """Bump the version of each group so every key built from it changes"""
+    for group in groups:
+        try:
+            cache.incr(_version_key(group))
+        except ValueError:
+            cache.set(_version_key(group), time.time_ns(), timeout=None)
+
+
+def make_key(name, groups):
+    return ':'.join([KEY_PREFIX, name, *get_versions(*groups)])
+
+
+def cached_fragment(name, groups, builder, timeout=None):
+    """Return the cached value for ``name`` or build and store it"""
+    key = make_key(name, groups)
+    value = cache.get(key)
+    if value is None:
+        value = builder()
+        cache.set(key, value, timeout or fragment_timeout())
+    return value
+
+
+async def amake_key(name, groups):
+    return ':'.join([KEY_PREFIX, name, *await aget_versions(*groups)])
+
+
+async def acached_fragment(name, groups, builder, timeout=None):
+    """``cached_fragment`` for async code; ``builder`` is a coroutine function"""
+    key = await amake_key(name, groups)
+    value = await cache.aget(key)
+    if value is None:
+        value = await builder()
+        await cache.aset(key, value, timeout or fragment_timeout())
+    return value
+
+
+def _shareable(request, response):
+    # get_token() flags the request when the page used the visitor's CSRF token
+    return response.status_code == 200 and not response.streaming and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+
+
+def cache_public_page(*groups, on_hit=None):
+    """Cache a view's full response for anonymous GET requests.
+
+    ``groups`` may contain ``str.format`` placeholders filled from the view's
+    URL kwargs, e.g. ``'post:{pk}'``. ``on_hit(request, **kwargs)`` runs when
+    a cached response is served, for side effects such as view counting.
+    Responses that embed a CSRF token are not stored, since the token is
+    paired with the first visitor's cookie.
+    """
+    def decorator(view_func):
+        def page_key(request, kwargs):
+            path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            return f'page:{view_func.__name__}:{path}', [group.format(**kwargs) for group in groups]
+
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                # auser() loads the session, so the messages check below stays off the database
+                request.user = await request.auser()
+                if request.method not in ('GET', 'HEAD') or request.user.is_authenticated or len(get_messages(request)):
+                    return await view_func(request, *args, **kwargs)
+
+                key = await amake_key(*page_key(request, kwargs))
+                response = await cache.aget(key)
+                if response is not None:
+                    if on_hit:
+                        await sync_to_async(on_hit)(request, *args, **kwargs)
+                    return response
+
+                response = await view_func(request, *args, **kwargs)
+                if _shareable(request, response):
+                    await cache.aset(key, response, page_timeout())
+                return response
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or request.user.is_authenticated or len(get_messages(request)):
+                return view_func(request, *args, **kwargs)
+
+            key = make_key(*page_key(request, kwargs))
+            response = cache.get(key)
+            if response is not None:
+                if on_hit:
+                    on_hit(request, *args, **kwargs)
+                return response
+
+            response = view_func(request, *args, **kwargs)
+            if _shareable(request, response):
+                cache.set(key, response, page_timeout())
+            return response
+        return wrapper
+    return decorator
+
+
+def _etag(request, name, versions):
+    viewer = 'anonymous'
+    if request.user.is_authenticated:
+        get_token(request)  # makes sure the secret the page will embed is settled now
+        viewer = f"{request.user.pk}:{request.META['CSRF_COOKIE']}"
+    digest = hashlib.md5(':'.join([name, request.get_full_path(), viewer, *versions]).encode()).hexdigest()
+    return f'W/{quote_etag(digest)}'
+
+
+def _validators(etag):
+    """``etag`` and the time it was first served, recorded the first time it is seen"""
+    key = f'{KEY_PREFIX}:modified:{etag}'
+    cache.add(key, int(time.time()), validator_timeout())
+    return etag, cache.get(key)
+
+
+async def _avalidators(etag):
+    key = f'{KEY_PREFIX}:modified:{etag}'
+    await cache.aadd(key, int(time.time()), validator_timeout())
+    return etag, await cache.aget(key)
+
+
+def _not_modified(request, etag, last_modified):
+    if len(get_messages(request)):
+        return None
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    return response if response is not None and response.status_code == 304 else None
+
+
+def _add_validators(request, response, etag, last_modified):
+    if response.status_code == 200 and not response.has_header('ETag'):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        # Revalidate on every use; pages for signed-in users must not be shared
+        patch_cache_control(response, no_cache=True, **({'private': True} if request.user.is_authenticated else {}))
+    return response
+
+
+def conditional_page(*groups, on_hit=None):
+    """Answer conditional GETs for a view with ``304 Not Modified`` until its groups change.
+
+    ``groups`` and ``on_hit`` work as in ``cache_public_page``; ``on_hit``
+    also runs when a 304 is sent. Anonymous and signed-in viewers get
+    separate validators, so per-user state such as likes is covered by the
+    groups those changes bump.
+    """
+    def decorator(view_func):
+        def page_groups(kwargs):
+            return [group.format(**kwargs) for group in groups]
+
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD'):
+                    return await view_func(request, *args, **kwargs)
+                request.user = await request.auser()
+                etag, last_modified = await _avalidators(_etag(request, view_func.__name__, await aget_versions(*page_groups(kwargs))))
+                response = _not_modified(request, etag, last_modified)
+                if response is not None:
+                    if on_hit:
+                        await sync_to_async(on_hit)(request, *args, **kwargs)
+                    return response
+                return _add_validators(request, await view_func(request, *args, **kwargs), etag, last_modified)
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view_func(request, *args, **kwargs)
+            etag, last_modified = _validators(_etag(request, view_func.__name__, get_versions(*page_groups(kwargs))))
+            response = _not_modified(request, etag, last_modified)
+            if response is not None:
+                if on_hit:
+                    on_hit(request, *args, **kwargs)
+                return response
+            return _add_validators(request, view_func(request, *args, **kwargs), etag, last_modified)
+        return wrapper
+    return decorator
@@ -0,0 +1,83 @@
+# comments.py
+"""
+Threaded comments for the post page.
+
+``load_comment_tree`` reads every comment on a post in one query (authors
+joined in, like counts already stored on the row) and the viewer's liked
+comment ids in a second, then links the rows into a tree in Python. Each
+comment gets ``reply_list`` (its direct replies, oldest first) and
+``liked``, so templates can render threads of any depth without touching
+the database again.
+
+Threads are stored as materialized paths: every comment records the ids
+of its ancestors, root first, in ``path``. A new reply copies its parent's
+path and appends the parent's id, so posting it is one ``INSERT`` however
+busy the thread. A subtree, and its size, is one range scan on the
+``path`` index, and since paths never change ``Comment.delete`` removes
+the whole range without locking anything. Replies nested deeper than
+``Comment.MAX_DEPTH`` are attached to their parent's parent. Rows written
+with ``bulk_create`` skip this and are placed by ``rebuild_paths``.
+"""
+from collections import Counter
+
+from .models import Comment, CommentLike
+
+
+def liked_comment_ids(post, user):
+    """Ids of the comments on ``post`` that ``user`` has liked"""
+    if not user.is_authenticated:
+        return set()
+    return set(CommentLike.objects.filter(user=user, comment__post=post).values_list('comment_id', flat=True))
+
+
+def load_comment_tree(post, user):
+    """Top-level comments on ``post``, newest first, with replies attached to any depth"""
+    comments = list(Comment.objects.filter(post=post).select_related('author').order_by('date_created', 'pk'))
+    liked = liked_comment_ids(post, user) if comments else set()
+
+    # Each comment is below every ancestor in its path
+    descendants = Counter(
+        comment.path[start:start + Comment.PATH_SEGMENT]
+        for comment in comments for start in range(0, len(comment.path), Comment.PATH_SEGMENT)
+    )
+    by_id = {}
+    for comment in comments:
+        comment.reply_list = []
+        comment.liked = comment.pk in liked
+        comment._descendant_count = descendants[Comment.path_segment(comment.pk)]
+        by_id[comment.pk] = comment
+
+    roots = []
+    for comment in comments:
+        if comment.parent_id is None:
+            roots.append(comment)
+        elif comment.parent_id in by_id:
+            by_id[comment.parent_id].reply_list.append(comment)
+    roots.reverse()
+    return roots
+
+
+def comment_paths(rows):
+    """Map comment id -> (parent id, path) for ``(id, parent_id)`` rows, parents before replies"""
+    paths = {}
+    for pk, parent_id in rows:
+        if parent_id is None or parent_id not in paths:
+            paths[pk] = (parent_id, '')
+            continue
+        grandparent_id, parent_path = paths[parent_id]
+        if len(parent_path) // Comment.PATH_SEGMENT >= Comment.MAX_DEPTH:
+            paths[pk] = (grandparent_id, parent_path)
+        else:
+            paths[pk] = (parent_id, parent_path + Comment.path_segment(parent_id))
+    return paths
+
+
+def rebuild_paths(comments=None, batch_size=1000):
+    """Recompute paths for ``comments`` (all comments when None), which must hold whole threads"""
+    comments = Comment.objects.all() if comments is None else comments
+    paths = comment_paths(comments.order_by('pk').values_list('pk', 'parent_id'))
+    Comment.objects.bulk_update(
+        [Comment(pk=pk, parent_id=parent_id, path=path) for pk, (parent_id, path) in paths.items()],
+        ['parent', 'path'], batch_size=batch_size,
+    )
+    return len(paths)
@@ -1,6 +1,7 @@
 from django.contrib.auth.forms import UserCreationForm, PasswordChangeForm
 from django import forms
 from .models import BlogPost, CustomUser, Comment
+from .rendering import html_to_text, sanitize_html
 from django.core.validators import FileExtensionValidator
 from tinymce.widgets import TinyMCE  # Import TinyMCE widget
 
@@ -98,12 +99,8 @@ class BlogPostForm(forms.ModelForm):
         """Clean and validate post content"""
         post = self.cleaned_data.get('post')
         if post:
-            # Remove HTML tags for character count validation
-            import re
-            text_content = re.sub('<[^<]+?>', '', post)
-            text_content = '\n\n'.join([' '.join(p.split()) for p in text_content.split('\n\n')])
-            
-            if len(text_content) < 50:
+            # Count only the visible text: render_post stores this as BlogPost.plain_text
+            if len(html_to_text(sanitize_html(post))) < 50:
                 raise forms.ValidationError('Post content must be at least 50 characters long.')
         return post
 
@@ -147,12 +144,8 @@ class AdminBlogPostForm(forms.ModelForm):
         """Clean and validate post content"""
         post = self.cleaned_data.get('post')
         if post:
-            # Remove HTML tags for character count validation
-            import re
-            text_content = re.sub('<[^<]+?>', '', post)
-            text_content = '\n\n'.join([' '.join(p.split()) for p in text_content.split('\n\n')])
-            
-            if len(text_content) < 50:
+            # Count only the visible text: render_post stores this as BlogPost.plain_text
+            if len(html_to_text(sanitize_html(post))) < 50:
                 raise forms.ValidationError('Post content must be at least 50 characters long.')
         return post
 
@@ -0,0 +1,112 @@
+# images.py
+"""
+Resized WebP/JPEG variants of uploaded images.
+
+Post images and author pictures used to be served at their original size
+(up to 5 MB) even on homepage cards. ``generate_variants`` writes
+recompressed copies of an upload in each of ``IMAGE_VARIANT_WIDTHS`` that
+is narrower than the original, in WebP and JPEG, next to the original
+under a ``variants/`` directory with deterministic names::
+
+    image/photo.png -> image/variants/photo-640w.webp, image/variants/photo-640w.jpg
+
+The generated widths are stored on the model (``image_variants`` /
+``picture_variants``) together with the source name, so templates build
+``srcset`` attributes without touching storage, and a replaced upload is
+detected by comparing names. Variants are generated once the saving
+transaction commits (see ``signals.py``) and backfilled with
+``manage.py generate_image_variants``.
+
+Images over Pillow's ``MAX_IMAGE_PIXELS`` are refused, including the ones
+Pillow would only warn about; callers catch ``IMAGE_ERRORS``.
+"""
+import posixpath
+import warnings
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+# Unreadable, truncated or oversized (decompression bomb) uploads
+IMAGE_ERRORS = (OSError, Image.DecompressionBombError, Image.DecompressionBombWarning)
+FORMATS = {'webp': ('WEBP', {'quality': 80, 'method': 6}), 'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True})}
+
+
+def variant_widths():
+    return sorted(getattr(settings, 'IMAGE_VARIANT_WIDTHS', (320, 640, 1024)))
+
+
+def variant_name(source, width, extension):
+    directory, filename = posixpath.split(source)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, 'variants', f'{stem}-{width}w.{extension}')
+
+
+def variant_names(source, widths):
+    return [variant_name(source, width, extension) for width in widths for extension in FORMATS]
+
+
+def generate_variants(field_file):
+    """Write the variants of ``field_file`` and return the value to store on the model"""
+    storage = field_file.storage
+    with storage.open(field_file.name, 'rb') as source, warnings.catch_warnings():
+        warnings.simplefilter('error', Image.DecompressionBombWarning)
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+    # Upscaling wastes bytes; an image narrower than every width gets one variant at its own size
+    widths = [width for width in variant_widths() if width < image.width] or [image.width]
+
+    for width in widths:
+        resized = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        for extension, (image_format, options) in FORMATS.items():
+            output = resized
+            if image_format == 'JPEG' and resized.mode == 'RGBA':
+                output = Image.new('RGB', resized.size, 'white')
+                output.paste(resized, mask=resized.getchannel('A'))
+            buffer = BytesIO()
+            output.save(buffer, image_format, **options)
+
+            name = variant_name(field_file.name, width, extension)
+            if storage.exists(name):
+                storage.delete(name)
+            storage.save(name, ContentFile(buffer.getvalue()))
+
+    return {'source': field_file.name, 'widths': widths}
+
+
+def delete_variants(storage, variants):
+    """Remove the files recorded in a stored variants value"""
+    if variants:
+        for name in variant_names(variants['source'], variants['widths']):
+            storage.delete(name)
+
+
+def sync_variants(instance, field_name, variants_field):
+    """Bring ``variants_field`` in line with the image in ``field_name``; returns True when it changed"""
+    field_file = getattr(instance, field_name)
+    current = getattr(instance, variants_field) or {}
+    if field_file and current.get('source') == field_file.name:
+        return False
+    if not field_file and not current:
+        return False
+
+    if current.get('source') and current['source'] != field_file.name:
+        delete_variants(field_file.storage, current)
+    variants = generate_variants(field_file) if field_file else {}
+    setattr(instance, variants_field, variants)
+    type(instance).objects.filter(pk=instance.pk).update(**{variants_field: variants})
+    return True
+
+
+def srcset(field_file, variants, extension):
+    """``srcset`` value for one format, or '' when no variants exist for the current file"""
+    if not field_file or not variants or variants.get('source') != field_file.name:
+        return ''
+    storage = field_file.storage
+    return ', '.join(
+        f"{storage.url(variant_name(field_file.name, width, extension))} {width}w" for width in variants['widths']
+    )
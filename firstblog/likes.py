@@ -0,0 +1,176 @@
+# likes.py
+"""
+Race-free like toggling.
+
+A toggle locks the liked row (``SELECT ... FOR UPDATE``), so concurrent
+toggles on the same post or comment queue up instead of racing on the
+``unique_together`` constraint. Under the lock it deletes the viewer's
+like and, if there was none, inserts one, then writes the new counter
+(and for posts the popularity score) in a single ``UPDATE``. The new state
+and count come from that transaction, so nothing is re-read afterwards.
+
+``set_likes`` applies a batch of ``(type, id, liked)`` operations the same
+way: lock every target at once, one bulk insert and one delete per like
+table, and one ``UPDATE ... CASE`` per target table for the counters.
+
+The counters, the liked author's dashboard totals (``user_stats.py``),
+popularity and cache groups are all maintained right here, so the like
+receivers in ``signals.py`` must not apply them again. Inserts use
+``bulk_create``, which sends no signals; deletes go through the ORM
+inside ``accounted()``, which those receivers check, so any other
+receiver still sees them. Likes created or deleted anywhere else go
+through the signals as usual.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models import Case, FloatField, IntegerField, Value, When
+
+from . import user_stats
+from .caching import invalidate
+from .models import BlogPost, Comment, CommentLike, PostLike
+from .popularity import popularity_score
+
+MAX_BATCH = 100
+LIKE_TYPES = ('post', 'comment')
+
+_accounted = ContextVar('likes_accounted', default=False)
+
+
+@contextmanager
+def accounted():
+    """Mark like changes made inside as already reflected in counters and caches"""
+    token = _accounted.set(True)
+    try:
+        yield
+    finally:
+        _accounted.reset(token)
+
+
+def is_accounted():
+    return _accounted.get()
+
+
+def _delete_likes(like_model, target_field, target_ids, user):
+    """Delete ``user``'s likes on ``target_ids``; returns how many went"""
+    with accounted():
+        deleted, _ = like_model.objects.filter(**{f'{target_field}__in': target_ids, 'user': user}).delete()
+    return deleted
+
+
+def _toggle(like_model, target_field, target_id, user):
+    """Delete or insert ``user``'s like on ``target_id``; True when it is now liked"""
+    if _delete_likes(like_model, target_field, [target_id], user):
+        return False
+    like_model.objects.bulk_create([like_model(**{target_field: target_id, 'user': user})])
+    return True
+
+
+def toggle_post_like(post_id, user):
+    """Like or unlike a post for ``user``; returns ``(liked, likes_count)``"""
+    with transaction.atomic():
+        row = BlogPost.objects.select_for_update().filter(pk=post_id).values_list(
+            'likes_count', 'view_count', 'date_created', 'author_id',
+        ).first()
+        if row is None:
+            raise BlogPost.DoesNotExist(post_id)
+        likes_count, view_count, date_created, author_id = row
+        liked = _toggle(PostLike, 'post_id', post_id, user)
+        likes_count = likes_count + 1 if liked else max(likes_count - 1, 0)
+        BlogPost.objects.filter(pk=post_id).update(
+            likes_count=likes_count, popularity_score=popularity_score(view_count, likes_count, date_created),
+        )
+        user_stats.adjust(author_id, 'post_likes', 1 if liked else -1)
+    invalidate('feed', 'popular', f'post:{post_id}')
+    return liked, likes_count
+
+
+def toggle_comment_like(comment_id, user):
+    """Like or unlike a comment for ``user``; returns ``(liked, likes_count)``"""
+    with transaction.atomic():
+        row = Comment.objects.select_for_update().filter(pk=comment_id).values_list('likes_count', 'post_id', 'author_id').first()
+        if row is None:
+            raise Comment.DoesNotExist(comment_id)
+        likes_count, post_id, author_id = row
+        liked = _toggle(CommentLike, 'comment_id', comment_id, user)
+        likes_count = likes_count + 1 if liked else max(likes_count - 1, 0)
+        Comment.objects.filter(pk=comment_id).update(likes_count=likes_count)
+        user_stats.adjust(author_id, 'comment_likes', 1 if liked else -1)
+    invalidate('feed', f'post:{post_id}')
+    return liked, likes_count
+
+
+def _set(model, like_model, target_field, stats_field, wanted, user, columns):
+    """Bring ``user``'s likes on ``wanted`` ({id: liked}) in line; returns the locked rows and new counts.
+
+    ``columns`` must end with ``author_id``: the authors' ``stats_field`` totals are adjusted here.
+    """
+    rows = {
+        row[0]: row[1:] for row in
+        model.objects.select_for_update().filter(pk__in=wanted).order_by('pk').values_list('pk', 'likes_count', *columns)
+    }
+    user_likes = like_model.objects.filter(user=user)
+    existing = set(user_likes.filter(**{f'{target_field}__in': rows}).values_list(target_field, flat=True))
+    add = [pk for pk in rows if wanted[pk] and pk not in existing]
+    remove = [pk for pk in rows if not wanted[pk] and pk in existing]
+
+    if add:
+        like_model.objects.bulk_create([like_model(**{target_field: pk, 'user': user}) for pk in add])
+    if remove:
+        _delete_likes(like_model, target_field, remove, user)
+
+    counts = {pk: row[0] for pk, row in rows.items()}
+    author_deltas = defaultdict(int)
+    for pk in add:
+        counts[pk] += 1
+        author_deltas[rows[pk][-1]] += 1
+    for pk in remove:
+        counts[pk] = max(counts[pk] - 1, 0)
+        author_deltas[rows[pk][-1]] -= 1
+    user_stats.adjust_many(stats_field, author_deltas)
+    return rows, counts, add + remove
+
+
+def _case(values, output_field):
+    return Case(*[When(pk=pk, then=Value(value)) for pk, value in values.items()], output_field=output_field)
+
+
+def set_likes(user, operations):
+    """Apply ``(type, id, liked)`` operations for ``user`` in one transaction.
+
+    Later operations on the same item win. Returns ``{type: {id: (liked,
+    likes_count)}}``; ids that do not exist are left out.
+    """
+    wanted = {like_type: {} for like_type in LIKE_TYPES}
+    for like_type, pk, liked in operations:
+        wanted[like_type][pk] = liked
+
+    results = {like_type: {} for like_type in LIKE_TYPES}
+    post_ids = set()
+    with transaction.atomic():
+        if wanted['post']:
+            rows, counts, changed = _set(BlogPost, PostLike, 'post_id', 'post_likes', wanted['post'], user, ['view_count', 'date_created', 'author_id'])
+            changed = {pk: counts[pk] for pk in changed}
+            if changed:
+                BlogPost.objects.filter(pk__in=changed).update(
+                    likes_count=_case(changed, IntegerField()),
+                    popularity_score=_case({
+                        pk: popularity_score(rows[pk][1], count, rows[pk][2]) for pk, count in changed.items()
+                    }, FloatField()),
+                )
+            results['post'] = {pk: (wanted['post'][pk], count) for pk, count in counts.items()}
+            post_ids.update(changed)
+
+        if wanted['comment']:
+            rows, counts, changed = _set(Comment, CommentLike, 'comment_id', 'comment_likes', wanted['comment'], user, ['post_id', 'author_id'])
+            changed = {pk: counts[pk] for pk in changed}
+            if changed:
+                Comment.objects.filter(pk__in=changed).update(likes_count=_case(changed, IntegerField()))
+            results['comment'] = {pk: (wanted['comment'][pk], count) for pk, count in counts.items()}
+            post_ids.update(rows[pk][1] for pk in changed)
+
+    if post_ids:
+        invalidate('feed', 'popular', *(f'post:{pk}' for pk in post_ids))
+    return results
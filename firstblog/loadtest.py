@@ -0,0 +1,265 @@
+# loadtest.py
+"""
+Concurrent load benchmarks through Django's real request handler.
+
+``benchmarks.py`` uses the test client, which disconnects the signals that
+open and close database connections between requests. These helpers call
+the WSGI handler directly, so connections are kept, pooled or closed
+exactly as they are behind a server.
+
+``run_connection_benchmark`` serves the same path under each connection
+mode in ``CONNECTION_MODES``, with two threading schedules:
+
+* ``workers``: a fixed set of threads each serving request after request
+  (a threaded WSGI server);
+* ``thread per request``: a fresh thread for every request (how an ASGI
+  server runs sync views).
+
+For each run it records requests per second, p50/p95 latency and how many
+new database connections were opened. The difference between modes is the
+connection setup cost.
+
+``run_server_benchmark`` serves a path the way each deployment would: WSGI
+worker threads with persistent connections, and the ASGI handler on one
+event loop (pooled connections) with the read pages served by the sync
+views and by ``async_views.py``.
+
+Both run against whatever the default database is; the
+``benchmark_connections`` and ``benchmark_servers`` commands create and
+seed a test database first.
+"""
+import asyncio
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from importlib import import_module
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.test import RequestFactory, override_settings
+from django.urls import include, path as route
+
+from . import async_views, views
+from .backends.pool import PooledConnectionMixin
+from .url import build_urlpatterns
+
+# name -> overrides of the default database settings
+CONNECTION_MODES = {
+    'per-request': {'CONN_MAX_AGE': 0},
+    'persistent': {'CONN_MAX_AGE': 60},
+    'pooled': {'CONN_MAX_AGE': 0, 'POOLED': True},
+}
+SCHEDULES = ('workers', 'thread per request')
+# name -> (handler, connection mode, module serving the read pages)
+SERVERS = {
+    'wsgi-sync': ('wsgi', 'persistent', views),
+    'asgi-sync': ('asgi', 'pooled', views),
+    'asgi-async': ('asgi', 'pooled', async_views),
+}
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class LoadRun:
+    """Serve ``path`` ``total`` times from ``concurrency`` threads and time each request"""
+
+    def __init__(self, path, total, concurrency):
+        self.application = WSGIHandler()
+        self.environ = RequestFactory(SERVER_NAME='127.0.0.1').get(path).environ  # allowed in every configuration
+        self.total = total
+        self.concurrency = concurrency
+        self.timings = []
+        self.statuses = set()
+        self.opened = 0
+        self.lock = threading.Lock()
+
+    def count_connection(self, sender, connection, **kwargs):
+        if not getattr(connection, 'pool_reused', False):
+            with self.lock:
+                self.opened += 1
+
+    def request(self):
+        statuses = []
+        start = time.perf_counter()
+        response = self.application(dict(self.environ), lambda status, headers, exc_info=None: statuses.append(status))
+        try:
+            for _ in response:
+                pass
+        finally:
+            response.close()  # sends request_finished, which closes or keeps the connection
+        elapsed = (time.perf_counter() - start) * 1000
+        with self.lock:
+            self.timings.append(elapsed)
+            self.statuses.update(statuses)
+
+    def worker(self, count):
+        try:
+            for _ in range(count):
+                self.request()
+        finally:
+            connections.close_all()
+
+    def shares(self):
+        return [self.total // self.concurrency + (i < self.total % self.concurrency) for i in range(self.concurrency)]
+
+    def run(self, schedule):
+        connection_created.connect(self.count_connection)
+        started = time.perf_counter()
+        try:
+            if schedule == 'workers':
+                self.join([threading.Thread(target=self.worker, args=(share,)) for share in self.shares()])
+            else:
+                for batch in range(0, self.total, self.concurrency):
+                    size = min(self.concurrency, self.total - batch)
+                    self.join([threading.Thread(target=self.worker, args=(1,)) for _ in range(size)])
+        finally:
+            connection_created.disconnect(self.count_connection)
+        return self.report(time.perf_counter() - started)
+
+    def report(self, wall):
+        timings = sorted(self.timings)
+        return {
+            'requests': len(timings),
+            'statuses': sorted(self.statuses),
+            'rps': round(len(timings) / wall, 1),
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'connections_opened': self.opened,
+        }
+
+    @staticmethod
+    def join(threads):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+
+class ASGILoadRun(LoadRun):
+    """Serve ``path`` ``total`` times through the ASGI handler, ``concurrency`` requests at a time on one event loop"""
+
+    def __init__(self, path, total, concurrency):
+        super().__init__(path, total, concurrency)
+        self.application = ASGIHandler()
+        path_info, _, query = path.partition('?')
+        self.scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+            'path': path_info, 'raw_path': path_info.encode(), 'query_string': query.encode(), 'root_path': '',
+            'headers': [(b'host', b'127.0.0.1')], 'client': ('127.0.0.1', 50000), 'server': ('127.0.0.1', 80),
+        }
+
+    async def request(self):
+        statuses = []
+        body_read = False
+
+        async def receive():
+            nonlocal body_read
+            if body_read:
+                await asyncio.Event().wait()  # the client never disconnects; Django cancels this wait
+            body_read = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.append(str(message['status']))
+
+        start = time.perf_counter()
+        await self.application(dict(self.scope), receive, send)
+        self.timings.append((time.perf_counter() - start) * 1000)
+        self.statuses.update(statuses)
+
+    async def worker(self, count):
+        for _ in range(count):
+            await self.request()
+
+    async def serve(self):
+        await asyncio.gather(*(self.worker(share) for share in self.shares()))
+
+    def run(self, schedule='event loop'):
+        connection_created.connect(self.count_connection)
+        started = time.perf_counter()
+        try:
+            asyncio.run(self.serve())
+        finally:
+            connection_created.disconnect(self.count_connection)
+        return self.report(time.perf_counter() - started)
+
+
+@lru_cache
+def root_urlconf(read_views):
+    """The project URLconf with the read pages served by ``read_views`` (usable as ``ROOT_URLCONF``)"""
+    project = import_module(settings.ROOT_URLCONF)
+    return type('URLConf', (), {'urlpatterns': [route('', include(build_urlpatterns(read_views))), *project.urlpatterns]})
+
+
+def reset_pools():
+    for pool in PooledConnectionMixin._pools.values():
+        while not pool.empty():
+            PooledConnectionMixin.discard_connection(pool.get_nowait())
+    PooledConnectionMixin._pools.clear()
+
+
+def base_engine():
+    """The configured database engine, with any pooled wrapper taken off"""
+    engine = connections.settings[DEFAULT_DB_ALIAS]['ENGINE']
+    pooled_engines = getattr(settings, 'POOLED_DATABASE_ENGINES', {})
+    return next((name for name, pooled in pooled_engines.items() if pooled == engine), engine)
+
+
+def can_pool():
+    return base_engine() in getattr(settings, 'POOLED_DATABASE_ENGINES', {})
+
+
+@contextmanager
+def connection_mode(mode):
+    """Run the default database in ``mode`` (a ``CONNECTION_MODES`` name) inside the block"""
+    database = connections.settings[DEFAULT_DB_ALIAS]
+    original = dict(database)
+    overrides = dict(CONNECTION_MODES[mode])
+    engine = base_engine()
+    overrides['ENGINE'] = settings.POOLED_DATABASE_ENGINES[engine] if overrides.pop('POOLED', False) else engine
+
+    connections.close_all()
+    database.update(original, **overrides)
+    try:
+        yield
+    finally:
+        connections.close_all()
+        reset_pools()
+        database.clear()
+        database.update(original)
+
+
+def run_connection_benchmark(path, total=400, concurrency=8, modes=None):
+    """Report per mode and schedule for ``total`` requests to ``path`` against the default database"""
+    report = {'path': path, 'requests': total, 'concurrency': concurrency, 'engine': base_engine(), 'modes': {}}
+    for mode in modes or CONNECTION_MODES:
+        if CONNECTION_MODES[mode].get('POOLED') and not can_pool():
+            continue
+        with connection_mode(mode):
+            for schedule in SCHEDULES:
+                reset_pools()
+                report['modes'].setdefault(mode, {})[schedule] = LoadRun(path, total, concurrency).run(schedule)
+    return report
+
+
+def run_server_benchmark(path, total=400, concurrency=8, servers=None):
+    """Report per ``SERVERS`` entry for ``total`` requests to ``path`` against the default database"""
+    report = {'path': path, 'requests': total, 'concurrency': concurrency, 'engine': base_engine(), 'servers': {}}
+    for name in servers or SERVERS:
+        handler, mode, read_views = SERVERS[name]
+        if CONNECTION_MODES[mode].get('POOLED') and not can_pool():
+            mode = 'per-request'
+        runner = ASGILoadRun if handler == 'asgi' else LoadRun
+        with connection_mode(mode), override_settings(ROOT_URLCONF=root_urlconf(read_views)):
+            result = runner(path, total, concurrency).run('workers')
+        report['servers'][name] = dict(result, connections=mode)
+    return report
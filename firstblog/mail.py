@@ -0,0 +1,164 @@
+# mail.py
+"""
+Queued outbound email.
+
+With ``EMAIL_BACKEND = 'firstblog.mail.QueuedEmailBackend'`` every message
+(the contact form, allauth verification and password reset mails ...) is
+stored as an ``OutboundEmail`` row and ``send()`` returns straight away, so
+a slow or unreachable SMTP server can no longer block or fail a request.
+Attachments given as ``(filename, content, mimetype)`` are stored with the
+row (binary content base64-encoded); a message with a ready-made MIME part
+attached cannot be stored that way and is sent through
+``QUEUED_EMAIL_BACKEND`` right away instead.
+
+``manage.py send_queued_mail`` delivers the queue in batches through
+``QUEUED_EMAIL_BACKEND`` over one connection per batch. A failed message is
+retried with exponential backoff (``EMAIL_QUEUE_RETRY_DELAY`` seconds,
+doubled on every attempt) and marked failed after
+``EMAIL_QUEUE_MAX_ATTEMPTS``. Claimed messages have their next attempt
+pushed ``CLAIM_SECONDS`` ahead, so several workers can run at once and a
+crashed worker's batch is picked up again later.
+"""
+import base64
+import logging
+from datetime import timedelta
+from email.mime.base import MIMEBase
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CLAIM_SECONDS = 300
+
+
+def max_attempts():
+    return getattr(settings, 'EMAIL_QUEUE_MAX_ATTEMPTS', 5)
+
+
+def retry_delay(attempts):
+    """Seconds to wait before the next try after ``attempts`` failures"""
+    return getattr(settings, 'EMAIL_QUEUE_RETRY_DELAY', 60) * 2 ** (attempts - 1)
+
+
+def delivery_connection(**kwargs):
+    return get_connection(getattr(settings, 'QUEUED_EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend'), **kwargs)
+
+
+def serialize_attachment(attachment):
+    filename, content, mimetype = attachment
+    if isinstance(content, bytes):
+        return {'filename': filename, 'mimetype': mimetype, 'content': base64.b64encode(content).decode('ascii'), 'base64': True}
+    return {'filename': filename, 'mimetype': mimetype, 'content': content, 'base64': False}
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """Store messages for ``send_queued_mail`` instead of sending them"""
+
+    def send_messages(self, email_messages):
+        from .models import OutboundEmail
+
+        rows, direct = [], []
+        for message in email_messages:
+            if any(isinstance(attachment, MIMEBase) for attachment in message.attachments):
+                direct.append(message)
+                continue
+            rows.append(OutboundEmail(
+                subject=message.subject,
+                body=message.body,
+                from_email=message.from_email or settings.DEFAULT_FROM_EMAIL,
+                to=list(message.to),
+                cc=list(message.cc),
+                bcc=list(message.bcc),
+                reply_to=list(message.reply_to),
+                headers=dict(message.extra_headers),
+                alternatives=[list(alternative) for alternative in getattr(message, 'alternatives', [])],
+                attachments=[serialize_attachment(attachment) for attachment in message.attachments],
+                content_subtype=message.content_subtype,
+                mixed_subtype=message.mixed_subtype,
+                encoding=message.encoding or '',
+            ))
+        OutboundEmail.objects.bulk_create(rows)
+        sent = len(rows)
+        if direct:
+            sent += delivery_connection(fail_silently=self.fail_silently).send_messages(direct) or 0
+        return sent
+
+
+def to_message(row):
+    message = EmailMultiAlternatives(
+        row.subject, row.body, row.from_email, row.to,
+        cc=row.cc, bcc=row.bcc, reply_to=row.reply_to, headers=row.headers,
+    )
+    message.content_subtype = row.content_subtype
+    message.mixed_subtype = row.mixed_subtype
+    message.encoding = row.encoding or None
+    for content, mimetype in row.alternatives:
+        message.attach_alternative(content, mimetype)
+    for attachment in row.attachments:
+        content = base64.b64decode(attachment['content']) if attachment['base64'] else attachment['content']
+        message.attach(attachment['filename'], content, attachment['mimetype'])
+    return message
+
+
+def claim_batch(batch_size):
+    """Lock the next due messages for this worker and return them"""
+    from .models import OutboundEmail
+
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='queued', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'pk')[:batch_size]
+        )
+        OutboundEmail.objects.filter(pk__in=[row.pk for row in rows]).update(
+            next_attempt_at=now + timedelta(seconds=CLAIM_SECONDS)
+        )
+    return rows
+
+
+def send_batch(batch_size=50):
+    """Send one batch of due messages over a single connection; returns (sent, failed)"""
+    from .models import OutboundEmail
+
+    rows = claim_batch(batch_size)
+    if not rows:
+        return 0, 0
+
+    connection = delivery_connection()
+    sent = failed = 0
+    done = []
+    try:
+        connection.open()
+        for row in rows:
+            row.attempts += 1
+            done.append(row)
+            try:
+                connection.send_messages([to_message(row)])
+            except Exception as error:
+                failed += 1
+                row.last_error = f'{type(error).__name__}: {error}'
+                if row.attempts >= max_attempts():
+                    row.status = 'failed'
+                else:
+                    row.next_attempt_at = timezone.now() + timedelta(seconds=retry_delay(row.attempts))
+                logger.warning('Sending email %s failed (attempt %s): %s', row.pk, row.attempts, row.last_error)
+                # The connection may be unusable now; start a fresh one for the rest of the batch
+                connection.close()
+                connection.open()
+            else:
+                sent += 1
+                row.status = 'sent'
+                row.date_sent = timezone.now()
+                row.last_error = ''
+    except Exception:
+        # Could not connect at all: unsent rows keep their claim and are retried after it expires
+        logger.exception('Email connection failed')
+    finally:
+        connection.close()
+        OutboundEmail.objects.bulk_update(done, ['status', 'attempts', 'next_attempt_at', 'last_error', 'date_sent'])
+    return sent, failed
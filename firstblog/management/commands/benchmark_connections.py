@@ -0,0 +1,45 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from firstblog.benchmarks import seed
+from firstblog.loadtest import CONNECTION_MODES, run_connection_benchmark
+
+
+class Command(BaseCommand):
+    help = 'Compare per-request, persistent and pooled database connections under concurrent load (uses a throwaway test database)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/search/?q=post', help='Path to request; pick one that reads the database on every hit')
+        parser.add_argument('--requests', type=int, default=400, help='Requests per mode and schedule')
+        parser.add_argument('--posts', type=int, default=200, help='Number of posts to seed (with proportional users, comments, likes and views)')
+        parser.add_argument('--concurrency', type=int, default=8, help='Simultaneous requests')
+        parser.add_argument('--modes', default=','.join(CONNECTION_MODES), help='Comma-separated connection modes to compare')
+        parser.add_argument('--output', default='connection-benchmarks.json', help='Path of the JSON report')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            seed(options['posts'])
+            report = run_connection_benchmark(
+                options['path'], options['requests'], options['concurrency'], options['modes'].split(','),
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        with open(options['output'], 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+
+        self.stdout.write(f"{report['engine']}, {report['requests']} requests to {report['path']}, concurrency {report['concurrency']}")
+        self.stdout.write(f"{'mode':<13}{'schedule':<20}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'connections':>13}  status")
+        for mode, by_schedule in report['modes'].items():
+            for schedule, result in by_schedule.items():
+                self.stdout.write(
+                    f"{mode:<13}{schedule:<20}{result['rps']:>9.1f}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}"
+                    f"{result['connections_opened']:>13}  {','.join(result['statuses'])}"
+                )
+        self.stdout.write(f"Report written to {options['output']}.")
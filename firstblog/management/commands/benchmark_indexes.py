@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from firstblog.benchmarks import run_index_benchmark
+
+
+class Command(BaseCommand):
+    help = 'Print EXPLAIN plans and timings for the main query patterns, optionally with and without the composite indexes (uses a throwaway test database)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=2000, help='Number of posts to seed (with proportional users, comments, likes and views)')
+        parser.add_argument('--repeat', type=int, default=20, help='Number of timed runs per query')
+        parser.add_argument('--compare', action='store_true', help='Also measure with the composite indexes of migration 0024 dropped')
+        parser.add_argument('--no-explain', action='store_true', help='Only print timings')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            report = run_index_benchmark(
+                options['posts'], repeat=options['repeat'], compare=options['compare'], explain=not options['no_explain'],
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        runs = [('without', 'Without composite indexes'), ('with', 'With composite indexes')]
+        for key, heading in runs:
+            if key not in report:
+                continue
+            self.stdout.write(self.style.MIGRATE_HEADING(heading))
+            for name, result in report[key].items():
+                if result['plan']:
+                    self.stdout.write(self.style.SQL_KEYWORD(f'-- {name}'))
+                    self.stdout.write(result['plan'])
+                self.stdout.write(f"{name:<24} median {result['median_ms']:.3f} ms  max {result['max_ms']:.3f} ms")
+
+        if 'without' in report:
+            self.stdout.write(self.style.MIGRATE_HEADING('Summary (median ms)'))
+            for name, after in report['with'].items():
+                before = report['without'][name]['median_ms']
+                speedup = before / after['median_ms'] if after['median_ms'] else 0
+                self.stdout.write(f"{name:<24} {before:>9.3f} -> {after['median_ms']:>9.3f}  ({speedup:.1f}x)")
@@ -0,0 +1,44 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from firstblog.benchmarks import seed
+from firstblog.loadtest import SERVERS, run_server_benchmark
+
+
+class Command(BaseCommand):
+    help = 'Compare requests per second under WSGI and ASGI, with sync and async read views (uses a throwaway test database)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/search/?q=post', help='Path to request; pick one that is not served from the page cache')
+        parser.add_argument('--requests', type=int, default=400, help='Requests per server')
+        parser.add_argument('--posts', type=int, default=200, help='Number of posts to seed (with proportional users, comments, likes and views)')
+        parser.add_argument('--concurrency', type=int, default=8, help='Simultaneous requests')
+        parser.add_argument('--servers', default=','.join(SERVERS), help='Comma-separated servers to compare')
+        parser.add_argument('--output', default='server-benchmarks.json', help='Path of the JSON report')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            seed(options['posts'])
+            report = run_server_benchmark(
+                options['path'], options['requests'], options['concurrency'], options['servers'].split(','),
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        with open(options['output'], 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+
+        self.stdout.write(f"{report['engine']}, {report['requests']} requests to {report['path']}, concurrency {report['concurrency']}")
+        self.stdout.write(f"{'server':<12}{'connections':<13}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'opened':>8}  status")
+        for server, result in report['servers'].items():
+            self.stdout.write(
+                f"{server:<12}{result['connections']:<13}{result['rps']:>9.1f}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}"
+                f"{result['connections_opened']:>8}  {','.join(result['statuses'])}"
+            )
+        self.stdout.write(f"Report written to {options['output']}.")
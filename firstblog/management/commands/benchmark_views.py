@@ -0,0 +1,47 @@
+import json
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from firstblog.benchmarks import run_view_benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Measure query counts, SQL time and p50/p95 response time of every view at several data scales (uses a throwaway test database)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scales', default='20,100,500', help='Comma-separated numbers of posts to seed, smallest first')
+        parser.add_argument('--repeat', type=int, default=10, help='Timed requests per view and scale')
+        parser.add_argument('--output', default='view-benchmarks.json', help='Path of the JSON report')
+
+    def handle(self, *args, **options):
+        scales = sorted(int(scale) for scale in options['scales'].split(','))
+
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            report = run_view_benchmarks(
+                scales, repeat=options['repeat'],
+                reset=lambda: call_command('flush', interactive=False, verbosity=0),
+            )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        with open(options['output'], 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+
+        self.stdout.write(f"{'view':<26}" + ''.join(f'{scale:>22}' for scale in scales))
+        for name, by_scale in report['views'].items():
+            self.stdout.write(f'{name:<26}' + ''.join(
+                f"{by_scale[str(scale)]['queries']:>5}q {by_scale[str(scale)]['p50_ms']:>6.1f}/{by_scale[str(scale)]['p95_ms']:>6.1f}ms"
+                for scale in scales
+            ))
+        self.stdout.write(f"Report written to {options['output']}.")
+
+        if report['failures']:
+            for failure in report['failures']:
+                self.stderr.write(failure)
+            raise CommandError(f"{len(report['failures'])} view(s) run more queries as the data grows.")
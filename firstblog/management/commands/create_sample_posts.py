@@ -1,170 +1,265 @@
-from django.core.management.base import BaseCommand
-from firstblog.models import BlogPost, Category, CustomUser  # Replace 'main' with your app name
+import itertools
 import random
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from firstblog.caching import invalidate
+from firstblog.comments import rebuild_paths
+from firstblog.models import (
+    AuthorProfile, BlogPost, Category, Comment, CommentLike, CustomUser, PostLike, UserPostView,
+)
+from firstblog.popularity import refresh_popularity
+
+CATEGORY_NAMES = ['Technology', 'Science', 'Travel', 'Food', 'Lifestyle', 'Health', 'Business', 'Culture']
+
+WORDS = '''
+    django python web framework database query index cache performance server request response template
+    travel city journey coffee morning market street museum mountain river ocean recipe kitchen garden
+    science research data model experiment result energy climate health sleep habit mind focus story
+    design product team project build deploy release feature review test code bug fix learn teach write
+'''.split()
+
+
+def zipf_cum_weights(size, exponent):
+    """Cumulative Zipf weights for ``random.choices``; rank 0 is the most popular"""
+    return list(itertools.accumulate(1 / (rank + 1) ** exponent for rank in range(size)))
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep the generated date fields instead of auto_now/auto_now_add"""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
 
 class Command(BaseCommand):
-    help = 'Create 10 sample blog posts for testing'
+    help = 'Generate a synthetic dataset of users, posts, comments, likes and views for load and benchmark runs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20, help='Number of users to create')
+        parser.add_argument('--posts', type=int, default=10, help='Number of posts to create')
+        parser.add_argument('--comments', type=int, default=50, help='Number of comments and replies to create')
+        parser.add_argument('--likes', type=int, default=100, help='Number of post likes to attempt (duplicates are skipped)')
+        parser.add_argument('--comment-likes', type=int, default=None, help='Number of comment likes to attempt (default: likes / 2)')
+        parser.add_argument('--views', type=int, default=500, help='Number of post views to simulate')
+        parser.add_argument('--seed', type=int, default=None, help='Random seed for a reproducible dataset')
+        parser.add_argument('--days', type=int, default=365, help='Spread content over this many past days')
+        parser.add_argument('--zipf', type=float, default=1.1, help='Zipf exponent for post and user popularity')
+        parser.add_argument('--reply-ratio', type=float, default=0.4, help='Share of comments that reply to another comment')
+        parser.add_argument('--author-ratio', type=float, default=0.1, help='Share of users with an author profile')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk_create/transaction')
+        parser.add_argument('--skip-search-index', action='store_true', help='Do not build search index entries for the new posts')
 
     def handle(self, *args, **options):
-        # Get or create a staff user to be the author
-        try:
-            user = CustomUser.objects.filter(is_staff=True).first()
-            if not user:
-                self.stdout.write(self.style.ERROR('No staff user found. Please create a staff user first.'))
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        self.start = self.now - timedelta(days=options['days'])
+        started = time.perf_counter()
+
+        with explicit_timestamps(CustomUser, BlogPost, Comment, PostLike, CommentLike, UserPostView):
+            users = self.create_users(options['users'], options['author_ratio'])
+            if not users['all'] or not users['authors']:
+                self.stdout.write(self.style.ERROR('At least one user and one author are required.'))
                 return
-        except CustomUser.DoesNotExist:
-            self.stdout.write(self.style.ERROR('No staff user found. Please create a staff user first.'))
-            return
-        
-        # Get or create categories
-        categories = []
-        category_names = ['Technology', 'Science', 'Travel', 'Food', 'Lifestyle']
-        
-        for name in category_names:
-            category, created = Category.objects.get_or_create(name=name)
-            categories.append(category)
-            if created:
-                self.stdout.write(self.style.SUCCESS(f'Created category: {name}'))
-        
-        # Sample posts data
-        sample_posts = [
-            {
-                'title': 'The Future of Artificial Intelligence in 2024',
-                'post': '''Artificial intelligence continues to transform industries at an unprecedented pace. From machine learning algorithms to natural language processing, AI is revolutionizing how we work and live.
-
-In this comprehensive overview, we explore the latest trends in AI development, including the rise of generative AI, ethical considerations, and practical applications across various sectors.
-
-Key points covered:
-- Current state of AI technology
-- Ethical implications and challenges
-- Future predictions and developments
-- How businesses can leverage AI effectively''',
-                'view_count': 1250
-            },
-            {
-                'title': 'Sustainable Living: Practical Tips for Everyday Life',
-                'post': '''Adopting a sustainable lifestyle doesn\'t have to be complicated or expensive. In this guide, we share practical tips that anyone can implement to reduce their environmental footprint.
-
-From simple changes in daily habits to more significant lifestyle adjustments, discover how you can contribute to a healthier planet while often saving money in the process.
-
-Topics include:
-- Reducing plastic waste
-- Energy conservation at home
-- Sustainable food choices
-- Eco-friendly transportation options''',
-                'view_count': 890
-            },
-            {
-                'title': 'Mastering Django: Best Practices for Web Development',
-                'post': '''Django remains one of the most popular Python web frameworks for good reason. Its "batteries-included" philosophy and robust security features make it ideal for building scalable web applications.
-
-This post covers essential Django best practices that every developer should know, from project structure and settings management to deployment considerations.
-
-We\'ll discuss:
-- Project organization patterns
-- Security best practices
-- Performance optimization
-- Deployment strategies
-- Testing methodologies''',
-                'view_count': 2100
-            },
-            {
-                'title': 'Healthy Eating on a Busy Schedule',
-                'post': '''Maintaining a healthy diet can be challenging when you\'re constantly on the go. This guide provides time-saving strategies and meal prep ideas that make healthy eating achievable even with the busiest schedules.
-
-Learn how to:
-- Plan meals efficiently
-- Prepare healthy snacks
-- Make quick nutritious meals
-- Stay consistent with your goals''',
-                'view_count': 760
-            },
-            {
-                'title': 'Top Travel Destinations for Digital Nomads',
-                'post': '''The rise of remote work has created new opportunities for location-independent professionals. Discover the best cities and countries for digital nomads in 2024, considering factors like cost of living, internet connectivity, and community.
-
-Featured destinations include:
-- Bali, Indonesia
-- Lisbon, Portugal
-- Medellín, Colombia
-- Chiang Mai, Thailand
-- Mexico City, Mexico''',
-                'view_count': 1540
-            },
-            {
-                'title': 'Machine Learning Fundamentals for Beginners',
-                'post': '''Machine learning can seem intimidating, but understanding the basics is more accessible than you might think. This beginner-friendly introduction breaks down core concepts without overwhelming technical jargon.
-
-We cover:
-- What machine learning actually is
-- Different types of ML algorithms
-- Real-world applications
-- Getting started with your first project
-- Recommended learning resources''',
-                'view_count': 980
-            },
-            {
-                'title': 'Urban Gardening: Growing Food in Small Spaces',
-                'post': '''You don\'t need a large backyard to grow your own food. Urban gardening techniques allow you to cultivate fresh produce even in apartments and small homes.
-
-This comprehensive guide covers:
-- Container gardening basics
-- Best plants for small spaces
-- Vertical gardening techniques
-- Indoor growing solutions
-- Pest management in confined spaces''',
-                'view_count': 670
-            },
-            {
-                'title': 'Web Development Trends Shaping 2024',
-                'post': '''The web development landscape continues to evolve rapidly. Stay ahead of the curve by understanding the technologies and approaches that are gaining traction this year.
-
-Key trends include:
-- Serverless architecture adoption
-- Jamstack methodology
-- Web3 and blockchain integration
-- Progressive Web Apps (PWAs)
-- AI-powered development tools''',
-                'view_count': 1320
-            },
-            {
-                'title': 'Mindfulness and Mental Health in the Digital Age',
-                'post': '''In our always-connected world, maintaining mental wellbeing requires intentional practice. Explore mindfulness techniques and digital wellness strategies that can help you find balance.
-
-Topics covered:
-- Digital detox strategies
-- Meditation for beginners
-- Managing information overload
-- Building healthy tech habits
-- Creating boundaries with devices''',
-                'view_count': 540
-            },
-            {
-                'title': 'Renewable Energy Solutions for Homeowners',
-                'post': '''Transitioning to renewable energy is becoming increasingly accessible for homeowners. This guide examines the practical options available today, from solar panels to geothermal systems.
-
-We discuss:
-- Solar power installation considerations
-- Wind energy for residential use
-- Geothermal heating and cooling
-- Government incentives and rebates
-- Calculating return on investment''',
-                'view_count': 830
-            }
-        ]
-
-        # Create posts
-        for i, post_data in enumerate(sample_posts, 1):
-            try:
-                post = BlogPost.objects.create(
-                    title=post_data['title'],
-                    post=post_data['post'],
-                    author=user,
-                    category=random.choice(categories),
-                    view_count=post_data['view_count']
+            categories = self.create_categories()
+            posts = self.create_posts(options['posts'], users, categories, options)
+            if posts:
+                comments = self.create_comments(options['comments'], posts, users, options)
+                self.create_post_likes(options['likes'], posts, users, options)
+                comment_likes = options['comment_likes'] if options['comment_likes'] is not None else options['likes'] // 2
+                self.create_comment_likes(comment_likes, comments, users, options)
+                self.create_views(posts, options)
+
+        self.reset_sequences()
+        call_command('recount', stdout=self.stdout)
+        call_command('reconcile_user_stats', stdout=self.stdout)
+        call_command('reconcile_site_stats', stdout=self.stdout)
+        refresh_popularity()
+        if posts and not options['skip_search_index']:
+            call_command('rebuild_search_index', from_id=posts[0]['id'], stdout=self.stdout)
+        invalidate('feed', 'categories', 'recent', 'popular', 'totals')
+
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.perf_counter() - started:.1f}s.'))
+
+    # Helpers
+    def next_id(self, model):
+        return (model.objects.aggregate(largest=Max('pk'))['largest'] or 0) + 1
+
+    def bulk_insert(self, model, objects, **kwargs):
+        """Insert objects in batches, one transaction per batch"""
+        total = 0
+        iterator = iter(objects)
+        while True:
+            batch = list(itertools.islice(iterator, self.batch_size))
+            if not batch:
+                return total
+            with transaction.atomic():
+                model.objects.bulk_create(batch, batch_size=self.batch_size, **kwargs)
+            total += len(batch)
+
+    def random_date(self, after=None):
+        start = max(after or self.start, self.start)
+        return start + (self.now - start) * self.rng.random()
+
+    def text(self, min_words, max_words):
+        return ' '.join(self.rng.choices(WORDS, k=self.rng.randint(min_words, max_words)))
+
+    def zipf_sampler(self, size, exponent):
+        """Return a function drawing ``k`` Zipf-distributed indexes, with ranks shuffled over the items"""
+        cum_weights = zipf_cum_weights(size, exponent)
+        ranking = list(range(size))
+        self.rng.shuffle(ranking)
+        return lambda k: [ranking[rank] for rank in self.rng.choices(range(size), cum_weights=cum_weights, k=k)]
+
+    def sample(self, sampler, total):
+        """Yield ``total`` sampled indexes in batch-sized chunks"""
+        while total > 0:
+            size = min(total, self.batch_size)
+            yield from sampler(size)
+            total -= size
+
+    # Generators
+    def create_users(self, total, author_ratio):
+        first_id = self.next_id(CustomUser)
+        self.bulk_insert(CustomUser, (
+            CustomUser(
+                id=first_id + i, email=f'user{first_id + i}@example.com', username=f'user{first_id + i}',
+                password='!', date_joined=self.random_date(),
+            )
+            for i in range(total)
+        ))
+        new_ids = list(range(first_id, first_id + total))
+        author_ids = new_ids[:max(1, int(total * author_ratio))] if total else []
+        self.bulk_insert(AuthorProfile, (AuthorProfile(user_id=user_id) for user_id in author_ids))
+
+        all_ids = list(CustomUser.objects.values_list('pk', flat=True))
+        authors = list(AuthorProfile.objects.values_list('user_id', flat=True))
+        self.stdout.write(f'Created {total} users ({len(author_ids)} authors).')
+        return {'all': all_ids, 'authors': authors}
+
+    def create_categories(self):
+        for name in CATEGORY_NAMES:
+            Category.objects.get_or_create(name=name)
+        return list(Category.objects.values_list('pk', flat=True))
+
+    def create_posts(self, total, users, categories, options):
+        first_id = self.next_id(BlogPost)
+        pick_author = self.zipf_sampler(len(users['authors']), options['zipf'])
+        statuses = ['published'] * 17 + ['draft', 'draft', 'archived']
+
+        # Zipf-sampled views decide each post's view count; about a third are from logged-in users
+        pick_post = self.zipf_sampler(total, options['zipf']) if total else None
+        pick_viewer = self.zipf_sampler(len(users['all']), options['zipf'])
+        views = Counter()
+        self.viewers = set()
+        for post_index in (self.sample(pick_post, options['views']) if total else []):
+            views[post_index] += 1
+            if self.rng.random() < 0.3:
+                self.viewers.add((users['all'][pick_viewer(1)[0]], first_id + post_index))
+
+        posts = []
+        for i, author_index in enumerate(self.sample(pick_author, total)):
+            created = self.random_date()
+            posts.append({
+                'id': first_id + i,
+                'created': created,
+                'author_id': users['authors'][author_index],
+            })
+
+        def build():
+            for post in posts:
+                paragraphs = ''.join(f'<p>{self.text(30, 120)}.</p>' for _ in range(self.rng.randint(1, 6)))
+                instance = BlogPost(
+                    id=post['id'], author_id=post['author_id'], category_id=self.rng.choice(categories),
+                    title=self.text(3, 8).capitalize()[:100], post=paragraphs, status=self.rng.choice(statuses),
+                    date_created=post['created'], date_updated=self.random_date(post['created']),
+                    view_count=views[post['id'] - first_id],
                 )
-                self.stdout.write(self.style.SUCCESS(f'Created post #{i}: {post.title}'))
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f'Error creating post #{i}: {str(e)}'))
+                instance.render_derived()  # bulk_create skips save()
+                yield instance
+
+        self.bulk_insert(BlogPost, build())
+        self.stdout.write(f'Created {len(posts)} posts.')
+        return posts
+
+    def create_comments(self, total, posts, users, options):
+        first_id = self.next_id(Comment)
+        pick_post = self.zipf_sampler(len(posts), options['zipf'])
+        pick_user = self.zipf_sampler(len(users['all']), options['zipf'])
+        thread = defaultdict(list)  # post id -> [(comment id, date)]
+        comments = []
+
+        def build():
+            for i, (post_index, user_index) in enumerate(zip(self.sample(pick_post, total), self.sample(pick_user, total))):
+                post = posts[post_index]
+                comment_id = first_id + i
+                parent_id, after = None, post['created']
+                if thread[post['id']] and self.rng.random() < options['reply_ratio']:
+                    # Prefer recent comments so threads grow deep rather than wide
+                    parent_id, after = thread[post['id']][-1 - int(self.rng.expovariate(1.0)) % len(thread[post['id']])]
+                created = self.random_date(after)
+                thread[post['id']].append((comment_id, created))
+                comments.append(comment_id)
+                yield Comment(
+                    id=comment_id, post_id=post['id'], author_id=users['all'][user_index], parent_id=parent_id,
+                    text=self.text(5, 40), date_created=created, date_updated=created,
+                )
+
+        self.bulk_insert(Comment, build())
+        rebuild_paths(Comment.objects.filter(pk__gte=first_id))  # bulk_create skips save()
+        self.stdout.write(f'Created {len(comments)} comments.')
+        return comments
+
+    def create_post_likes(self, total, posts, users, options):
+        pick_post = self.zipf_sampler(len(posts), options['zipf'])
+        pick_user = self.zipf_sampler(len(users['all']), options['zipf'])
+        pairs = {(posts[p]['id'], users['all'][u]) for p, u in zip(self.sample(pick_post, total), self.sample(pick_user, total))}
+        created = self.bulk_insert(PostLike, (
+            PostLike(post_id=post_id, user_id=user_id, date_created=self.random_date()) for post_id, user_id in pairs
+        ), ignore_conflicts=True)
+        self.stdout.write(f'Created up to {created} post likes.')
+
+    def create_comment_likes(self, total, comments, users, options):
+        if not comments:
+            return
+        pick_comment = self.zipf_sampler(len(comments), options['zipf'])
+        pick_user = self.zipf_sampler(len(users['all']), options['zipf'])
+        pairs = {(comments[c], users['all'][u]) for c, u in zip(self.sample(pick_comment, total), self.sample(pick_user, total))}
+        created = self.bulk_insert(CommentLike, (
+            CommentLike(comment_id=comment_id, user_id=user_id, date_created=self.random_date())
+            for comment_id, user_id in pairs
+        ), ignore_conflicts=True)
+        self.stdout.write(f'Created up to {created} comment likes.')
+
+    def create_views(self, posts, options):
+        """Store unique-viewer rows for the logged-in views sampled in create_posts"""
+        created = self.bulk_insert(UserPostView, (
+            UserPostView(user_id=user_id, post_id=post_id, viewed_at=self.random_date()) for user_id, post_id in self.viewers
+        ), ignore_conflicts=True)
+        self.stdout.write(f"Simulated {options['views']} views ({created} unique logged-in viewers).")
 
-        self.stdout.write(self.style.SUCCESS('Successfully created 10 blog posts!'))
\ No newline at end of file
+    def reset_sequences(self):
+        """Move sequences past the explicit primary keys (a no-op on MySQL and SQLite)"""
+        statements = connection.ops.sequence_reset_sql(no_style(), [CustomUser, BlogPost, Comment])
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from firstblog.view_counter import view_buffer
+
+
+class Command(BaseCommand):
+    help = 'Write all buffered post views to the database'
+
+    def handle(self, *args, **options):
+        written = view_buffer.flush()
+        self.stdout.write(self.style.SUCCESS(f'Flushed {written} buffered views.'))
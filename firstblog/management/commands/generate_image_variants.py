@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from firstblog.caching import invalidate
+from firstblog.images import IMAGE_ERRORS, sync_variants
+from firstblog.models import AuthorProfile, BlogPost
+
+
+class Command(BaseCommand):
+    help = 'Generate resized WebP/JPEG variants for existing post images and author pictures'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate variants that already exist (e.g. after changing IMAGE_VARIANT_WIDTHS)')
+
+    def handle(self, *args, **options):
+        targets = [
+            (BlogPost.objects.exclude(add_image='').exclude(add_image=None), 'add_image', 'image_variants'),
+            (AuthorProfile.objects.exclude(profile_picture='').exclude(profile_picture=None), 'profile_picture', 'picture_variants'),
+        ]
+        generated = failed = 0
+        changed_posts = []
+        for queryset, field_name, variants_field in targets:
+            for instance in queryset.order_by('pk').iterator():
+                if options['force']:
+                    setattr(instance, variants_field, {})
+                try:
+                    changed = sync_variants(instance, field_name, variants_field)
+                except IMAGE_ERRORS as error:
+                    failed += 1
+                    self.stderr.write(f'{getattr(instance, field_name).name}: {error}')
+                    continue
+                if changed:
+                    generated += 1
+                    if isinstance(instance, BlogPost):
+                        changed_posts.append(instance.pk)
+
+        if generated:
+            invalidate('feed', 'categories', *(f'post:{pk}' for pk in changed_posts))
+        self.stdout.write(self.style.SUCCESS(f'Generated variants for {generated} images ({failed} failed).'))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from firstblog.models import BlogPost
+from firstblog.search import index_posts
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index for all blog posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Number of posts indexed per transaction')
+        parser.add_argument('--from-id', type=int, default=None, help='Only index posts with this primary key or higher')
+
+    def handle(self, *args, **options):
+        posts = BlogPost.objects.select_related('author').order_by('pk')
+        if options['from_id'] is not None:
+            posts = posts.filter(pk__gte=options['from_id'])
+        total = 0
+        batch = []
+        for post in posts.iterator(chunk_size=options['batch_size']):
+            batch.append(post)
+            if len(batch) >= options['batch_size']:
+                index_posts(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            index_posts(batch)
+            total += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} posts.'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from firstblog.site_stats import reconcile_site_stats
+
+
+class Command(BaseCommand):
+    help = 'Recount the site-wide totals shown on the about page and fix them if they drifted (run periodically)'
+
+    def handle(self, *args, **options):
+        corrected = reconcile_site_stats()
+        self.stdout.write(self.style.SUCCESS(f"Reconciled site stats; {'corrected' if corrected else 'already accurate'}."))
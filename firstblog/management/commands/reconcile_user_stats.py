@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from firstblog.user_stats import reconcile_user_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-user dashboard totals from the source tables and fix rows that drifted (run periodically)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Users recomputed per transaction')
+
+    def handle(self, *args, **options):
+        corrected = reconcile_user_stats(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Reconciled user stats; {corrected} rows created or corrected.'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from firstblog.models import BlogPost, Category, Comment, CommentLike, PostLike
+
+
+def count_subquery(queryset, field):
+    """Correlated COUNT(*) of ``queryset`` rows whose ``field`` matches the outer pk"""
+    counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored like, comment and post counters from the source tables'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            posts = BlogPost.objects.update(
+                likes_count=count_subquery(PostLike.objects.all(), 'post'),
+                comment_count=count_subquery(Comment.objects.filter(parent=None), 'post'),
+            )
+            comments = Comment.objects.update(
+                likes_count=count_subquery(CommentLike.objects.all(), 'comment'),
+            )
+            categories = Category.objects.update(
+                post_count=count_subquery(BlogPost.objects.filter(status='published'), 'category'),
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Recounted {posts} posts, {comments} comments and {categories} categories.'
+        ))
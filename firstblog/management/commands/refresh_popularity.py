@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from firstblog.caching import invalidate
+from firstblog.popularity import refresh_popularity
+
+
+class Command(BaseCommand):
+    help = 'Recompute the stored popularity score of every blog post'
+
+    def handle(self, *args, **options):
+        updated = refresh_popularity()
+        invalidate('popular')
+        self.stdout.write(self.style.SUCCESS(f'Refreshed popularity for {updated} posts.'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from firstblog.caching import invalidate
+from firstblog.models import BlogPost
+
+
+class Command(BaseCommand):
+    help = 'Recompute the sanitized HTML, excerpt, plain text, word count and reading time of every post'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Number of posts updated per query')
+
+    def handle(self, *args, **options):
+        posts = BlogPost.objects.only('post').order_by('pk')
+        total = 0
+        batch = []
+        for post in posts.iterator(chunk_size=options['batch_size']):
+            post.render_derived()
+            batch.append(post)
+            if len(batch) >= options['batch_size']:
+                total += BlogPost.objects.bulk_update(batch, BlogPost.DERIVED_FIELDS)
+                batch = []
+        if batch:
+            total += BlogPost.objects.bulk_update(batch, BlogPost.DERIVED_FIELDS)
+
+        invalidate('feed', 'categories', 'recent', 'popular')
+        self.stdout.write(self.style.SUCCESS(f'Rendered {total} posts.'))
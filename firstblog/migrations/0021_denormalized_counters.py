@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:17
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(queryset, field):
+    counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def populate_counters(apps, schema_editor):
+    BlogPost = apps.get_model('firstblog', 'BlogPost')
+    Category = apps.get_model('firstblog', 'Category')
+    Comment = apps.get_model('firstblog', 'Comment')
+    CommentLike = apps.get_model('firstblog', 'CommentLike')
+    PostLike = apps.get_model('firstblog', 'PostLike')
+
+    BlogPost.objects.update(
+        likes_count=count_subquery(PostLike.objects.all(), 'post'),
+        comment_count=count_subquery(Comment.objects.filter(parent=None), 'post'),
+    )
+    Comment.objects.update(likes_count=count_subquery(CommentLike.objects.all(), 'comment'))
+    Category.objects.update(post_count=count_subquery(BlogPost.objects.filter(status='published'), 'category'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('firstblog', '0020_alter_blogpost_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of top-level comments for this post'),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of likes for this post'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of published posts in this category'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of likes for this comment'),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
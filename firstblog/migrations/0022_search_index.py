@@ -0,0 +1,94 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:20
+
+import re
+from collections import Counter
+from html import unescape
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Frozen copies of the tokenizer and indexer in firstblog/search.py as they
+# were when this migration was written, so replaying it never depends on
+# (or invalidates caches through) the current application code.
+STOP_WORDS = frozenset('''
+    a an and are as at be but by for from has have he her his i if in into is it its
+    me my no not of on or our she so than that the their them then there these they
+    this to us was we were what when which who will with you your
+'''.split())
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+TAG_RE = re.compile(r'<(script|style)\b.*?</\1\s*>|<[^>]+>', re.IGNORECASE | re.DOTALL)
+TITLE_WEIGHT = 3
+
+
+def tokenize(text):
+    return [
+        token[:64] for token in TOKEN_RE.findall(text.lower())
+        if len(token) > 1 and token not in STOP_WORDS
+    ]
+
+
+def index_batch(apps, posts):
+    SearchDocument = apps.get_model('firstblog', 'SearchDocument')
+    SearchTerm = apps.get_model('firstblog', 'SearchTerm')
+    documents = {}
+    for post in posts:
+        text = ' '.join(unescape(TAG_RE.sub(' ', post.post or '')).split())
+        counts = Counter(tokenize(text))
+        counts.update(tokenize(post.author.username if post.author_id else ''))
+        for term in tokenize(post.title):
+            counts[term] += TITLE_WEIGHT
+        documents[post.pk] = (text, counts)
+    SearchDocument.objects.bulk_create([
+        SearchDocument(post_id=post_id, text=text, length=sum(counts.values()))
+        for post_id, (text, counts) in documents.items()
+    ])
+    document_ids = dict(SearchDocument.objects.filter(post__in=documents).values_list('post_id', 'pk'))
+    SearchTerm.objects.bulk_create([
+        SearchTerm(document_id=document_ids[post_id], term=term, frequency=frequency)
+        for post_id, (_, counts) in documents.items()
+        for term, frequency in counts.items()
+    ], batch_size=1000)
+
+
+def index_existing_posts(apps, schema_editor):
+    BlogPost = apps.get_model('firstblog', 'BlogPost')
+    batch = []
+    for post in BlogPost.objects.select_related('author').order_by('pk').iterator(chunk_size=500):
+        batch.append(post)
+        if len(batch) >= 500:
+            index_batch(apps, batch)
+            batch = []
+    if batch:
+        index_batch(apps, batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('firstblog', '0021_denormalized_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField(blank=True)),
+                ('length', models.PositiveIntegerField(default=0, help_text='Number of indexed terms in the document')),
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='search_document', to='firstblog.blogpost')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('frequency', models.PositiveIntegerField(default=1)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='firstblog.searchdocument')),
+            ],
+            options={
+                'unique_together': {('term', 'document')},
+            },
+        ),
+        migrations.RunPython(index_existing_posts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:23
+
+import math
+from datetime import datetime, timezone
+
+from django.db import migrations, models
+
+
+def populate_popularity(apps, schema_editor):
+    BlogPost = apps.get_model('firstblog', 'BlogPost')
+    epoch = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for post in BlogPost.objects.only('view_count', 'likes_count', 'date_created').iterator():
+        engagement = max(post.view_count + post.likes_count * 10, 1)
+        age_bonus = (post.date_created - epoch).total_seconds() / (7 * 24 * 3600)
+        BlogPost.objects.filter(pk=post.pk).update(popularity_score=round(math.log10(engagement) + age_bonus, 6))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('firstblog', '0022_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='popularity_score',
+            field=models.FloatField(default=0, editable=False, help_text='Time-decayed ranking from views and likes'),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['status', '-popularity_score'], name='post_status_popularity_idx'),
+        ),
+        migrations.RunPython(populate_popularity, migrations.RunPython.noop),
+    ]
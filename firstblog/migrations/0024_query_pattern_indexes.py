@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('firstblog', '0023_popularity_score'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['status', '-date_updated', '-date_created'], name='post_status_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['status', '-date_created'], name='post_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['category', 'status', '-date_created'], name='post_category_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['author', 'status', '-date_created'], name='post_author_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['-view_count', '-date_created'], name='post_view_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'parent', 'date_created'], name='comment_post_parent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['author', '-date_created'], name='comment_author_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userpostview',
+            index=models.Index(fields=['user', '-viewed_at'], name='postview_user_viewed_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('firstblog', '0024_query_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorprofile',
+            name='picture_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Resized copies of the profile picture (see images.py)'),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Resized copies of the image (see images.py)'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:40
+
+from django.db import migrations, models
+
+from firstblog.rendering import render_post
+
+
+def populate_rendered_fields(apps, schema_editor):
+    BlogPost = apps.get_model('firstblog', 'BlogPost')
+    batch = []
+    for post in BlogPost.objects.only('post').iterator(chunk_size=200):
+        for field, value in render_post(post.post).items():
+            setattr(post, field, value)
+        batch.append(post)
+        if len(batch) >= 200:
+            BlogPost.objects.bulk_update(batch, ['post_html', 'excerpt', 'plain_text', 'word_count', 'reading_time'])
+            batch = []
+    BlogPost.objects.bulk_update(batch, ['post_html', 'excerpt', 'plain_text', 'word_count', 'reading_time'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('firstblog', '0026_outbound_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False, help_text='Start of the sanitized HTML with tags kept balanced'),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='plain_text',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='post_html',
+            field=models.TextField(blank=True, editable=False, help_text='Sanitized post HTML (see rendering.py)'),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='reading_time',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, help_text='Estimated reading time in minutes'),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_rendered_fields, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:49
+
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def nested_intervals(rows):
+    """Frozen copy of the thread layout this migration introduced: comment id -> (thread, lft, rgt, depth)"""
+    roots, children = [], defaultdict(list)
+    for pk, parent_id in rows:
+        (children[parent_id] if parent_id else roots).append(pk)
+
+    intervals = {}
+    for root in roots:
+        counter, lft = 2, {root: 1}
+        stack = [(root, iter(children[root]))]
+        while stack:
+            pk, replies = stack[-1]
+            reply = next(replies, None)
+            if reply is None:
+                stack.pop()
+                intervals[pk] = (root, lft.pop(pk), counter, len(stack))
+            else:
+                lft[reply] = counter
+                stack.append((reply, iter(children[reply])))
+            counter += 1
+    return intervals
+
+
+def populate_thread_intervals(apps, schema_editor):
+    Comment = apps.get_model('firstblog', 'Comment')
+    rows = Comment.objects.order_by('post_id', 'date_created', 'pk').values_list('pk', 'parent_id')
+    Comment.objects.bulk_update(
+        [Comment(pk=pk, thread_id=thread, lft=lft, rgt=rgt, depth=depth) for pk, (thread, lft, rgt, depth) in nested_intervals(rows).items()],
+        ['thread', 'lft', 'rgt', 'depth'], batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('firstblog', '0027_rendered_post_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='lft',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='rgt',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='thread',
+            field=models.ForeignKey(blank=True, db_index=False, editable=False, help_text='Top-level comment of this thread', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='thread_comments', to='firstblog.comment'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['thread', 'lft'], name='comment_thread_lft_idx'),
+        ),
+        migrations.RunPython(populate_thread_intervals, migrations.RunPython.noop),
+    ]
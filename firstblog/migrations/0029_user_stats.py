@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from firstblog.user_stats import reconcile_user_stats
+
+
+def populate_user_stats(apps, schema_editor):
+    reconcile_user_stats(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('firstblog', '0028_comment_thread_intervals'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts', models.PositiveIntegerField(default=0, help_text='Posts written that are not archived')),
+                ('post_likes', models.PositiveIntegerField(default=0, help_text="Likes received on the user's posts")),
+                ('comments', models.PositiveIntegerField(default=0, help_text='Comments and replies written')),
+                ('comment_likes', models.PositiveIntegerField(default=0, help_text="Likes received on the user's comments")),
+                ('posts_viewed', models.PositiveIntegerField(default=0, help_text='Distinct posts the user has viewed')),
+                ('date_reconciled', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'User Stats',
+                'verbose_name_plural': 'User Stats',
+            },
+        ),
+        migrations.RunPython(populate_user_stats, migrations.RunPython.noop),
+    ]
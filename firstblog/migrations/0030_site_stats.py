@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:18
+
+from django.db import migrations, models
+
+from firstblog.site_stats import reconcile_site_stats
+
+
+def populate_site_stats(apps, schema_editor):
+    reconcile_site_stats(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('firstblog', '0029_user_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posts', models.PositiveIntegerField(default=0, help_text='All posts, whatever their status')),
+                ('authors', models.PositiveIntegerField(default=0, help_text='Users with at least one post')),
+                ('comments', models.PositiveIntegerField(default=0, help_text='Comments and replies')),
+                ('date_reconciled', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Site Stats',
+                'verbose_name_plural': 'Site Stats',
+            },
+        ),
+        migrations.RunPython(populate_site_stats, migrations.RunPython.noop),
+    ]
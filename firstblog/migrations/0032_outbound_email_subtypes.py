@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('firstblog', '0031_pending_views'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboundemail',
+            name='content_subtype',
+            field=models.CharField(default='plain', help_text='MIME subtype of the body, e.g. html', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='outboundemail',
+            name='encoding',
+            field=models.CharField(blank=True, help_text='Charset of the message; blank for DEFAULT_CHARSET', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='outboundemail',
+            name='mixed_subtype',
+            field=models.CharField(default='mixed', max_length=50),
+        ),
+    ]
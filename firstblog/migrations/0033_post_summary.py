@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:41
+
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+from firstblog.rendering import SUMMARY_WORDS
+
+
+def populate_summaries(apps, schema_editor):
+    BlogPost = apps.get_model('firstblog', 'BlogPost')
+    batch = []
+    for post in BlogPost.objects.only('plain_text').iterator(chunk_size=200):
+        post.summary = Truncator(post.plain_text).words(SUMMARY_WORDS)
+        batch.append(post)
+        if len(batch) >= 200:
+            BlogPost.objects.bulk_update(batch, ['summary'])
+            batch = []
+    BlogPost.objects.bulk_update(batch, ['summary'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('firstblog', '0032_outbound_email_subtypes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='summary',
+            field=models.TextField(blank=True, editable=False, help_text='First words of the plain text, shown on listing cards'),
+        ),
+        migrations.RunPython(populate_summaries, migrations.RunPython.noop),
+    ]
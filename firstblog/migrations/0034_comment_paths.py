@@ -0,0 +1,101 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:00
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+# Frozen copies of the layouts before and after this migration (see
+# firstblog/comments.py), so replaying it never depends on application code.
+PATH_SEGMENT = 7
+MAX_DEPTH = 100
+
+
+def path_segment(pk):
+    digits = ''
+    while pk:
+        pk, digit = divmod(pk, 36)
+        digits = '0123456789abcdefghijklmnopqrstuvwxyz'[digit] + digits
+    return digits.rjust(PATH_SEGMENT, '0')
+
+
+def populate_paths(apps, schema_editor):
+    Comment = apps.get_model('firstblog', 'Comment')
+    paths, batch = {}, []
+    for pk, parent_id in Comment.objects.order_by('pk').values_list('pk', 'parent_id').iterator(chunk_size=1000):
+        if parent_id is None:
+            paths[pk] = (None, '')
+            continue
+        grandparent_id, parent_path = paths[parent_id]
+        if len(parent_path) // PATH_SEGMENT >= MAX_DEPTH:
+            paths[pk] = (grandparent_id, parent_path)  # too deep: attach to the grandparent
+        else:
+            paths[pk] = (parent_id, parent_path + path_segment(parent_id))
+        batch.append(Comment(pk=pk, parent_id=paths[pk][0], path=paths[pk][1]))
+        if len(batch) >= 1000:
+            Comment.objects.bulk_update(batch, ['parent', 'path'])
+            batch = []
+    Comment.objects.bulk_update(batch, ['parent', 'path'])
+
+
+def populate_thread_intervals(apps, schema_editor):
+    Comment = apps.get_model('firstblog', 'Comment')
+    roots, children = [], defaultdict(list)
+    for pk, parent_id in Comment.objects.order_by('post_id', 'date_created', 'pk').values_list('pk', 'parent_id'):
+        (children[parent_id] if parent_id else roots).append(pk)
+    batch = []
+    for root in roots:
+        counter, lft = 2, {root: 1}
+        stack = [(root, iter(children[root]))]
+        while stack:
+            pk, replies = stack[-1]
+            reply = next(replies, None)
+            if reply is None:
+                stack.pop()
+                batch.append(Comment(pk=pk, thread_id=root, lft=lft.pop(pk), rgt=counter, depth=len(stack)))
+            else:
+                lft[reply] = counter
+                stack.append((reply, iter(children[reply])))
+            counter += 1
+    Comment.objects.bulk_update(batch, ['thread', 'lft', 'rgt', 'depth'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('firstblog', '0033_post_summary'),
+    ]
+
+    operations = [
+        # Only does anything when migrating backwards, once the interval fields are back
+        migrations.RunPython(migrations.RunPython.noop, populate_thread_intervals),
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='comment_thread_lft_idx',
+        ),
+        migrations.RemoveField(
+            model_name='comment',
+            name='depth',
+        ),
+        migrations.RemoveField(
+            model_name='comment',
+            name='lft',
+        ),
+        migrations.RemoveField(
+            model_name='comment',
+            name='rgt',
+        ),
+        migrations.RemoveField(
+            model_name='comment',
+            name='thread',
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, editable=False, help_text='Ids of the ancestors, root first', max_length=700),
+        ),
+        migrations.RunPython(populate_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['path'], name='comment_path_idx'),
+        ),
+    ]
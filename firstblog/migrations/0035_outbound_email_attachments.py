@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('firstblog', '0034_comment_paths'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboundemail',
+            name='attachments',
+            field=models.JSONField(default=list, help_text='{filename, mimetype, content, base64} objects'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:17
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('firstblog', '0035_outbound_email_attachments'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pendingview',
+            name='viewed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='userpostview',
+            name='viewed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -1,6 +1,9 @@
 # models.py
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin, BaseUserManager
+from django.utils import timezone
+
+from .rendering import render_post
 
 
 class CustomUserManager(BaseUserManager):
@@ -67,6 +70,7 @@ class AuthorProfile(models.Model):
     bio = models.TextField(blank=True)
     website = models.URLField(blank=True)
     profile_picture = models.ImageField(null=True, blank=True, upload_to='author_profiles/')
+    picture_variants = models.JSONField(default=dict, blank=True, editable=False, help_text="Resized copies of the profile picture (see images.py)")
     linkedin_url = models.URLField(blank=True, help_text="Your LinkedIn profile URL")
     twitter_url = models.URLField(blank=True, help_text="Your Twitter profile URL")
     facebook_url = models.URLField(blank=True, help_text="Your Facebook profile URL")
@@ -80,7 +84,14 @@ class BlogPost(models.Model):
     category = models.ForeignKey('Category', on_delete=models.SET_NULL, null=True, blank=True, related_name='posts')
     title = models.CharField(max_length=100)
     add_image = models.ImageField(null=True, blank=True, upload_to='image/')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, help_text="Resized copies of the image (see images.py)")
     post = models.TextField()
+    post_html = models.TextField(blank=True, editable=False, help_text="Sanitized post HTML (see rendering.py)")
+    excerpt = models.TextField(blank=True, editable=False, help_text="Start of the sanitized HTML with tags kept balanced")
+    plain_text = models.TextField(blank=True, editable=False)
+    summary = models.TextField(blank=True, editable=False, help_text="First words of the plain text, shown on listing cards")
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    reading_time = models.PositiveSmallIntegerField(default=0, editable=False, help_text="Estimated reading time in minutes")
     status = models.CharField(max_length=10, choices=[('draft', 'Draft'), ('published', 'Published'), ('archived', 'Archived')], default='draft')
     date_created = models.DateTimeField(auto_now_add=True)
     date_updated = models.DateTimeField(auto_now=True)
@@ -88,28 +99,54 @@ class BlogPost(models.Model):
         default=0,
         help_text="Number of times product has been viewed"
     )
+    likes_count = models.PositiveIntegerField(default=0, editable=False, help_text="Number of likes for this post")
+    comment_count = models.PositiveIntegerField(default=0, editable=False, help_text="Number of top-level comments for this post")
+    popularity_score = models.FloatField(default=0, editable=False, help_text="Time-decayed ranking from views and likes")
 
     class Meta:
         ordering = ['-date_updated', '-date_created']
         verbose_name = "post"
         verbose_name_plural = "posts"
+        indexes = [
+            models.Index(fields=['status', '-popularity_score'], name='post_status_popularity_idx'),
+            models.Index(fields=['status', '-date_updated', '-date_created'], name='post_status_updated_idx'),
+            models.Index(fields=['status', '-date_created'], name='post_status_created_idx'),
+            models.Index(fields=['category', 'status', '-date_created'], name='post_category_created_idx'),
+            models.Index(fields=['author', 'status', '-date_created'], name='post_author_created_idx'),
+            models.Index(fields=['-view_count', '-date_created'], name='post_view_count_idx'),
+        ]
 
     def __str__(self):
         return self.title
     
+    DERIVED_FIELDS = ['post_html', 'excerpt', 'plain_text', 'summary', 'word_count', 'reading_time']
+    # Full bodies that listing pages never display
+    LISTING_DEFERRED = ['post', 'post_html', 'plain_text']
+
+    def render_derived(self):
+        """Recompute the fields derived from the post body"""
+        for field, value in render_post(self.post).items():
+            setattr(self, field, value)
+
     def save(self, *args, **kwargs):
-        """Override save to add custom behavior if needed"""
+        """Keep the derived body fields in step with ``post``"""
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'post' in update_fields:
+            self.render_derived()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, *self.DERIVED_FIELDS}
         return super().save(*args, **kwargs)
     
+    def delete(self, *args, **kwargs):
+        """Delete the post; its comments' dashboard and site totals are adjusted in one go"""
+        from . import site_stats, user_stats
+        with transaction.atomic(using=kwargs.get('using')), user_stats.deferred(), site_stats.deferred():
+            return super().delete(*args, **kwargs)
+
     def get_comment_count(self):
         """Return count of top-level comments only (not replies)"""
-        return self.comments.filter(parent=None).count()
+        return self.comment_count
 
-    @property
-    def likes_count(self):
-        """Return the number of likes for this Post"""
-        return self.post_likes.count()
-    
     
     def is_liked_by(self, user):
         """Check if a specific user has liked this comment"""
@@ -118,26 +155,100 @@ class BlogPost(models.Model):
         return False
     
     def increment_view_count(self, user=None):
-        """Increment view count without updating date_updated"""
-        from django.db.models import F
-        BlogPost.objects.filter(pk=self.pk).update(view_count=F('view_count') + 1)
-        if user and user.is_authenticated:
-            UserPostView.objects.get_or_create(user=user, post=self)
-        self.refresh_from_db(fields=['view_count'])
+        """Record a view in the buffered view counter without touching date_updated.
+
+        The database is updated in batches by ``firstblog.view_counter``; the
+        in-memory count is bumped so the current page includes this view.
+        """
+        from .view_counter import view_buffer
+        user_id = user.pk if user and user.is_authenticated else None
+        view_buffer.record(self.pk, user_id)
+        self.view_count += 1
+
+class SearchDocument(models.Model):
+    """Plain-text copy of a post used by the full-text search index"""
+    post = models.OneToOneField(BlogPost, on_delete=models.CASCADE, related_name='search_document')
+    text = models.TextField(blank=True)
+    length = models.PositiveIntegerField(default=0, help_text="Number of indexed terms in the document")
+
+    def __str__(self):
+        return f"Search document for {self.post.title}"
+
+
+class SearchTerm(models.Model):
+    """Inverted index entry: how often a term occurs in a search document"""
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name='terms')
+    term = models.CharField(max_length=64)
+    frequency = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        unique_together = ('term', 'document')
+
+    def __str__(self):
+        return f"{self.term} ({self.frequency})"
+
 
 class UserPostView(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='post_views')
     post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='user_views')
-    viewed_at = models.DateTimeField(auto_now_add=True)
+    # Set from the journaled view (view_counter.py), not when the row is written
+    viewed_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
         unique_together = ['user', 'post']
         ordering = ['-viewed_at']
+        indexes = [
+            models.Index(fields=['user', '-viewed_at'], name='postview_user_viewed_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} viewed {self.post.title}"
+
+
+class PendingView(models.Model):
+    """A post view journaled by ``view_counter.py`` and not yet added to the view counts"""
+    # No constraints or indexes: rows are appended on every view and only read in primary key order
+    post = models.ForeignKey(BlogPost, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, related_name='+')
+    user = models.ForeignKey(CustomUser, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False, null=True, related_name='+')
+    viewed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"View of post {self.post_id}"
+
+
+class UserStats(models.Model):
+    """Dashboard totals for one user, kept up to date by ``user_stats.py`` and reconciled periodically"""
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    posts = models.PositiveIntegerField(default=0, help_text="Posts written that are not archived")
+    post_likes = models.PositiveIntegerField(default=0, help_text="Likes received on the user's posts")
+    comments = models.PositiveIntegerField(default=0, help_text="Comments and replies written")
+    comment_likes = models.PositiveIntegerField(default=0, help_text="Likes received on the user's comments")
+    posts_viewed = models.PositiveIntegerField(default=0, help_text="Distinct posts the user has viewed")
+    date_reconciled = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "User Stats"
+        verbose_name_plural = "User Stats"
+
+    def __str__(self):
+        return f"Stats for {self.user.username}"
     
 
+class SiteStats(models.Model):
+    """Site-wide totals for the about page: a single row kept up to date by ``site_stats.py`` and reconciled periodically"""
+    posts = models.PositiveIntegerField(default=0, help_text="All posts, whatever their status")
+    authors = models.PositiveIntegerField(default=0, help_text="Users with at least one post")
+    comments = models.PositiveIntegerField(default=0, help_text="Comments and replies")
+    date_reconciled = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Site Stats"
+        verbose_name_plural = "Site Stats"
+
+    def __str__(self):
+        return "Site stats"
+
+
 class PostLike(models.Model):
     post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='post_likes')
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='post_likes')
@@ -153,26 +264,84 @@ class PostLike(models.Model):
         return f"{self.user.username} likes Post by {self.post.author.username}"
 
 class Comment(models.Model):
+    # Materialized path (see comments.py): the ids of a comment's ancestors, root
+    # first, as fixed-width base-36 segments. MAX_DEPTH keeps the indexed column
+    # within MySQL's 3072-byte key limit.
+    PATH_SEGMENT = 7
+    MAX_DEPTH = 100
+
     post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='comments')
     author = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='user_comments')
     text = models.TextField()
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
+    path = models.CharField(max_length=PATH_SEGMENT * MAX_DEPTH, blank=True, editable=False, help_text="Ids of the ancestors, root first")
     date_created = models.DateTimeField(auto_now_add=True)
     date_updated = models.DateTimeField(auto_now=True)
+    likes_count = models.PositiveIntegerField(default=0, editable=False, help_text="Number of likes for this comment")
 
     class Meta:
         verbose_name = "Comment"
         verbose_name_plural = "Comments"
         ordering = ['date_created']
+        indexes = [
+            models.Index(fields=['post', 'parent', 'date_created'], name='comment_post_parent_idx'),
+            models.Index(fields=['author', '-date_created'], name='comment_author_created_idx'),
+            models.Index(fields=['path'], name='comment_path_idx'),
+        ]
 
     def __str__(self):
         return f"{self.author.username}: {self.text[:50]}"
-    
+
+    @classmethod
+    def path_segment(cls, pk):
+        """``pk`` as a path segment; fixed width, so segments sort like the ids"""
+        digits = ''
+        while pk:
+            pk, digit = divmod(pk, 36)
+            digits = '0123456789abcdefghijklmnopqrstuvwxyz'[digit] + digits
+        return digits.rjust(cls.PATH_SEGMENT, '0')
+
     @property
-    def likes_count(self):
-        """Return the number of likes for this comment"""
-        return self.likes.count()
-    
+    def depth(self):
+        return len(self.path) // self.PATH_SEGMENT
+
+    def save(self, *args, **kwargs):
+        """Give a new reply its place in the thread; the INSERT is the only write"""
+        if self._state.adding and self.parent_id is not None and not self.path:
+            parent = self.parent
+            if parent.depth >= self.MAX_DEPTH:
+                # Too deep to index: answer alongside the parent instead
+                self.parent_id = parent.parent_id
+                self.path = parent.path
+            else:
+                self.path = parent.path + self.path_segment(parent.pk)
+        return super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        """Delete the comment with all its replies in one range query"""
+        from . import site_stats, user_stats
+        with transaction.atomic(using=kwargs.get('using')), user_stats.deferred(), site_stats.deferred():
+            return self.subtree().delete()
+
+    def descendant_range(self):
+        """Paths of every reply below this comment lie in ``[start, end)``"""
+        return self.path + self.path_segment(self.pk), self.path + self.path_segment(self.pk + 1)
+
+    def subtree(self):
+        """This comment and every reply below it, each comment before its replies"""
+        start, end = self.descendant_range()
+        return Comment.objects.filter(models.Q(pk=self.pk) | models.Q(path__gte=start, path__lt=end)).order_by('path', 'pk')
+
+    def descendants(self):
+        start, end = self.descendant_range()
+        return Comment.objects.filter(path__gte=start, path__lt=end).order_by('path', 'pk')
+
+    def descendant_count(self):
+        """Replies at any depth; counted without a query on comments from ``comments.load_comment_tree``"""
+        if hasattr(self, '_descendant_count'):
+            return self._descendant_count
+        return self.descendants().count()
+
     def is_liked_by(self, user):
         """Check if a specific user has liked this comment"""
         if user.is_authenticated:
@@ -199,6 +368,7 @@ class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
     date_created = models.DateTimeField(auto_now_add=True)
+    post_count = models.PositiveIntegerField(default=0, editable=False, help_text="Number of published posts in this category")
     
     class Meta:
         verbose_name = "Category"
@@ -207,11 +377,6 @@ class Category(models.Model):
     
     def __str__(self):
         return self.name
-    
-    @property
-    def post_count(self):
-        """Return count of posts in this category"""
-        return self.posts.count()
 
 class AuthorApplication(models.Model):
     STATUS_CHOICES = [
@@ -236,4 +401,43 @@ class AuthorApplication(models.Model):
         ordering = ['-date_applied']
 
     def __str__(self):
-        return f"Application from {self.name} ({self.email})"
\ No newline at end of file
+        return f"Application from {self.name} ({self.email})"
+
+class OutboundEmail(models.Model):
+    """A message accepted by the queued email backend and sent later by ``send_queued_mail``"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    subject = models.TextField()
+    body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=255)
+    to = models.JSONField(default=list)
+    cc = models.JSONField(default=list)
+    bcc = models.JSONField(default=list)
+    reply_to = models.JSONField(default=list)
+    headers = models.JSONField(default=dict)
+    alternatives = models.JSONField(default=list, help_text="[content, mimetype] pairs, e.g. the HTML version")
+    attachments = models.JSONField(default=list, help_text="{filename, mimetype, content, base64} objects")
+    content_subtype = models.CharField(max_length=50, default='plain', help_text="MIME subtype of the body, e.g. html")
+    mixed_subtype = models.CharField(max_length=50, default='mixed')
+    encoding = models.CharField(max_length=50, blank=True, help_text="Charset of the message; blank for DEFAULT_CHARSET")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now, help_text="Queued messages are not sent before this time")
+    last_error = models.TextField(blank=True)
+    date_created = models.DateTimeField(auto_now_add=True)
+    date_sent = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Outbound Email"
+        verbose_name_plural = "Outbound Emails"
+        ordering = ['-date_created']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='email_status_next_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)}"
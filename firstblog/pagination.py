@@ -0,0 +1,202 @@
+# pagination.py
+"""
+Keyset (cursor) pagination.
+
+``Paginator`` runs a ``COUNT(*)`` and then ``LIMIT ... OFFSET``, so page
+1000 makes the database walk 1000 pages of rows first. ``CursorPaginator``
+instead remembers the sort key of the last row on the page and asks for
+rows strictly after it::
+
+    WHERE date_created < %s OR (date_created = %s AND id < %s)
+    ORDER BY date_created DESC, id DESC LIMIT 11
+
+which the composite indexes serve directly, so every page costs the same.
+The primary key is appended to the ordering to make it total. Cursors are
+opaque URL-safe tokens holding the boundary values and the direction.
+
+Sort fields must not be NULL. There are no page numbers: templates get
+``next_query`` / ``previous_query`` links (see
+``main/cursor_pagination.html``). A total is only computed when
+asked for, and then it is approximate: cached for
+``APPROXIMATE_COUNT_TIMEOUT`` seconds.
+"""
+import base64
+import binascii
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from django.http import QueryDict
+
+PARAM = 'cursor'
+
+
+def approximate_count_timeout():
+    return getattr(settings, 'APPROXIMATE_COUNT_TIMEOUT', 300)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class CursorPage:
+    def __init__(self, paginator, object_list, next_cursor, previous_cursor, request=None):
+        self.paginator = paginator
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.request = request
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def _query(self, cursor):
+        params = self.request.GET.copy() if self.request is not None else QueryDict(mutable=True)
+        params.pop('page', None)
+        params[PARAM] = cursor
+        return params.urlencode()
+
+    @property
+    def next_query(self):
+        return self._query(self.next_cursor) if self.has_next() else ''
+
+    @property
+    def previous_query(self):
+        return self._query(self.previous_cursor) if self.has_previous() else ''
+
+    @property
+    def approximate_count(self):
+        return self.paginator.approximate_count()
+
+
+class CursorPaginator:
+    def __init__(self, queryset, per_page, ordering=None):
+        ordering = list(ordering or queryset.query.order_by or queryset.model._meta.ordering)
+        if not any(field.lstrip('-') in ('pk', queryset.model._meta.pk.name) for field in ordering):
+            ordering.append('-pk' if ordering and ordering[-1].startswith('-') else 'pk')
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = ordering
+        self.fields = [field.lstrip('-') for field in ordering]
+
+    # Cursor encoding
+    def encode(self, values, backwards):
+        payload = json.dumps([values, backwards], default=str, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode(self, cursor):
+        try:
+            values, backwards = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            if len(values) != len(self.fields):
+                raise InvalidCursor(cursor)
+            return [self.to_python(field, value) for field, value in zip(self.fields, values)], bool(backwards)
+        except (ValueError, TypeError, binascii.Error, ValidationError) as error:
+            raise InvalidCursor(cursor) from error
+
+    def to_python(self, field, value):
+        meta = self.queryset.model._meta
+        try:
+            model_field = meta.pk if field == 'pk' else meta.get_field(field)
+        except FieldDoesNotExist:
+            return value  # an annotation such as search_rank; JSON keeps numbers as numbers
+        return model_field.to_python(value)
+
+    def row_values(self, obj):
+        return [getattr(obj, field) for field in self.fields]
+
+    # Queries
+    def after(self, values, backwards):
+        """Rows strictly after ``values`` in the sort order (before them when ``backwards``)"""
+        condition = Q()
+        for index, ordering in enumerate(self.ordering):
+            descending = ordering.startswith('-') != backwards
+            lookup = f"{self.fields[index]}__{'lt' if descending else 'gt'}"
+            equal = {field: value for field, value in zip(self.fields[:index], values[:index])}
+            condition |= Q(**equal, **{lookup: values[index]})
+        return condition
+
+    def get_page(self, cursor=None, request=None):
+        """Page after (or before) ``cursor``; an invalid or missing cursor gives the first page"""
+        queryset, values, backwards = self.page_query(cursor)
+        return self.make_page(list(queryset), values, backwards, request)
+
+    async def aget_page(self, cursor=None, request=None):
+        queryset, values, backwards = self.page_query(cursor)
+        return self.make_page([row async for row in queryset], values, backwards, request)
+
+    def page_query(self, cursor):
+        values, backwards = None, False
+        if cursor:
+            try:
+                values, backwards = self.decode(cursor)
+            except InvalidCursor:
+                pass
+
+        queryset = self.queryset
+        ordering = self.ordering
+        if backwards:
+            ordering = [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+        if values is not None:
+            queryset = queryset.filter(self.after(values, backwards))
+        return queryset.order_by(*ordering)[:self.per_page + 1], values, backwards
+
+    def make_page(self, rows, values, backwards, request):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or backwards:
+                next_cursor = self.encode(self.row_values(rows[-1]), False)
+            if values is not None and (has_more or not backwards):
+                previous_cursor = self.encode(self.row_values(rows[0]), True)
+        return CursorPage(self, rows, next_cursor, previous_cursor, request)
+
+    def approximate_count(self):
+        """Row count, cached for a few minutes so it is not recomputed on every page"""
+        if self.queryset.query.is_empty():
+            return 0
+        return cache.get_or_set(self.count_key(), self.queryset.order_by().count, approximate_count_timeout())
+
+    async def aapproximate_count(self):
+        if self.queryset.query.is_empty():
+            return 0
+        key = self.count_key()
+        count = await cache.aget(key)
+        if count is None:
+            count = await self.queryset.order_by().acount()
+            await cache.aset(key, count, approximate_count_timeout())
+        return count
+
+    def count_key(self):
+        sql, params = self.queryset.order_by().query.sql_with_params()
+        return 'firstblog:count:' + hashlib.md5(f'{sql}{params}'.encode()).hexdigest()
+
+
+def paginate(request, queryset, per_page, ordering=None):
+    """Cursor page for ``request`` (reads the ``cursor`` query parameter)"""
+    return CursorPaginator(queryset, per_page, ordering).get_page(request.GET.get(PARAM), request)
+
+
+async def apaginate(request, queryset, per_page, ordering=None):
+    return await CursorPaginator(queryset, per_page, ordering).aget_page(request.GET.get(PARAM), request)
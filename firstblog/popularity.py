@@ -0,0 +1,53 @@
+# popularity.py
+"""
+Stored popularity ranking for the "popular posts" sidebar.
+
+``BlogPost.popularity_score`` is ``log10(views + likes * 10)`` plus a bonus
+that grows with the post's creation time, so a post needs ten times the
+engagement of one published ``DECAY_SECONDS`` later to rank the same. The
+decay is baked into the score itself: scores only change when a post's
+views or likes change, and the sidebar is an indexed top-N lookup.
+"""
+import math
+from datetime import datetime, timezone
+
+from django.db.models import Case, FloatField, Value, When
+
+LIKE_WEIGHT = 10
+DECAY_SECONDS = 7 * 24 * 3600
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def popularity_score(view_count, likes_count, date_created):
+    engagement = max(view_count + likes_count * LIKE_WEIGHT, 1)
+    age_bonus = (date_created - EPOCH).total_seconds() / DECAY_SECONDS if date_created else 0
+    return round(math.log10(engagement) + age_bonus, 6)
+
+
+def refresh_popularity(post_ids=None, batch_size=500):
+    """Recompute stored scores for ``post_ids`` (all posts when None) in batched UPDATEs"""
+    from .models import BlogPost
+
+    posts = BlogPost.objects.all() if post_ids is None else BlogPost.objects.filter(pk__in=list(post_ids))
+    rows = posts.order_by().values_list('pk', 'view_count', 'likes_count', 'date_created')
+
+    updated = 0
+    batch = []
+    for row in rows.iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            updated += _write_scores(batch)
+            batch = []
+    if batch:
+        updated += _write_scores(batch)
+    return updated
+
+
+def _write_scores(rows):
+    from .models import BlogPost
+
+    scores = {pk: popularity_score(views, likes, created) for pk, views, likes, created in rows}
+    return BlogPost.objects.filter(pk__in=scores).update(popularity_score=Case(
+        *[When(pk=pk, then=Value(score)) for pk, score in scores.items()],
+        output_field=FloatField(),
+    ))
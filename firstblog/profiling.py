@@ -0,0 +1,149 @@
+# profiling.py
+"""
+Per-request SQL and timing instrumentation.
+
+``RequestProfilingMiddleware`` is switched on with ``REQUEST_PROFILING``.
+For every request it records the number of queries and the time spent in
+the database (through ``connection.execute_wrapper``, so it works with
+``DEBUG = False``), and the time spent rendering templates (through the
+``ProfiledTemplates`` backend set in ``TEMPLATES``, whose templates time
+themselves while a request is being profiled). It also counts
+repeated statements: the same SQL run more than once with different
+parameters is usually an N+1.
+
+The numbers go out as a ``Server-Timing`` header, which browser dev tools
+show in the network panel, and as one JSON log line on the
+``firstblog.profiling`` logger. Requests slower than
+``REQUEST_PROFILING_SLOW_MS`` are logged at WARNING level, together with
+their slowest statements.
+"""
+import json
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import DjangoTemplates
+
+logger = logging.getLogger('firstblog.profiling')
+
+_current = ContextVar('firstblog_request_profile', default=None)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.queries = []  # (sql, params, seconds)
+        self.template_time = 0.0
+        self.template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, params, time.perf_counter() - start))
+
+    @property
+    def db_time(self):
+        return sum(duration for _, _, duration in self.queries)
+
+    def repeated(self):
+        """Statements run more than once, with how often; identical parameters count as duplicates"""
+        similar = Counter(sql for sql, _, _ in self.queries)
+        exact = Counter((sql, repr(params)) for sql, params, _ in self.queries)
+        return {
+            'duplicates': sum(count - 1 for count in exact.values() if count > 1),
+            'similar': {sql: count for sql, count in similar.items() if count > 1},
+        }
+
+    def slowest(self, limit):
+        ranked = sorted(self.queries, key=lambda query: query[2], reverse=True)[:limit]
+        return [{'sql': sql, 'ms': round(duration * 1000, 3)} for sql, _, duration in ranked]
+
+
+class ProfiledTemplate:
+    """A backend template whose top-level renders add to the current request profile"""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        profile = _current.get()
+        if profile is None:
+            return self.template.render(context, request)
+
+        profile.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            profile.template_depth -= 1
+            if not profile.template_depth:
+                profile.template_time += time.perf_counter() - start
+
+
+class ProfiledTemplates(DjangoTemplates):
+    """``DjangoTemplates`` handing out ``ProfiledTemplate`` wrappers"""
+
+    def from_string(self, template_code):
+        return ProfiledTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return ProfiledTemplate(super().get_template(template_name))
+
+
+class RequestProfilingMiddleware:
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'REQUEST_PROFILING_SLOW_MS', 500)
+        self.slow_queries = getattr(settings, 'REQUEST_PROFILING_SLOW_QUERIES', 5)
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        token = _current.set(profile)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - start
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={profile.db_time * 1000:.1f};desc="{len(profile.queries)} queries"',
+            f'tpl;dur={profile.template_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+        self.log(request, response, profile, total)
+        return response
+
+    def log(self, request, response, profile, total):
+        repeated = profile.repeated()
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 3),
+            'db_ms': round(profile.db_time * 1000, 3),
+            'template_ms': round(profile.template_time * 1000, 3),
+            'queries': len(profile.queries),
+            'duplicate_queries': repeated['duplicates'],
+            'repeated_statements': len(repeated['similar']),
+        }
+        if total * 1000 >= self.slow_ms:
+            record['slowest_queries'] = profile.slowest(self.slow_queries)
+            record['repeated'] = sorted(repeated['similar'].items(), key=lambda item: item[1], reverse=True)[:self.slow_queries]
+            logger.warning(json.dumps(record))
+        else:
+            logger.info(json.dumps(record))
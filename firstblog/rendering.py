@@ -0,0 +1,141 @@
+# rendering.py
+"""
+Derived forms of a post body, computed once when the post is saved.
+
+``BlogPost.post`` holds the raw TinyMCE HTML. ``render_post`` turns it into
+the fields templates actually need: ``post_html`` (sanitized against an
+allowlist of tags and attributes), ``excerpt`` (the first
+``EXCERPT_LENGTH`` characters of it, cut without breaking tags),
+``plain_text``, ``summary`` (its first ``SUMMARY_WORDS`` words, for
+listing cards), ``word_count`` and ``reading_time`` in minutes. Listing
+pages read these instead of filtering the full body on every request.
+"""
+import math
+import re
+from html import escape, unescape
+from html.parser import HTMLParser
+
+from django.utils.text import Truncator
+
+EXCERPT_LENGTH = 1000
+SUMMARY_WORDS = 50
+WORDS_PER_MINUTE = 200
+
+ALLOWED_TAGS = frozenset('''
+    a abbr b blockquote br caption cite code col colgroup dd del div dl dt em figcaption figure
+    h1 h2 h3 h4 h5 h6 hr i img ins kbd li mark ol p pre q s small span strike strong sub sup
+    table tbody td tfoot th thead tr u ul
+'''.split())
+VOID_TAGS = frozenset(['br', 'col', 'hr', 'img'])
+# Content of these is dropped along with the tag
+DROP_CONTENT_TAGS = frozenset(['script', 'style', 'iframe', 'object', 'embed', 'template', 'noscript'])
+ALLOWED_ATTRIBUTES = {
+    '*': {'class', 'style', 'title', 'dir', 'lang'},
+    'a': {'href', 'target', 'rel'},
+    'img': {'src', 'alt', 'width', 'height'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan', 'scope'},
+    'ol': {'start', 'type'},
+}
+URL_ATTRIBUTES = {'href', 'src'}
+ALLOWED_SCHEMES = {'http', 'https', 'mailto', 'tel'}
+UNSAFE_STYLE_RE = re.compile(r'expression|javascript|url\s*\(|@import|behavior', re.IGNORECASE)
+BLOCK_TAG_RE = re.compile(r'<(script|style)\b.*?</\1\s*>|<[^>]+>', re.IGNORECASE | re.DOTALL)
+
+
+def safe_url(value):
+    value = ''.join(unescape(value).split())
+    scheme, colon, _ = value.partition(':')
+    if colon and '/' not in scheme and '?' not in scheme and '#' not in scheme:
+        return scheme.lower() in ALLOWED_SCHEMES
+    return True  # relative URL
+
+
+class Sanitizer(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.output = []
+        self.open_tags = []
+        self.dropping = 0
+
+    def allowed_attributes(self, tag, attrs):
+        allowed = ALLOWED_ATTRIBUTES['*'] | ALLOWED_ATTRIBUTES.get(tag, set())
+        for name, value in attrs:
+            value = value or ''
+            if name not in allowed:
+                continue
+            if name in URL_ATTRIBUTES and not safe_url(value):
+                continue
+            if name == 'style' and UNSAFE_STYLE_RE.search(unescape(value)):
+                continue
+            yield f' {name}="{escape(unescape(value))}"'
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping += 1
+        elif not self.dropping and tag in ALLOWED_TAGS:
+            self.output.append(f"<{tag}{''.join(self.allowed_attributes(tag, attrs))}>")
+            if tag not in VOID_TAGS:
+                self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS:
+            return
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and self.open_tags and self.open_tags[-1] == tag:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping = max(0, self.dropping - 1)
+        elif not self.dropping and tag in self.open_tags:
+            # Close anything left open inside this element so the output stays well-formed
+            while self.open_tags:
+                open_tag = self.open_tags.pop()
+                self.output.append(f'</{open_tag}>')
+                if open_tag == tag:
+                    break
+
+    def handle_data(self, data):
+        if not self.dropping:
+            self.output.append(escape(data, quote=False))
+
+    def handle_entityref(self, name):
+        if not self.dropping:
+            self.output.append(escape(unescape(f'&{name};'), quote=False))
+
+    def handle_charref(self, name):
+        if not self.dropping:
+            self.output.append(escape(unescape(f'&#{name};'), quote=False))
+
+    def result(self):
+        self.close()
+        return ''.join(self.output) + ''.join(f'</{tag}>' for tag in reversed(self.open_tags))
+
+
+def sanitize_html(html):
+    """Keep only allowlisted tags and attributes; drop scripts, event handlers and javascript: URLs"""
+    sanitizer = Sanitizer()
+    sanitizer.feed(html or '')
+    return sanitizer.result()
+
+
+def html_to_text(html):
+    """Strip tags from post HTML and collapse whitespace"""
+    text = unescape(BLOCK_TAG_RE.sub(' ', html or ''))
+    return ' '.join(text.split())
+
+
+def render_post(html):
+    """All derived fields for a post body, keyed by BlogPost field name"""
+    post_html = sanitize_html(html)
+    plain_text = html_to_text(post_html)
+    word_count = len(plain_text.split())
+    return {
+        'post_html': post_html,
+        'excerpt': Truncator(post_html).chars(EXCERPT_LENGTH, html=True),
+        'plain_text': plain_text,
+        'summary': Truncator(plain_text).words(SUMMARY_WORDS),
+        'word_count': word_count,
+        'reading_time': max(1, math.ceil(word_count / WORDS_PER_MINUTE)) if word_count else 0,
+    }
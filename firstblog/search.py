@@ -0,0 +1,173 @@
+# search.py
+"""
+Full-text search over blog posts.
+
+When a post is saved its title, author and TinyMCE body are reduced to plain
+text and split into terms, which are stored in an inverted index
+(``SearchDocument`` / ``SearchTerm``). Queries are ranked with BM25 inside
+the database, so the same code runs on MySQL in production and SQLite in
+development. The corpus statistics BM25 needs (document count and average
+length) are cached in the ``search`` group, which re-indexing and post
+deletion bump, so a query only reads the index rows for its own terms.
+Queries without any indexable terms fall back to the old
+``icontains`` filter.
+"""
+import math
+import re
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .caching import cached_fragment, invalidate
+from .models import SearchDocument, SearchTerm
+from .rendering import html_to_text
+
+# BM25 tuning constants
+K1 = 1.2
+B = 0.75
+
+# Title words count this many times as often as body words
+TITLE_WEIGHT = 3
+
+STOP_WORDS = frozenset('''
+    a an and are as at be but by for from has have he her his i if in into is it its
+    me my no not of on or our she so than that the their them then there these they
+    this to us was we were what when which who will with you your
+'''.split())
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    """Lowercased search terms in ``text`` without stop words or single characters"""
+    return [
+        token[:64] for token in TOKEN_RE.findall(text.lower())
+        if len(token) > 1 and token not in STOP_WORDS
+    ]
+
+
+def index_post(post):
+    """(Re)build the index entries for a single post"""
+    index_posts([post])
+
+
+def index_posts(posts):
+    """(Re)build the index entries for a batch of posts in one transaction"""
+    posts = list(posts)
+    documents = {}
+    for post in posts:
+        text = post.plain_text or html_to_text(post.post)
+        counts = Counter(tokenize(text))
+        counts.update(tokenize(post.author.username if post.author_id else ''))
+        for term in tokenize(post.title):
+            counts[term] += TITLE_WEIGHT
+        documents[post.pk] = (text, counts)
+
+    with transaction.atomic():
+        SearchTerm.objects.filter(document__post__in=documents).delete()
+        SearchDocument.objects.filter(post__in=documents).delete()
+        SearchDocument.objects.bulk_create([
+            SearchDocument(post_id=post_id, text=text, length=sum(counts.values()))
+            for post_id, (text, counts) in documents.items()
+        ])
+        # Not every backend returns primary keys from bulk_create, so look them up
+        document_ids = dict(SearchDocument.objects.filter(post__in=documents).values_list('post_id', 'pk'))
+        SearchTerm.objects.bulk_create([
+            SearchTerm(document_id=document_ids[post_id], term=term, frequency=frequency)
+            for post_id, (_, counts) in documents.items()
+            for term, frequency in counts.items()
+        ], batch_size=1000)
+    invalidate('search')
+
+
+def compute_corpus_stats():
+    stats = SearchDocument.objects.aggregate(total=Count('pk'), length=Sum('length'))
+    total = stats['total'] or 0
+    return total, (stats['length'] or 0) / total if total else 1
+
+
+def corpus_stats():
+    """``(document count, average length)`` of the index, cached until it changes"""
+    return cached_fragment('search:corpus', ['search'], compute_corpus_stats)
+
+
+def bm25_score(terms):
+    """Per-row BM25 contribution of a ``SearchTerm`` for the given query terms"""
+    total, average_length = corpus_stats()
+
+    document_frequency = dict(
+        SearchTerm.objects.filter(term__in=terms).values('term').annotate(df=Count('pk')).values_list('term', 'df')
+    )
+    if not document_frequency:
+        return None
+
+    idf = Case(
+        *[When(term=term, then=Value(math.log(1 + (total - df + 0.5) / (df + 0.5))))
+          for term, df in document_frequency.items()],
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+    frequency = Cast('frequency', FloatField())
+    length = Cast(F('document__length'), FloatField())
+    normalisation = Value(K1 * (1 - B)) + Value(K1 * B / (average_length or 1)) * length
+    return Sum(idf * frequency * Value(K1 + 1) / (frequency + normalisation), output_field=FloatField())
+
+
+def search_posts(queryset, query):
+    """Filter ``queryset`` to posts matching ``query`` and annotate ``search_rank``.
+
+    Returns the queryset and the list of query terms used for highlighting.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))
+    if not terms:
+        return queryset.filter(
+            Q(title__icontains=query) |
+            Q(post__icontains=query) |
+            Q(author__username__icontains=query)
+        ), []
+
+    score = bm25_score(terms)
+    if score is None:
+        return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField())), terms
+
+    ranks = SearchTerm.objects.filter(
+        document__post=OuterRef('pk'), term__in=terms
+    ).order_by().values('document__post').annotate(score=score).values('score')
+    queryset = queryset.filter(
+        pk__in=SearchTerm.objects.filter(term__in=terms).values('document__post')
+    ).annotate(search_rank=Subquery(ranks, output_field=FloatField()))
+    return queryset, terms
+
+
+def highlight(text, terms, length=300):
+    """HTML-safe snippet of ``text`` around the first match with terms wrapped in <mark>"""
+    if not text:
+        return ''
+    pattern = re.compile(r'\b(%s)\b' % '|'.join(re.escape(term) for term in terms), re.IGNORECASE) if terms else None
+    match = pattern.search(text) if pattern else None
+
+    start = max(0, match.start() - length // 3) if match else 0
+    if start:
+        start = text.find(' ', start) + 1 or start
+    end = min(len(text), start + length)
+    if end < len(text):
+        space = text.rfind(' ', start, end)
+        if space > start:
+            end = space
+    snippet = text[start:end]
+
+    parts = []
+    position = 0
+    for found in (pattern.finditer(snippet) if pattern else []):
+        parts.append(escape(snippet[position:found.start()]))
+        parts.append('<mark>%s</mark>' % escape(found.group(0)))
+        position = found.end()
+    parts.append(escape(snippet[position:]))
+
+    prefix = '&hellip; ' if start > 0 else ''
+    suffix = ' &hellip;' if end < len(text) else ''
+    return mark_safe(prefix + ''.join(parts) + suffix)
@@ -0,0 +1,250 @@
+# signals.py
+import logging
+
+from django.core.signals import request_finished
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import AuthorProfile, BlogPost, Category, Comment, CommentLike, CustomUser, PostLike, UserPostView, UserStats
+from .caching import invalidate
+from .images import IMAGE_ERRORS, sync_variants
+from .popularity import refresh_popularity
+from .search import index_post
+from .view_counter import view_buffer
+from . import likes, site_stats, user_stats
+
+logger = logging.getLogger(__name__)
+
+
+def adjust_counter(model, pk, field, delta):
+    """Atomically add ``delta`` to a stored counter without letting it go negative"""
+    if pk is None:
+        return
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+# Post likes
+@receiver(post_save, sender=PostLike)
+def post_like_created(sender, instance, created, **kwargs):
+    if created:
+        adjust_counter(BlogPost, instance.post_id, 'likes_count', 1)
+        user_stats.adjust(user_stats.author_of(BlogPost, instance.post_id), 'post_likes', 1)
+
+
+@receiver(post_delete, sender=PostLike)
+def post_like_deleted(sender, instance, **kwargs):
+    if likes.is_accounted():
+        return
+    adjust_counter(BlogPost, instance.post_id, 'likes_count', -1)
+    user_stats.adjust(user_stats.author_of(BlogPost, instance.post_id), 'post_likes', -1)
+
+
+# Comment likes
+@receiver(post_save, sender=CommentLike)
+def comment_like_created(sender, instance, created, **kwargs):
+    if created:
+        adjust_counter(Comment, instance.comment_id, 'likes_count', 1)
+        user_stats.adjust(user_stats.author_of(Comment, instance.comment_id), 'comment_likes', 1)
+
+
+@receiver(post_delete, sender=CommentLike)
+def comment_like_deleted(sender, instance, **kwargs):
+    if likes.is_accounted():
+        return
+    adjust_counter(Comment, instance.comment_id, 'likes_count', -1)
+    user_stats.adjust(user_stats.author_of(Comment, instance.comment_id), 'comment_likes', -1)
+
+
+# Comments (only top-level comments are counted)
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, **kwargs):
+    if created:
+        user_stats.adjust(instance.author_id, 'comments', 1)
+        site_stats.adjust(comments=1)
+        if instance.parent_id is None:
+            adjust_counter(BlogPost, instance.post_id, 'comment_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    user_stats.adjust(instance.author_id, 'comments', -1)
+    site_stats.adjust(comments=-1)
+    if instance.parent_id is None:
+        adjust_counter(BlogPost, instance.post_id, 'comment_count', -1)
+
+
+# Category post counts (only published posts are counted)
+@receiver(pre_save, sender=BlogPost)
+def remember_post_category(sender, instance, raw=False, **kwargs):
+    """Store the category/status/author/likes currently in the database so post_save can diff them"""
+    instance._counted_category_id = None
+    instance._previous_status = None
+    instance._previous_author_id = None
+    instance._previous_likes_count = 0
+    if raw or instance.pk is None:
+        return
+    previous = BlogPost.objects.filter(pk=instance.pk).values('category_id', 'status', 'author_id', 'likes_count').first()
+    if previous:
+        instance._previous_status = previous['status']
+        instance._previous_author_id = previous['author_id']
+        instance._previous_likes_count = previous['likes_count']
+        if previous['status'] == 'published':
+            instance._counted_category_id = previous['category_id']
+
+
+@receiver(post_save, sender=BlogPost)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous_category_id = getattr(instance, '_counted_category_id', None)
+    current_category_id = instance.category_id if instance.status == 'published' else None
+    if previous_category_id != current_category_id:
+        adjust_counter(Category, previous_category_id, 'post_count', -1)
+        adjust_counter(Category, current_category_id, 'post_count', 1)
+
+    # Dashboard post totals leave out archived posts
+    previous_status = getattr(instance, '_previous_status', None)
+    was_counted = previous_status not in (None, 'archived')
+    is_counted = instance.status != 'archived'
+    previous_author_id = getattr(instance, '_previous_author_id', None)
+    if created or previous_author_id == instance.author_id:
+        user_stats.adjust(instance.author_id, 'posts', is_counted - was_counted)
+    else:
+        # A reassigned post takes its likes along to the new author's totals
+        likes = getattr(instance, '_previous_likes_count', 0)
+        user_stats.adjust_many('posts', {previous_author_id: -was_counted, instance.author_id: int(is_counted)})
+        user_stats.adjust_many('post_likes', {previous_author_id: -likes, instance.author_id: likes})
+
+    # Site totals
+    if created:
+        site_stats.adjust(posts=1)
+        site_stats.post_added(instance)
+    elif previous_author_id != instance.author_id:
+        site_stats.post_removed(previous_author_id)
+        site_stats.post_added(instance)
+
+
+@receiver(post_delete, sender=BlogPost)
+def post_deleted(sender, instance, **kwargs):
+    if instance.status == 'published':
+        adjust_counter(Category, instance.category_id, 'post_count', -1)
+    if instance.status != 'archived':
+        user_stats.adjust(instance.author_id, 'posts', -1)
+    site_stats.adjust(posts=-1)
+    site_stats.post_removed(instance.author_id, kwargs.get('origin'))
+
+
+@receiver(pre_delete, sender=CustomUser)
+def forget_author(sender, instance, **kwargs):
+    """Deleting a user detaches their posts (SET_NULL) without post signals, so drop them from the author total here"""
+    if site_stats.has_posts(instance.pk):
+        site_stats.adjust(authors=-1)
+
+
+@receiver(pre_delete, sender=BlogPost)
+def forget_post_views(sender, instance, **kwargs):
+    """The post's view records cascade without signals, so take it off its viewers' totals here"""
+    viewers = UserPostView.objects.filter(post_id=instance.pk).values_list('user_id', flat=True)
+    user_stats.adjust_many('posts_viewed', {user_id: -1 for user_id in viewers})
+
+
+# Dashboard stats rows
+@receiver(post_save, sender=CustomUser)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+# Full-text search index
+@receiver(post_save, sender=BlogPost)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_post(instance)
+
+
+# Popularity ranking (runs after the like counter above has been adjusted)
+@receiver(post_save, sender=BlogPost)
+def post_popularity(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        refresh_popularity([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=PostLike)
+def like_popularity(sender, instance, **kwargs):
+    if likes.is_accounted():
+        return
+    refresh_popularity([instance.post_id])
+
+
+# Buffered view counts, flushed once a response that found a flush due has been sent
+@receiver(request_finished)
+def flush_view_counts(sender, **kwargs):
+    view_buffer.flush_if_requested()
+
+
+# Resized image variants, generated after the save has committed (a broken or
+# oversized upload must not prevent saving the post or profile)
+def update_image_variants(instance, field_name, variants_field):
+    try:
+        changed = sync_variants(instance, field_name, variants_field)
+    except IMAGE_ERRORS:
+        logger.exception('Could not generate variants for %s', getattr(instance, field_name).name)
+        return
+    if changed and isinstance(instance, BlogPost):
+        invalidate('feed', 'categories', f'post:{instance.pk}')
+
+
+@receiver(post_save, sender=BlogPost)
+def post_image_variants(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(lambda: update_image_variants(instance, 'add_image', 'image_variants'))
+
+
+@receiver(post_save, sender=AuthorProfile)
+def profile_picture_variants(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(lambda: update_image_variants(instance, 'profile_picture', 'picture_variants'))
+
+
+# Cache invalidation: bump only the groups whose pages show the changed data
+@receiver([post_save, post_delete], sender=BlogPost)
+def invalidate_post_caches(sender, instance, **kwargs):
+    invalidate('feed', 'categories', 'recent', 'popular', 'totals', 'search', f'post:{instance.pk}')
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def invalidate_comment_caches(sender, instance, **kwargs):
+    invalidate('feed', 'totals', f'post:{instance.post_id}')
+
+
+@receiver([post_save, post_delete], sender=PostLike)
+def invalidate_post_like_caches(sender, instance, **kwargs):
+    if likes.is_accounted():
+        return
+    invalidate('feed', 'popular', f'post:{instance.post_id}')
+
+
+@receiver([post_save, post_delete], sender=CommentLike)
+def invalidate_comment_like_caches(sender, instance, **kwargs):
+    if likes.is_accounted():
+        return
+    post_id = Comment.objects.filter(pk=instance.comment_id).values_list('post_id', flat=True).first()
+    invalidate('feed', *([f'post:{post_id}'] if post_id else []))
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category_caches(sender, instance, **kwargs):
+    invalidate('categories')
+
+
+@receiver([post_save, post_delete], sender=CustomUser)
+@receiver([post_save, post_delete], sender=AuthorProfile)
+def invalidate_author_caches(sender, instance, update_fields=None, **kwargs):
+    # Logging in saves last_login only, which no page shows
+    if update_fields != frozenset({'last_login'}):
+        invalidate('authors')
@@ -0,0 +1,127 @@
+# site_stats.py
+"""
+Site-wide totals for the about page.
+
+Counting every post, every comment and the distinct authors of all posts
+scans whole tables. ``SiteStats`` keeps those three numbers in a single
+row that ``signals.py`` moves as posts and comments are created and
+deleted, so the page reads one row by primary key (and caches it in the
+``totals`` group like before).
+
+The author total only changes when a user writes their first post or
+loses their last one, so those events run an indexed ``EXISTS`` on the
+author's posts; a queryset deletion of several posts by one author
+checks that author once. Deleting a user detaches their posts without
+post signals, so that is handled on the user's ``pre_delete``. Post and
+comment thread deletions run inside ``deferred()`` to fold their changes
+into one ``UPDATE``.
+
+Raw saves, bulk operations and manual SQL skip the signals, so run
+``manage.py reconcile_site_stats`` periodically: it recounts the totals
+and rewrites the row if it drifted, which bounds how stale they can get.
+"""
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from weakref import WeakKeyDictionary
+
+from asgiref.sync import sync_to_async
+from django.apps import apps as global_apps
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import BlogPost, SiteStats
+
+SITE = 1  # primary key of the single row
+COUNTERS = ('posts', 'authors', 'comments')
+
+_pending = ContextVar('site_stats_pending', default=None)
+_authors_checked = WeakKeyDictionary()  # deletion origin -> authors already checked for it
+
+
+@contextmanager
+def deferred():
+    """Collect ``adjust`` calls and apply them as one ``UPDATE`` on exit"""
+    if _pending.get() is not None:
+        yield
+        return
+    pending = Counter()
+    token = _pending.set(pending)
+    try:
+        yield
+    finally:
+        _pending.reset(token)
+    adjust(**pending)
+
+
+def adjust(**deltas):
+    """Add ``deltas`` (``counter=delta``) to the totals, never going below zero"""
+    pending = _pending.get()
+    if pending is not None:
+        pending.update(deltas)
+        return
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if deltas:
+        SiteStats.objects.filter(pk=SITE).update(**{
+            field: Greatest(F(field) + delta, 0) for field, delta in deltas.items()
+        })
+
+
+def has_posts(author_id, exclude=None):
+    return BlogPost.objects.filter(author_id=author_id).exclude(pk=exclude).exists()
+
+
+def post_added(post):
+    """``post`` was created or given to a new author"""
+    adjust(authors=int(post.author_id is not None and not has_posts(post.author_id, exclude=post.pk)))
+
+
+def post_removed(author_id, origin=None):
+    """A post by ``author_id`` was deleted or given to someone else"""
+    if author_id is None:
+        return
+    if origin is not None:
+        checked = _authors_checked.setdefault(origin, set())
+        if author_id in checked:
+            return
+        checked.add(author_id)
+    adjust(authors=-int(not has_posts(author_id)))
+
+
+def compute_site_stats(apps=global_apps):
+    posts = apps.get_model('firstblog', 'BlogPost').objects
+    return {
+        'posts': posts.count(),
+        'authors': posts.exclude(author=None).values('author_id').distinct().count(),
+        'comments': apps.get_model('firstblog', 'Comment').objects.count(),
+    }
+
+
+def reconcile_site_stats(apps=global_apps):
+    """Recount the totals and rewrite the row if it drifted; returns whether it was created or corrected"""
+    stats_model = apps.get_model('firstblog', 'SiteStats')  # the historical model when called from a migration
+    with transaction.atomic():
+        # Lock the row so adjustments made meanwhile land on top of the recounted values
+        current = stats_model.objects.select_for_update().filter(pk=SITE).values(*COUNTERS).first()
+        values = compute_site_stats(apps)
+        now = timezone.now()
+        if current == values:
+            stats_model.objects.filter(pk=SITE).update(date_reconciled=now)
+            return False
+        stats_model.objects.update_or_create(pk=SITE, defaults=dict(values, date_reconciled=now))
+        return True
+
+
+def site_totals():
+    """Context for the about page; counts directly until the row has been created by the migration or a reconcile"""
+    values = SiteStats.objects.filter(pk=SITE).values(*COUNTERS).first() or compute_site_stats()
+    return {
+        'total_posts': values['posts'],
+        'total_authors': values['authors'],
+        'total_comments': values['comments'],
+    }
+
+
+asite_totals = sync_to_async(site_totals)
@@ -0,0 +1,23 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from firstblog.images import srcset, variant_name
+
+register = template.Library()
+
+
+@register.simple_tag
+def picture(field_file, variants, sizes='100vw', **attrs):
+    """<picture> with WebP and JPEG srcsets, falling back to the original file until variants exist"""
+    if not field_file:
+        return ''
+    attrs.setdefault('loading', 'lazy')
+    webp = srcset(field_file, variants, 'webp')
+    if not webp:
+        return format_html('<img src="{}"{}>', field_file.url, flatatt(attrs))
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}"><img src="{}" srcset="{}" sizes="{}"{}></picture>',
+        webp, sizes, field_file.storage.url(variant_name(field_file.name, variants['widths'][-1], 'jpg')),
+        srcset(field_file, variants, 'jpg'), sizes, flatatt(attrs),
+    )
@@ -0,0 +1,96 @@
+# testing.py
+"""
+Test helpers.
+
+``LocalSMTPServer`` is a minimal SMTP server on a background thread, for
+exercising the real SMTP backend (and ``send_queued_mail``) without a mail
+server::
+
+    with LocalSMTPServer() as smtp, override_settings(EMAIL_HOST=smtp.host, EMAIL_PORT=smtp.port):
+        ...
+    smtp.messages     # [(mail_from, [rcpt_to, ...], email.message.Message)]
+    smtp.connections  # number of SMTP sessions opened
+
+``fail_next`` rejects that many of the next messages with a temporary
+``451`` error. Only plain SMTP is spoken (no TLS or AUTH).
+"""
+import email
+import socketserver
+import threading
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        server = self.server.smtp
+        with server.lock:
+            server.connections += 1
+        self.reply('220 localhost ESMTP test server')
+        mail_from, recipients = None, []
+        for raw in self.rfile:
+            command = raw.decode('utf-8', 'replace').strip()
+            verb = command[:4].upper()
+            if verb in ('HELO', 'EHLO'):
+                self.reply('250 localhost')
+            elif verb == 'MAIL':
+                mail_from, recipients = command.split(':', 1)[1].strip().strip('<>'), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipients.append(command.split(':', 1)[1].strip().strip('<>'))
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                for data in self.rfile:
+                    if data in (b'.\r\n', b'.\n'):
+                        break
+                    lines.append(data[1:] if data.startswith(b'..') else data)
+                with server.lock:
+                    if server.fail_next:
+                        server.fail_next -= 1
+                        self.reply('451 Temporary failure')
+                        continue
+                    server.messages.append((mail_from, recipients, email.message_from_bytes(b''.join(lines))))
+                self.reply('250 OK')
+            elif verb == 'RSET':
+                mail_from, recipients = None, []
+                self.reply('250 OK')
+            elif verb == 'NOOP':
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class _ThreadingServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class LocalSMTPServer:
+    def __init__(self, host='127.0.0.1', port=0):
+        self.messages = []
+        self.connections = 0
+        self.fail_next = 0
+        self.lock = threading.Lock()
+        self.server = _ThreadingServer((host, port), _SMTPHandler)
+        self.server.smtp = self
+        self.host, self.port = self.server.server_address[:2]
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
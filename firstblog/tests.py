@@ -1,3 +1,1727 @@
-from django.test import TestCase
+import json
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from email.mime.text import MIMEText
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from allauth.account.models import EmailAddress
+from allauth.socialaccount.models import SocialAccount, SocialApp, SocialToken
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, Group
+from django.core.cache import cache
+from django.core import mail
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.signals import request_finished
+from django.db import close_old_connections, connection
+from django.db.models.signals import post_delete
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.template.base import Template
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from .admin import custom_admin_site
+from . import async_views, benchmarks, forms, images, likes, popularity, rendering, search, site_stats, user_stats, views
+from .author_stats import author_stats
+from .caching import cache_public_page
+from .comments import load_comment_tree, rebuild_paths
+from .backends.sqlite3.base import DatabaseWrapper as PooledSQLiteWrapper
+from .loadtest import ASGILoadRun, LoadRun, reset_pools, root_urlconf
+from .profiling import RequestProfile
+from .testing import LocalSMTPServer
+from .pagination import CursorPaginator
+from .models import (
+    AuthorApplication, AuthorProfile, BlogPost, Category, Comment, CommentLike, CustomUser, OutboundEmail, PendingView, PostLike,
+    SearchTerm, SiteStats, UserPostView, UserStats,
+)
+from .view_counter import view_buffer
+
+
+class BlogTestCase(TestCase):
+    """Start every test with an empty cache and no requested view flush so nothing leaks between tests"""
+
+    def setUp(self):
+        cache.clear()
+        view_buffer.flush_requested = False
+        self.addCleanup(cache.clear)
+
+
+class HomeViewQueryTests(BlogTestCase):
+    """The homepage query count must not depend on the number of posts"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(email='author@example.com', username='author', password='secret-pass')
+        cls.reader = CustomUser.objects.create_user(email='reader@example.com', username='reader', password='secret-pass')
+        cls.category = Category.objects.create(name='Technology')
+
+    def create_posts(self, count):
+        for i in range(count):
+            post = BlogPost.objects.create(
+                author=self.author,
+                category=self.category,
+                title=f'Post number {i}',
+                post='<p>Some content for the post body.</p>',
+                status='published',
+            )
+            comment = Comment.objects.create(post=post, author=self.reader, text='Nice post')
+            Comment.objects.create(post=post, author=self.author, text='Thanks', parent=comment)
+            CommentLike.objects.create(comment=comment, user=self.author)
+            PostLike.objects.create(post=post, user=self.reader)
+
+    def test_anonymous_query_count_is_constant(self):
+        self.create_posts(3)
+        with self.assertNumQueries(8):
+            self.client.get(reverse('home'))
+
+        self.create_posts(20)
+        with self.assertNumQueries(8):
+            response = self.client.get(reverse('home'))
+        self.assertEqual(len(response.context['posts']), 5)
+
+    def test_authenticated_query_count_is_constant(self):
+        self.client.force_login(self.reader)
+        self.create_posts(3)
+        with self.assertNumQueries(12):
+            self.client.get(reverse('home'))
+
+        self.create_posts(20)
+        with self.assertNumQueries(12):
+            response = self.client.get(reverse('home'))
+
+        liked_by_user = response.context['liked_by_user']
+        self.assertEqual(len(liked_by_user), 5)
+        self.assertTrue(all(liked_by_user.values()))
+
+
+class CounterFieldTests(BlogTestCase):
+    """Stored counters follow likes, comments and post category/status changes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(email='author@example.com', username='author', password='secret-pass')
+        cls.reader = CustomUser.objects.create_user(email='reader@example.com', username='reader', password='secret-pass')
+        cls.tech = Category.objects.create(name='Technology')
+        cls.travel = Category.objects.create(name='Travel')
+
+    def setUp(self):
+        super().setUp()
+        self.post = BlogPost.objects.create(
+            author=self.author, category=self.tech, title='Counted post', post='<p>Body</p>', status='published'
+        )
+
+    def test_post_like_counter(self):
+        like = PostLike.objects.create(post=self.post, user=self.reader)
+        PostLike.objects.create(post=self.post, user=self.author)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 2)
+
+        like.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+
+    def test_comment_counters(self):
+        comment = Comment.objects.create(post=self.post, author=self.reader, text='First')
+        reply = Comment.objects.create(post=self.post, author=self.author, text='Reply', parent=comment)
+        CommentLike.objects.create(comment=comment, user=self.author)
+        CommentLike.objects.create(comment=reply, user=self.reader)
+        self.post.refresh_from_db()
+        comment.refresh_from_db()
+        self.assertEqual(self.post.get_comment_count(), 1)
+        self.assertEqual(comment.likes_count, 1)
+
+        comment.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+
+    def test_category_counter_follows_category_and_status(self):
+        self.tech.refresh_from_db()
+        self.assertEqual(self.tech.post_count, 1)
+
+        self.post.category = self.travel
+        self.post.save()
+        self.tech.refresh_from_db()
+        self.travel.refresh_from_db()
+        self.assertEqual((self.tech.post_count, self.travel.post_count), (0, 1))
+
+        self.post.status = 'archived'
+        self.post.save()
+        self.travel.refresh_from_db()
+        self.assertEqual(self.travel.post_count, 0)
+
+        BlogPost.objects.create(author=self.author, category=self.tech, title='Draft post', post='<p>Body</p>')
+        self.tech.refresh_from_db()
+        self.assertEqual(self.tech.post_count, 0)
+
+    def test_recount_repairs_drift(self):
+        PostLike.objects.create(post=self.post, user=self.reader)
+        Comment.objects.create(post=self.post, author=self.reader, text='First')
+        BlogPost.objects.filter(pk=self.post.pk).update(likes_count=7, comment_count=0)
+        Category.objects.filter(pk=self.tech.pk).update(post_count=5)
+
+        call_command('recount', stdout=StringIO())
+
+        self.post.refresh_from_db()
+        self.tech.refresh_from_db()
+        self.assertEqual((self.post.likes_count, self.post.comment_count), (1, 1))
+        self.assertEqual(self.tech.post_count, 1)
+
+
+@override_settings(VIEW_COUNT_FLUSH_SIZE=5, VIEW_COUNT_FLUSH_INTERVAL=3600)
+class BufferedViewCountTests(BlogTestCase):
+    """post_detail views are journaled and written to the database in batches"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(email='author@example.com', username='author', password='secret-pass')
+        cls.reader = CustomUser.objects.create_user(email='reader@example.com', username='reader', password='secret-pass')
+        cls.post = BlogPost.objects.create(author=cls.author, title='Viewed post', post='<p>Body</p>', status='published')
+
+    def test_views_are_buffered_until_flush(self):
+        self.client.force_login(self.reader)
+        for _ in range(3):
+            response = self.client.get(reverse('post_detail', args=[self.post.pk]))
+        self.assertEqual(response.context['post'].view_count, 1)
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, 0)
+        self.assertEqual(view_buffer.pending(), 3)
+
+        call_command('flush_view_counts', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, 3)
+        self.assertEqual(UserPostView.objects.filter(user=self.reader, post=self.post).count(), 1)
+        self.assertEqual(view_buffer.pending(), 0)
+
+    def test_flush_size_triggers_batched_write(self):
+        other = BlogPost.objects.create(author=self.author, title='Other post', post='<p>Body</p>', status='published')
+        for post_id in [self.post.pk, other.pk, self.post.pk, other.pk]:
+            view_buffer.record(post_id, self.reader.pk)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, 0)
+
+        # The fifth view only journals itself and asks for a flush
+        with self.assertNumQueries(1):
+            view_buffer.record(self.post.pk)
+        self.assertEqual(view_buffer.pending(), 5)
+
+        # Once a response has been sent, in one transaction: claiming the journal, existing posts, users and
+        # viewer rows, counts, new viewer rows, the viewer's stats, popularity and removing the journal rows.
+        # Like the test client, keep Django from closing the test connection at the end of the "request".
+        request_finished.disconnect(close_old_connections)
+        self.addCleanup(request_finished.connect, close_old_connections)
+        with self.assertNumQueries(12):
+            request_finished.send(sender=self.__class__)
+
+        self.post.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.post.view_count, other.view_count), (3, 2))
+        self.assertEqual(UserPostView.objects.filter(user=self.reader).count(), 2)
+        self.assertEqual(view_buffer.pending(), 0)
+
+    def test_viewer_rows_keep_the_time_of_the_first_view(self):
+        first = timezone.now() - timedelta(hours=2)
+        PendingView.objects.create(post=self.post, user=self.reader, viewed_at=first + timedelta(hours=1))
+        PendingView.objects.create(post=self.post, user=self.reader, viewed_at=first)
+        view_buffer.flush()
+        self.assertEqual(UserPostView.objects.get(user=self.reader, post=self.post).viewed_at, first)
+
+    def test_views_survive_a_cold_cache(self):
+        for _ in range(3):
+            view_buffer.record(self.post.pk, self.reader.pk)
+        cache.clear()  # eviction or a restarted worker with a local cache
+        self.assertEqual(view_buffer.pending(), 3)
+        self.assertEqual(view_buffer.flush(), 3)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, 3)
+
+    def test_views_of_deleted_posts_and_users_are_dropped(self):
+        doomed = CustomUser.objects.create_user(email='doomed@example.com', username='doomed', password='secret-pass')
+        other = BlogPost.objects.create(author=self.author, title='Other post', post='<p>Body</p>', status='published')
+        view_buffer.record(self.post.pk, doomed.pk)
+        view_buffer.record(other.pk, self.reader.pk)
+        doomed.delete()
+        other.delete()
+        self.assertEqual(view_buffer.flush(), 2)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.view_count, 1)
+        self.assertFalse(UserPostView.objects.exists())
+
+
+class SearchIndexTests(BlogTestCase):
+    """Posts are indexed on save and searched with BM25 ranking"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(email='author@example.com', username='author', password='secret-pass')
+        cls.django_post = BlogPost.objects.create(
+            author=cls.author, title='Mastering Django', status='published',
+            post='<p>Django is a <strong>Python</strong> web framework.</p><script>var django = 1;</script>',
+        )
+        cls.python_post = BlogPost.objects.create(
+            author=cls.author, title='Learning Python', status='published',
+            post='<p>Python basics. We also mention django once &amp; move on.</p>',
+        )
+        cls.draft = BlogPost.objects.create(author=cls.author, title='Django draft', post='<p>Unpublished django notes</p>')
+
+    def test_post_html_is_indexed_as_plain_text(self):
+        document = self.django_post.search_document
+        self.assertEqual(document.text, 'Django is a Python web framework.')
+        terms = dict(SearchTerm.objects.filter(document=document).values_list('term', 'frequency'))
+        self.assertEqual(terms['django'], 1 + search.TITLE_WEIGHT)
+        self.assertNotIn('var', terms)
+        self.assertNotIn('is', terms)
+
+    def test_reindex_on_save(self):
+        self.python_post.title = 'Mastering Rust'
+        self.python_post.save()
+        terms = set(SearchTerm.objects.filter(document__post=self.python_post).values_list('term', flat=True))
+        self.assertIn('rust', terms)
+        self.assertNotIn('learning', terms)
+
+    def test_results_are_ranked(self):
+        queryset = BlogPost.objects.filter(status='published')
+        results, terms = search.search_posts(queryset, 'Django')
+        self.assertEqual(terms, ['django'])
+        self.assertEqual(list(results.order_by('-search_rank')), [self.django_post, self.python_post])
+
+        results, _ = search.search_posts(queryset, 'python')
+        self.assertEqual(list(results.order_by('-search_rank')), [self.python_post, self.django_post])
+
+    def test_corpus_stats_are_cached_until_the_index_changes(self):
+        self.assertEqual(search.corpus_stats()[0], 3)
+        with CaptureQueriesContext(connection) as queries:
+            search.search_posts(BlogPost.objects.all(), 'django')
+        self.assertFalse([query['sql'] for query in queries if 'firstblog_searchdocument' in query['sql']])
+
+        BlogPost.objects.create(author=self.author, title='Another', post='<p>More</p>')
+        self.assertEqual(search.corpus_stats()[0], 4)
+        self.draft.delete()
+        self.assertEqual(search.corpus_stats()[0], 3)
+
+    def test_query_without_terms_falls_back_to_icontains(self):
+        results, terms = search.search_posts(BlogPost.objects.filter(status='published'), 'is a')
+        self.assertEqual(terms, [])
+        self.assertEqual(list(results), [self.django_post])
+
+    def test_highlight_escapes_and_marks_terms(self):
+        snippet = search.highlight('Use <b> tags with Django carefully', ['django'])
+        self.assertEqual(snippet, 'Use &lt;b&gt; tags with <mark>Django</mark> carefully')
+
+    def test_search_view_uses_index(self):
+        response = self.client.get(reverse('search_posts'), {'q': 'django framework'})
+        self.assertEqual(list(response.context['posts']), [self.django_post, self.python_post])
+        self.assertEqual(response.context['total_results'], 2)
+        self.assertContains(response, '<mark>Django</mark>')
+
+
+class PublicPageCacheTests(BlogTestCase):
+    """Anonymous pages are served from cache until related content changes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(email='author@example.com', username='author', password='secret-pass')
+        cls.reader = CustomUser.objects.create_user(email='reader@example.com', username='reader', password='secret-pass')
+        cls.category = Category.objects.create(name='Technology')
+        cls.post = BlogPost.objects.create(
+            author=cls.author, category=cls.category, title='Cached post', post='<p>Body</p>', status='published'
+        )
+        cls.other = BlogPost.objects.create(author=cls.author, title='Other post', post='<p>Body</p>', status='published')
+
+    def test_anonymous_home_is_cached(self):
+        self.client.get(reverse('home'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Cached post')
+
+        # Authenticated users get a fresh page built with the cached sidebar fragments
+        self.client.force_login(self.reader)
+        with self.assertNumQueries(6):
+            self.client.get(reverse('home'))
+
+    def test_comment_invalidates_only_affected_pages(self):
+        self.client.get(reverse('home'))
+        self.client.get(reverse('about'))
+        self.client.get(reverse('post_detail', args=[self.other.pk]))
+
+        Comment.objects.create(post=self.post, author=self.reader, text='A brand new comment')
+
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'A brand new comment')
+        response = self.client.get(reverse('about'))
+        self.assertEqual(response.context['total_comments'], 1)
+        with self.assertNumQueries(1):  # only the journaled view
+            self.client.get(reverse('post_detail', args=[self.other.pk]))
+
+    def test_anonymous_post_page_carries_no_csrf_token(self):
+        response = self.client.get(reverse('post_detail', args=[self.post.pk]))
+        self.assertNotIn(settings.CSRF_COOKIE_NAME, response.cookies)
+        cached = self.client.get(reverse('post_detail', args=[self.post.pk]))
+        self.assertEqual(cached.content, response.content)
+
+    def test_pages_using_the_csrf_token_are_not_cached(self):
+        calls = []
+
+        @cache_public_page('feed')
+        def form_page(request):
+            calls.append(request)
+            return HttpResponse(get_token(request))
+
+        for _ in range(2):
+            request = RequestFactory().get('/form/')
+            request.user = AnonymousUser()
+            form_page(request)
+        self.assertEqual(len(calls), 2)
+
+    def test_cached_post_detail_still_counts_views(self):
+        for _ in range(3):
+            self.client.get(reverse('post_detail', args=[self.post.pk]))
+        self.assertEqual(view_buffer.pending(), 3)
+
+    def test_sidebar_fragments_follow_category_changes(self):
+        self.client.get(reverse('home'))
+        Category.objects.create(name='Travel')
+        response = self.client.get(reverse('home'))
+        self.assertEqual([category.name for category in response.context['categories']], ['Technology', 'Travel'])
+
+
+class PopularityRankingTests(BlogTestCase):
+    """The stored popularity score drives the popular posts sidebar"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(email='author@example.com', username='author', password='secret-pass')
+        cls.readers = [
+            CustomUser.objects.create_user(email=f'reader{i}@example.com', username=f'reader{i}', password='secret-pass')
+            for i in range(3)
+        ]
+        cls.quiet = BlogPost.objects.create(author=cls.author, title='Quiet post', post='<p>Body</p>', status='published')
+        cls.liked = BlogPost.objects.create(author=cls.author, title='Liked post', post='<p>Body</p>', status='published')
+
+    def test_likes_update_score(self):
+        self.liked.refresh_from_db()
+        before = self.liked.popularity_score
+        for reader in self.readers:
+            PostLike.objects.create(post=self.liked, user=reader)
+        self.liked.refresh_from_db()
+        self.assertGreater(self.liked.popularity_score, before)
+
+        PostLike.objects.filter(post=self.liked).delete()
+        self.liked.refresh_from_db()
+        self.assertAlmostEqual(self.liked.popularity_score, before)
+
+    def test_older_posts_decay(self):
+        now = timezone.now()
+        fresh = popularity.popularity_score(10, 0, now)
+        week_old = popularity.popularity_score(100, 0, now - timedelta(days=7))
+        self.assertAlmostEqual(fresh, week_old)
+
+    def test_sidebar_orders_by_score(self):
+        for reader in self.readers:
+            PostLike.objects.create(post=self.quiet, user=reader)
+        response = self.client.get(reverse('home'))
+        self.assertEqual([post.title for post in response.context['popular_posts']], ['Quiet post', 'Liked post'])
+
+    def test_view_flush_and_command_refresh_scores(self):
+        BlogPost.objects.update(popularity_score=0)
+        view_buffer.record(self.quiet.pk)
+        view_buffer.flush()
+        self.quiet.refresh_from_db()
+        self.assertGreater(self.quiet.popularity_score, 0)
+
+        call_command('refresh_popularity', stdout=StringIO())
+        self.liked.refresh_from_db()
+        self.assertEqual(self.liked.popularity_score, popularity.popularity_score(0, 0, self.liked.date_created))
+
+
+class SampleDataCommandTests(BlogTestCase):
+    """create_sample_posts builds a consistent synthetic dataset"""
+
+    def test_generates_requested_volume_with_consistent_counters(self):
+        call_command(
+            'create_sample_posts', users=30, posts=40, comments=200, likes=150, views=1000, seed=7,
+            stdout=StringIO(),
+        )
+        self.assertEqual(CustomUser.objects.count(), 30)
+        self.assertEqual(BlogPost.objects.count(), 40)
+        self.assertEqual(Comment.objects.count(), 200)
+        self.assertTrue(Comment.objects.filter(parent__parent__isnull=False).exists())
+        self.assertEqual(sum(BlogPost.objects.values_list('view_count', flat=True)), 1000)
+
+        post = BlogPost.objects.order_by('-likes_count').first()
+        self.assertEqual(post.likes_count, PostLike.objects.filter(post=post).count())
+        self.assertEqual(post.comment_count, Comment.objects.filter(post=post, parent=None).count())
+        self.assertEqual(SearchTerm.objects.values('document__post').distinct().count(), 40)
+
+
+class IndexBenchmarkTests(TransactionTestCase):
+    """The index benchmark only drops the indexes of its own migration, and puts them back"""
+
+    def index_names(self):
+        with connection.cursor() as cursor:
+            return {
+                name for table in ('firstblog_blogpost', 'firstblog_comment', 'firstblog_userpostview')
+                for name, constraint in connection.introspection.get_constraints(cursor, table).items() if constraint['index']
+            }
+
+    def test_compare_drops_only_the_composite_indexes(self):
+        composite = {index.name for _, index in benchmarks.composite_indexes()}
+        self.assertIn('post_status_updated_idx', composite)
+        self.assertTrue(composite <= self.index_names())
+
+        with benchmarks.indexes_dropped():
+            remaining = self.index_names()
+        self.assertFalse(composite & remaining)
+        self.assertTrue({'post_status_popularity_idx', 'comment_path_idx'} <= remaining)
+        self.assertTrue(composite <= self.index_names())
+
+    def test_report(self):
+        report = benchmarks.run_index_benchmark(20, repeat=1, compare=True)
+        self.assertEqual(set(report['without']), set(report['with']))
+        self.assertEqual(set(report['with']), set(benchmarks.index_queries()))
+        self.assertTrue(all(result['plan'] for result in report['with'].values()))
+        # Seeded through create_sample_posts, so derived data is in place
+        self.assertEqual(SiteStats.objects.get().posts, 20)
+        self.assertTrue(SearchTerm.objects.exists())
+
+
+class ViewBenchmarkTests(BlogTestCase):
+    """No view may run more queries as the dataset grows"""
+
+    def test_query_counts_do_not_grow_with_data(self):
+        report = benchmarks.run_view_benchmarks([5, 30], repeat=1)
+
+        self.assertEqual(set(report['views']), {name for name, *_ in benchmarks.scenarios(benchmarks.actors())})
+        for name, by_scale in report['views'].items():
+            for result in by_scale.values():
+                self.assertLess(result['status'], 400, name)
+                self.assertGreaterEqual(result['p95_ms'], result['p50_ms'])
+
+        self.assertEqual(report['failures'], [])
+
+
+class RequestProfilingTests(BlogTestCase):
+    """The profiling middleware reports SQL and render timings per request"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(email='author@example.com', username='author', password='secret-pass')
+        BlogPost.objects.create(author=cls.author, title='Profiled post', post='<p>Body</p>', status='published')
+
+    def test_disabled_by_default(self):
+        response = self.client.get(reverse('home'))
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(REQUEST_PROFILING=True, REQUEST_PROFILING_SLOW_MS=60000)
+    def test_server_timing_header_and_log_line(self):
+        with self.assertLogs('firstblog.profiling', 'INFO') as logs, CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('home'))
+
+        self.assertRegex(response['Server-Timing'], rf'^db;dur=[\d.]+;desc="{len(queries)} queries", tpl;dur=[\d.]+, total;dur=[\d.]+$')
+        self.assertEqual(logs.records[0].levelname, 'INFO')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual((record['path'], record['status'], record['queries']), ('/', 200, len(queries)))
+        self.assertGreater(record['template_ms'], 0)
+        self.assertNotIn('slowest_queries', record)
+        # Timed through the template backend: nothing process-wide is patched
+        self.assertEqual(Template.render.__module__, 'django.template.base')
+        self.assertIn('main/index.html', [template.name for template in response.templates])
+
+    @override_settings(REQUEST_PROFILING=True, REQUEST_PROFILING_SLOW_MS=0, REQUEST_PROFILING_SLOW_QUERIES=2)
+    def test_slow_requests_capture_slowest_statements(self):
+        with self.assertLogs('firstblog.profiling', 'WARNING') as logs:
+            self.client.get(reverse('home'))
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(len(record['slowest_queries']), 2)
+        self.assertGreaterEqual(record['slowest_queries'][0]['ms'], record['slowest_queries'][1]['ms'])
+
+    def test_repeated_statements(self):
+        profile = RequestProfile()
+        execute = lambda sql, params, many, context: None
+        for params in [(1,), (2,), (2,)]:
+            profile(execute, 'SELECT * FROM post WHERE id = %s', params, False, {})
+        profile(execute, 'SELECT 1', (), False, {})
+
+        self.assertEqual(len(profile.queries), 4)
+        self.assertEqual(profile.repeated(), {'duplicates': 1, 'similar': {'SELECT * FROM post WHERE id = %s': 3}})
+
+
+class ImageVariantTests(BlogTestCase):
+    """Uploads get resized WebP/JPEG variants that templates serve through srcset"""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root, IMAGE_VARIANT_WIDTHS=[320, 640, 1024]))
+        self.author = CustomUser.objects.create_user(email='author@example.com', username='author', password='secret-pass')
+
+    def upload(self, name, width, height, mode='RGB'):
+        buffer = BytesIO()
+        Image.new(mode, (width, height), 'red').save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def create_post(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return BlogPost.objects.create(author=self.author, title='Picture post', post='<p>Body</p>', status='published', **kwargs)
+
+    def test_variants_generated_on_upload(self):
+        post = self.create_post(add_image=self.upload('photo.png', 1500, 1000, mode='RGBA'))
+
+        post.refresh_from_db()
+        self.assertEqual(post.image_variants, {'source': post.add_image.name, 'widths': [320, 640, 1024]})
+        for name in images.variant_names(post.add_image.name, [320, 640, 1024]):
+            self.assertTrue(default_storage.exists(name), name)
+        with default_storage.open(images.variant_name(post.add_image.name, 640, 'webp')) as variant:
+            self.assertEqual((Image.open(variant).format, Image.open(variant).size), ('WEBP', (640, 427)))
+
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, '<source type="image/webp" srcset="/media/image/variants/photo-320w.webp 320w, ')
+
+    def test_small_images_are_not_upscaled(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            profile = AuthorProfile.objects.create(user=self.author, profile_picture=self.upload('me.png', 200, 200))
+        profile.refresh_from_db()
+        self.assertEqual(profile.picture_variants['widths'], [200])
+
+    def test_replacing_image_removes_old_variants(self):
+        post = self.create_post(add_image=self.upload('first.png', 800, 600))
+        old_names = images.variant_names(post.image_variants['source'], post.image_variants['widths'])
+
+        post.add_image = self.upload('second.png', 800, 600)
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        self.assertEqual(post.image_variants['source'], post.add_image.name)
+        self.assertFalse(any(default_storage.exists(name) for name in old_names))
+
+        post.add_image = None
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.image_variants, {})
+
+    def test_variants_wait_for_the_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            post = BlogPost.objects.create(
+                author=self.author, title='Picture post', post='<p>Body</p>', add_image=self.upload('late.png', 700, 500),
+            )
+            self.assertEqual(post.image_variants, {})
+        for callback in callbacks:
+            callback()
+        post.refresh_from_db()
+        self.assertEqual(post.image_variants['widths'], [320, 640])
+
+    def test_decompression_bombs_are_skipped(self):
+        # Pillow warns above MAX_IMAGE_PIXELS and refuses above twice that; both are skipped
+        for name, width in (('warns.png', 700), ('refused.png', 1500)):
+            with self.subTest(name), mock.patch.object(Image, 'MAX_IMAGE_PIXELS', 500 * 500), self.assertLogs('firstblog', 'ERROR'):
+                post = self.create_post(add_image=self.upload(name, width, 500))
+            post.refresh_from_db()
+            self.assertEqual(post.image_variants, {})
+            self.assertFalse(default_storage.exists(images.variant_name(post.add_image.name, 320, 'webp')))
+
+    def test_backfill_command(self):
+        post = self.create_post(add_image=self.upload('legacy.png', 700, 500))
+        BlogPost.objects.filter(pk=post.pk).update(image_variants={})
+        self.assertNotContains(self.client.get(reverse('post_detail', args=[post.pk])), 'srcset')
+
+        out = StringIO()
+        call_command('generate_image_variants', stdout=out)
+        self.assertIn('Generated variants for 1 images (0 failed)', out.getvalue())
+        post.refresh_from_db()
+        self.assertEqual(post.image_variants['widths'], [320, 640])
+        self.assertContains(self.client.get(reverse('post_detail', args=[post.pk])), 'srcset')
+
+
+@override_settings(
+    EMAIL_BACKEND='firstblog.mail.QueuedEmailBackend',
+    QUEUED_EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+    EMAIL_USE_TLS=False, EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+    CONTACT_FORM_RECIPIENT_EMAIL='owner@example.com', EMAIL_QUEUE_MAX_ATTEMPTS=2,
+)
+class QueuedEmailTests(BlogTestCase):
+    """Mail is stored by the queued backend and delivered by send_queued_mail"""
+
+    def setUp(self):
+        super().setUp()
+        self.smtp = self.enterContext(LocalSMTPServer())
+        self.enterContext(override_settings(EMAIL_HOST=self.smtp.host, EMAIL_PORT=self.smtp.port))
+
+    def send_queued_mail(self):
+        out = StringIO()
+        call_command('send_queued_mail', stdout=out)
+        return out.getvalue()
+
+    def test_contact_form_is_queued_not_sent(self):
+        response = self.client.post(reverse('contact'), {'name': 'Ada', 'email': 'ada@example.com', 'message': 'Hello there'})
+
+        self.assertRedirects(response, reverse('contact'))
+        queued = OutboundEmail.objects.get()
+        self.assertEqual((queued.status, queued.to, queued.reply_to), ('queued', ['owner@example.com'], ['ada@example.com']))
+        self.assertEqual(self.smtp.messages, [])
+
+        self.assertIn('Sent 1 emails (0 failed)', self.send_queued_mail())
+        mail_from, recipients, message = self.smtp.messages[0]
+        self.assertEqual((recipients, message['Reply-To'], message['Subject']), (['owner@example.com'], 'ada@example.com', 'Contact Form Submission from Ada'))
+        self.assertEqual(OutboundEmail.objects.get().status, 'sent')
+
+    def test_html_only_message_keeps_its_subtype_and_charset(self):
+        message = mail.EmailMessage('Welcome', '<p>Caf\u00e9</p>', to=['ada@example.com'])
+        message.content_subtype = 'html'
+        message.encoding = 'iso-8859-1'
+        message.send()
+
+        self.send_queued_mail()
+        _, _, sent = self.smtp.messages[0]
+        self.assertEqual((sent.get_content_type(), sent.get_content_charset()), ('text/html', 'iso-8859-1'))
+
+    def test_attachments_are_queued_with_the_message(self):
+        message = mail.EmailMessage('Report', 'See attached', to=['ada@example.com'])
+        message.attach('notes.txt', 'Plain notes', 'text/plain')
+        message.attach('pixel.png', b'\x89PNG\r\n\x1a\n\x00\xff', 'image/png')
+        message.send()
+        self.assertEqual(len(OutboundEmail.objects.get().attachments), 2)
+        self.assertEqual(self.smtp.messages, [])
+
+        self.send_queued_mail()
+        _, _, sent = self.smtp.messages[0]
+        parts = {part.get_filename(): part.get_payload(decode=True) for part in sent.walk() if part.get_filename()}
+        self.assertEqual(parts, {'notes.txt': b'Plain notes', 'pixel.png': b'\x89PNG\r\n\x1a\n\x00\xff'})
+
+    def test_messages_with_mime_parts_attached_are_sent_directly(self):
+        message = mail.EmailMessage('Invite', 'Calendar attached', to=['ada@example.com'])
+        message.attach(MIMEText('BEGIN:VCALENDAR', 'calendar'))
+        self.assertEqual(message.send(), 1)
+        self.assertFalse(OutboundEmail.objects.exists())
+        self.assertEqual(len(self.smtp.messages), 1)
+
+    def test_batch_reuses_one_connection(self):
+        for i in range(3):
+            message = mail.EmailMultiAlternatives(f'Message {i}', 'Text', to=[f'user{i}@example.com'])
+            message.attach_alternative('<p>HTML</p>', 'text/html')
+            message.send()
+
+        self.assertIn('Sent 3 emails (0 failed)', self.send_queued_mail())
+        self.assertEqual(self.smtp.connections, 1)
+        self.assertEqual(self.smtp.messages[0][2].get_content_type(), 'multipart/alternative')
+
+    def test_failures_are_retried_with_backoff(self):
+        mail.send_mail('Retry me', 'Body', None, ['user@example.com'])
+        self.smtp.fail_next = 1
+
+        with self.assertLogs('firstblog.mail', 'WARNING'):
+            self.assertIn('Sent 0 emails (1 failed)', self.send_queued_mail())
+        queued = OutboundEmail.objects.get()
+        self.assertEqual((queued.status, queued.attempts), ('queued', 1))
+        self.assertIn('451', queued.last_error)
+        self.assertGreater(queued.next_attempt_at, timezone.now() + timedelta(seconds=30))
+
+        self.assertIn('Sent 0 emails (0 failed)', self.send_queued_mail())
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertIn('Sent 1 emails (0 failed)', self.send_queued_mail())
+        self.assertEqual(OutboundEmail.objects.get().status, 'sent')
+
+    def test_gives_up_after_max_attempts(self):
+        mail.send_mail('Doomed', 'Body', None, ['user@example.com'])
+        self.smtp.fail_next = 2
+
+        with self.assertLogs('firstblog.mail', 'WARNING'):
+            self.send_queued_mail()
+            OutboundEmail.objects.update(next_attempt_at=timezone.now())
+            self.send_queued_mail()
+        self.assertEqual(OutboundEmail.objects.values_list('status', 'attempts').get(), ('failed', 2))
+
+
+class RenderedPostTests(BlogTestCase):
+    """Sanitized HTML, excerpt and text statistics are stored when a post is saved"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(email='author@example.com', username='author', password='secret-pass')
+
+    def test_sanitize_html(self):
+        dirty = (
+            '<p class="lead" onclick="steal()">Hi <b>there</b><script>alert(1)</script></p>'
+            '<a href="javascript:alert(1)">bad</a><a href="https://example.com" target="_blank">good</a>'
+            '<img src="/media/a.png" onerror="x()"><div style="background: url(evil)">&amp; more<em>unclosed'
+        )
+        self.assertEqual(rendering.sanitize_html(dirty), (
+            '<p class="lead">Hi <b>there</b></p><a>bad</a><a href="https://example.com" target="_blank">good</a>'
+            '<img src="/media/a.png"><div>&amp; more<em>unclosed</em></div>'
+        ))
+
+    def test_derived_fields_stored_on_save(self):
+        body = '<p>' + ' '.join(['word'] * 450) + '</p><script>bad()</script>'
+        post = BlogPost.objects.create(author=self.author, title='Long post', post=body, status='published')
+
+        post.refresh_from_db()
+        self.assertEqual(post.word_count, 450)
+        self.assertEqual(post.reading_time, 3)
+        self.assertNotIn('script', post.post_html)
+        self.assertEqual(post.plain_text, ' '.join(['word'] * 450))
+        self.assertTrue(post.excerpt.startswith('<p>word') and post.excerpt.endswith('…</p>'))
+        self.assertLessEqual(len(rendering.html_to_text(post.excerpt)), rendering.EXCERPT_LENGTH)
+
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, post.excerpt, html=False)
+        self.assertContains(response, 'Read More')
+
+    def test_forms_count_the_text_that_is_stored(self):
+        # The iframe's fallback text survives html_to_text but not sanitizing
+        body = '<p>Short</p><iframe>' + 'x' * 60 + '</iframe>'
+        for form_class in (forms.BlogPostForm, forms.AdminBlogPostForm):
+            form = form_class(data={'title': 'Sneaky post', 'post': body})
+            self.assertEqual(form.errors['post'], ['Post content must be at least 50 characters long.'])
+
+    def test_update_fields_without_body_skips_rendering(self):
+        post = BlogPost.objects.create(author=self.author, title='Short post', post='<p>One two three</p>', status='published')
+        BlogPost.objects.filter(pk=post.pk).update(post='<p>Changed behind our back</p>')
+
+        post.title = 'Renamed post'
+        post.save(update_fields=['title'])
+        post.refresh_from_db()
+        self.assertEqual(post.plain_text, 'One two three')
+
+        post.post = '<p>Four five</p>'
+        post.save(update_fields=['post'])
+        post.refresh_from_db()
+        self.assertEqual((post.plain_text, post.word_count, post.reading_time), ('Four five', 2, 1))
+
+    def test_listings_show_the_summary_without_loading_the_text(self):
+        category = Category.objects.create(name='Technology')
+        body = '<p>' + ' '.join(f'word{i}' for i in range(400)) + '</p>'
+        post = BlogPost.objects.create(author=self.author, category=category, title='Long post', post=body, status='published')
+        post.refresh_from_db()
+        self.assertEqual(post.summary, ' '.join(f'word{i}' for i in range(rendering.SUMMARY_WORDS)) + '…')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('category_posts', args=[category.name]))
+        self.assertContains(response, 'word19 …')
+        self.assertNotContains(response, 'word20')
+        listing = [query['sql'] for query in queries if 'FROM "firstblog_blogpost"' in query['sql'] and '"summary"' in query['sql']]
+        self.assertTrue(listing)
+        self.assertFalse([sql for sql in listing if '"plain_text"' in sql])
+
+    def test_render_posts_command_backfills(self):
+        post = BlogPost.objects.create(author=self.author, title='Legacy post', post='<p>Old body text</p>', status='published')
+        BlogPost.objects.filter(pk=post.pk).update(post_html='', excerpt='', plain_text='', word_count=0, reading_time=0)
+
+        out = StringIO()
+        call_command('render_posts', stdout=out)
+        self.assertIn('Rendered 1 posts.', out.getvalue())
+        post.refresh_from_db()
+        self.assertEqual((post.post_html, post.word_count), ('<p>Old body text</p>', 3))
+
+
+class CursorPaginationTests(BlogTestCase):
+    """Keyset pagination visits every row once and costs the same on every page"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(email='author@example.com', username='author', password='secret-pass')
+        cls.category = Category.objects.create(name='Technology')
+        BlogPost.objects.bulk_create([
+            BlogPost(author=cls.author, category=cls.category, title=f'Paged post {i}', post='<p>Body</p>', status='published')
+            for i in range(23)
+        ])
+        search.index_posts(BlogPost.objects.select_related('author'))
+        # Several posts share a timestamp so ties must be broken by id
+        same_time = timezone.now() - timedelta(days=1)
+        BlogPost.objects.filter(title__in=['Paged post 3', 'Paged post 4', 'Paged post 5']).update(date_created=same_time)
+
+    def walk(self, paginator, backwards_from=None):
+        pages, cursor = [], None
+        while True:
+            page = paginator.get_page(cursor)
+            pages.append([post.pk for post in page])
+            if not page.has_next():
+                return pages, page
+            cursor = page.next_cursor
+
+    def test_forward_and_backward_visit_every_row_once(self):
+        queryset = BlogPost.objects.order_by('-date_created')
+        paginator = CursorPaginator(queryset, 5)
+        pages, last = self.walk(paginator)
+
+        self.assertEqual([len(page) for page in pages], [5, 5, 5, 5, 3])
+        self.assertEqual(sum(pages, []), list(queryset.order_by('-date_created', '-pk').values_list('pk', flat=True)))
+
+        backwards, page = [], last
+        while page.has_previous():
+            page = paginator.get_page(page.previous_cursor)
+            backwards.insert(0, [post.pk for post in page])
+        self.assertEqual(backwards, pages[:-1])
+
+    def test_mixed_direction_ordering(self):
+        paginator = CursorPaginator(BlogPost.objects.all(), 4, ordering=['title', '-date_created'])
+        pages, _ = self.walk(paginator)
+        self.assertEqual(sum(pages, []), list(BlogPost.objects.order_by('title', '-date_created', 'pk').values_list('pk', flat=True)))
+
+    def test_deep_pages_cost_the_same(self):
+        url = reverse('category_posts', args=[self.category.name])
+        with CaptureQueriesContext(connection) as first:
+            response = self.client.get(url)
+        for _ in range(2):
+            response = self.client.get(url + '?' + response.context['posts'].next_query)
+        with CaptureQueriesContext(connection) as deep:
+            self.client.get(url + '?' + response.context['posts'].next_query)
+
+        self.assertEqual(len(first), len(deep))
+        for query in first.captured_queries + deep.captured_queries:
+            self.assertNotIn('OFFSET', query['sql'].upper())
+            self.assertNotIn('COUNT(', query['sql'].upper())
+
+    def test_invalid_cursor_gives_first_page_and_links_keep_filters(self):
+        response = self.client.get(reverse('search_posts'), {'q': 'paged', 'cursor': 'not-a-cursor'})
+        posts = response.context['posts']
+        self.assertEqual(len(posts), 10)
+        self.assertFalse(posts.has_previous())
+        self.assertIn('q=paged', posts.next_query)
+        self.assertEqual(response.context['total_results'], 23)
+
+        seen = [post.pk for post in posts]
+        while posts.has_next():
+            posts = self.client.get(reverse('search_posts') + '?' + posts.next_query).context['posts']
+            seen += [post.pk for post in posts]
+        self.assertEqual(sorted(seen), sorted(BlogPost.objects.values_list('pk', flat=True)))
+
+        # A term that is in no document still sorts by relevance without error
+        response = self.client.get(reverse('search_posts'), {'q': 'unindexedword'})
+        self.assertEqual((len(response.context['posts']), response.context['total_results']), (0, 0))
+
+    def test_approximate_count_is_cached(self):
+        paginator = CursorPaginator(BlogPost.objects.filter(status='published'), 5)
+        self.assertEqual(paginator.approximate_count(), 23)
+        BlogPost.objects.create(author=self.author, title='One more post', post='<p>Body</p>', status='published')
+        page = paginator.get_page()
+        with self.assertNumQueries(0):
+            self.assertEqual(page.approximate_count, 23)
+
+
+class CommentTreeTests(BlogTestCase):
+    """The post page loads a whole comment thread in a fixed number of queries"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(email='author@example.com', username='author', password='secret-pass')
+        cls.reader = CustomUser.objects.create_user(email='reader@example.com', username='reader', password='secret-pass')
+        cls.small = BlogPost.objects.create(author=cls.author, title='Quiet post', post='<p>Body</p>', status='published')
+        cls.large = BlogPost.objects.create(author=cls.author, title='Busy post', post='<p>Body</p>', status='published')
+        cls.build_thread(cls.small, roots=1, depth=1)
+        cls.build_thread(cls.large, roots=6, depth=5)
+
+    @classmethod
+    def build_thread(cls, post, roots, depth):
+        for i in range(roots):
+            parent = None
+            for level in range(depth):
+                user = cls.reader if level % 2 else cls.author
+                parent = Comment.objects.create(post=post, author=user, text=f'Comment {i}.{level}', parent=parent)
+                if level % 2 == 0:
+                    CommentLike.objects.create(comment=parent, user=cls.reader)
+
+    def query_count(self, post):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('post_detail', args=[post.pk]))
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_query_count_does_not_depend_on_thread_size(self):
+        self.client.force_login(self.reader)
+        self.query_count(self.small)  # warm per-session queries
+        small, _ = self.query_count(self.small)
+        large, response = self.query_count(self.large)
+        self.assertEqual(small, large)
+        self.assertContains(response, 'Comment 5.4')
+
+    def test_tree_is_built_to_any_depth_with_liked_flags(self):
+        with self.assertNumQueries(2):
+            roots = load_comment_tree(self.large, self.reader)
+
+        self.assertEqual([root.text for root in roots], [f'Comment {i}.0' for i in reversed(range(6))])
+        node, depth = roots[0], 1
+        while node.reply_list:
+            self.assertEqual(len(node.reply_list), 1)
+            self.assertEqual(node.liked, depth % 2 == 1)
+            node, depth = node.reply_list[0], depth + 1
+        self.assertEqual(depth, 5)
+        self.assertEqual(node.author.username, 'author')
+        with self.assertNumQueries(0):
+            self.assertEqual([root.descendant_count() for root in roots], [4] * 6)
+
+    def test_anonymous_viewer_skips_the_likes_query(self):
+        with self.assertNumQueries(1):
+            roots = load_comment_tree(self.small, AnonymousUser())
+        self.assertFalse(roots[0].liked)
+
+
+class CommentThreadStorageTests(BlogTestCase):
+    """Comment threads are stored as materialized paths written with the comment itself"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(email='reader@example.com', username='reader', password='secret-pass')
+        cls.post = BlogPost.objects.create(author=cls.user, title='Threaded post', post='<p>Body</p>', status='published')
+
+    def reply(self, parent, text='Reply'):
+        return Comment.objects.create(post=self.post, author=self.user, text=text, parent=parent)
+
+    def paths(self):
+        return {pk: (parent_id, path) for pk, parent_id, path in Comment.objects.values_list('pk', 'parent', 'path')}
+
+    def test_incremental_paths_match_a_rebuild(self):
+        root = self.reply(None, 'Root')
+        first, second = self.reply(root, 'First'), self.reply(root, 'Second')
+        self.reply(first, 'First.1')
+        self.reply(second, 'Second.1')
+        self.reply(first, 'First.2')
+        other = self.reply(None, 'Other root')
+        self.reply(other)
+
+        stored = self.paths()
+        rebuild_paths()
+        self.assertEqual(self.paths(), stored)
+
+        self.assertEqual(
+            list(root.subtree().values_list('text', flat=True)),
+            ['Root', 'First', 'Second', 'First.1', 'First.2', 'Second.1'],
+        )
+        with self.assertNumQueries(1):
+            self.assertEqual(root.descendant_count(), 5)
+
+    def test_reply_is_a_single_insert(self):
+        parent = self.reply(self.reply(None, 'Root'), 'Busy')
+        for i in range(5):
+            self.reply(parent, f'Sibling {i}')
+        with CaptureQueriesContext(connection) as queries:
+            self.reply(parent)
+        writes = [query['sql'] for query in queries if 'firstblog_comment"' in query['sql'] and not query['sql'].startswith('SELECT')]
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('INSERT'))
+
+    def test_deep_thread_reads_and_deletes_in_constant_queries(self):
+        root = node = self.reply(None, 'Root')
+        for level in range(Comment.MAX_DEPTH + 5):
+            node = self.reply(node, f'Level {level + 1}')
+        # Past the limit replies join their parent's siblings
+        self.assertEqual(node.depth, Comment.MAX_DEPTH)
+        self.assertEqual(Comment.objects.filter(parent__text=f'Level {Comment.MAX_DEPTH - 1}').count(), 6)
+
+        middle = Comment.objects.get(text='Level 50')
+        with self.assertNumQueries(1):
+            self.assertEqual(len(list(middle.subtree())), Comment.MAX_DEPTH + 5 - 49)
+
+        with CaptureQueriesContext(connection) as queries:
+            middle.delete()
+        self.assertLess(len(queries), 20)
+        self.assertEqual(Comment.objects.count(), 50)
+        self.assertEqual(root.descendant_count(), 49)
+
+    def test_delete_leaves_sibling_threads_alone(self):
+        root = self.reply(None, 'Root')
+        first = self.reply(root, 'First')
+        second = self.reply(root, 'Second')
+        self.reply(first, 'First.1')
+        self.reply(second, 'Second.1')
+        self.reply(None, 'Other root')
+
+        first.delete()
+        self.assertEqual(sorted(Comment.objects.values_list('text', flat=True)), ['Other root', 'Root', 'Second', 'Second.1'])
+
+
+class LikeToggleTests(BlogTestCase):
+    """Likes toggle in one transaction and return the new state without re-reading it"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(email='author@example.com', username='author', password='secret-pass')
+        cls.reader = CustomUser.objects.create_user(email='reader@example.com', username='reader', password='secret-pass')
+        cls.post = BlogPost.objects.create(author=cls.author, title='Likeable post', post='<p>Body</p>', status='published')
+        cls.comment = Comment.objects.create(post=cls.post, author=cls.author, text='Likeable comment')
+
+    def test_post_like_round_trip(self):
+        self.client.force_login(self.reader)
+        url = reverse('toggle_post_like', args=[self.post.pk])
+        score = BlogPost.objects.get(pk=self.post.pk).popularity_score
+
+        self.assertEqual(self.client.post(url).json()['likes_count'], 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 1)
+        self.assertGreater(self.post.popularity_score, score)
+
+        data = self.client.post(url).json()
+        self.assertEqual((data['liked'], data['likes_count']), (False, 0))
+        self.assertFalse(PostLike.objects.exists())
+        self.assertEqual(self.client.post(reverse('toggle_post_like', args=[0])).status_code, 404)
+
+    def test_unlike_sends_delete_signals_without_double_counting(self):
+        deleted = []
+
+        def receiver(sender, instance, **kwargs):
+            deleted.append(instance.post_id)
+        post_delete.connect(receiver, sender=PostLike)
+        self.addCleanup(post_delete.disconnect, receiver, sender=PostLike)
+
+        likes.toggle_post_like(self.post.pk, self.reader)
+        self.assertEqual(likes.toggle_post_like(self.post.pk, self.reader), (False, 0))
+        self.assertEqual(deleted, [self.post.pk])
+        self.assertEqual(BlogPost.objects.get(pk=self.post.pk).likes_count, 0)
+        self.assertEqual(UserStats.objects.get(pk=self.author.pk).post_likes, 0)
+
+        # Outside likes.py the receivers keep the counter
+        PostLike.objects.create(post=self.post, user=self.reader)
+        self.assertEqual(BlogPost.objects.get(pk=self.post.pk).likes_count, 1)
+        PostLike.objects.filter(post=self.post).delete()
+        self.assertEqual(BlogPost.objects.get(pk=self.post.pk).likes_count, 0)
+
+    def test_toggle_runs_a_fixed_number_of_queries(self):
+        # Lock the row, look for a like to delete, insert, update the counter and the author's stats
+        # (plus the savepoint pair); unliking deletes the like found instead of inserting
+        with self.assertNumQueries(7):
+            self.assertEqual(likes.toggle_comment_like(self.comment.pk, self.reader), (True, 1))
+        with self.assertNumQueries(7):
+            self.assertEqual(likes.toggle_comment_like(self.comment.pk, self.reader), (False, 0))
+        self.comment.refresh_from_db()
+        self.assertEqual(self.comment.likes_count, 0)
+
+
+class BatchLikeTests(BlogTestCase):
+    """Queued like operations are applied together and answered in one payload"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(email='author@example.com', username='author', password='secret-pass')
+        cls.reader = CustomUser.objects.create_user(email='reader@example.com', username='reader', password='secret-pass')
+        cls.posts = [
+            BlogPost.objects.create(author=cls.author, title=f'Batch post {i}', post='<p>Body</p>', status='published')
+            for i in range(3)
+        ]
+        cls.comment = Comment.objects.create(post=cls.posts[0], author=cls.author, text='Batch comment')
+        PostLike.objects.create(post=cls.posts[2], user=cls.reader)
+        CommentLike.objects.create(comment=cls.comment, user=cls.author)
+
+    def send(self, operations):
+        return self.client.post(reverse('batch_likes'), json.dumps({'operations': operations}), content_type='application/json')
+
+    def test_batch_applies_final_states(self):
+        self.client.force_login(self.reader)
+        a, b, c = (post.pk for post in self.posts)
+        response = self.send([
+            {'type': 'post', 'id': a, 'liked': True},
+            {'type': 'post', 'id': b, 'liked': True},
+            {'type': 'post', 'id': b, 'liked': False},  # clicked twice: nothing to do
+            {'type': 'post', 'id': c, 'liked': False},
+            {'type': 'comment', 'id': self.comment.pk, 'liked': True},
+            {'type': 'post', 'id': 0, 'liked': True},
+        ])
+
+        results = {(r['type'], r['id']): (r['liked'], r['likes_count']) for r in response.json()['results']}
+        self.assertEqual(results, {
+            ('post', a): (True, 1), ('post', b): (False, 0), ('post', c): (False, 0), ('comment', self.comment.pk): (True, 2),
+        })
+        self.assertEqual(set(PostLike.objects.values_list('post_id', flat=True)), {a})
+        self.assertEqual(
+            dict(BlogPost.objects.filter(pk__in=[a, b, c]).values_list('pk', 'likes_count')), {a: 1, b: 0, c: 0},
+        )
+        self.comment.refresh_from_db()
+        self.assertEqual(self.comment.likes_count, 2)
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        self.client.force_login(self.reader)
+        a, b, c = (post.pk for post in self.posts)
+        with CaptureQueriesContext(connection) as few:
+            self.send([{'type': 'post', 'id': a, 'liked': True}, {'type': 'post', 'id': c, 'liked': False}])
+        with CaptureQueriesContext(connection) as more:
+            self.send([{'type': 'post', 'id': pk, 'liked': pk == b} for pk in (a, b, c)])
+        self.assertEqual(len(few), len(more))
+        self.assertEqual(set(PostLike.objects.values_list('post_id', flat=True)), {b})
+
+    def test_rejects_malformed_batches(self):
+        self.client.force_login(self.reader)
+        self.assertEqual(self.client.post(reverse('batch_likes'), 'not json', content_type='application/json').status_code, 400)
+        self.assertEqual(self.send([]).status_code, 400)
+        self.assertEqual(self.send([{'type': 'user', 'id': 1, 'liked': True}]).status_code, 400)
+        self.assertEqual(self.send([{'type': 'post', 'id': self.posts[0].pk, 'liked': 'yes'}]).status_code, 400)
+        self.assertEqual(self.send([{'type': 'post', 'id': self.posts[0].pk, 'liked': True}] * 101).status_code, 400)
+        self.assertFalse(PostLike.objects.filter(post=self.posts[0]).exists())
+
+
+class ConcurrentLikeTests(TransactionTestCase):
+    """Many simultaneous toggles on one post never fail and leave the counter exact"""
+
+    def setUp(self):
+        if connection.vendor == 'sqlite':
+            if connection.is_in_memory_db():
+                self.skipTest('threads cannot write to a shared in-memory SQLite database concurrently')
+            # SQLite has no row locks and ignores FOR UPDATE; take the write lock at BEGIN
+            # instead, in the connections the threads below open
+            patcher = mock.patch.dict(connection.settings_dict.setdefault('OPTIONS', {}), transaction_mode='IMMEDIATE')
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_parallel_toggles(self):
+        author = CustomUser.objects.create_user(email='author@example.com', username='author', password='secret-pass')
+        post = BlogPost.objects.create(author=author, title='Busy post', post='<p>Body</p>', status='published')
+        users = [
+            CustomUser.objects.create_user(email=f'user{i}@example.com', username=f'user{i}', password='secret-pass')
+            for i in range(8)
+        ]
+        errors = []
+
+        def hammer(user, toggles):
+            try:
+                for _ in range(toggles):
+                    likes.toggle_post_like(post.pk, user)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                close_old_connections()
+
+        # Even toggles per user undo themselves; odd ones leave a like behind
+        threads = [threading.Thread(target=hammer, args=(user, 4 + i % 2)) for i, user in enumerate(users * 2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        post.refresh_from_db()
+        self.assertEqual(post.likes_count, PostLike.objects.filter(post=post).count())
+
+
+@override_settings(DATABASE_POOL_SIZE=1)
+class ConnectionPoolTests(TestCase):
+    """Pooled engines hand connections back on close and reuse them on connect"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.addCleanup(reset_pools)
+        self.settings_dict = {**connection.settings_dict, 'NAME': f'{directory}/pool.db', 'CONN_HEALTH_CHECKS': True}
+
+    def open(self):
+        wrapper = PooledSQLiteWrapper(self.settings_dict, alias='pooltest')
+        wrapper.connect()
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def test_connections_are_reused_and_rolled_back(self):
+        first = self.open()
+        raw = first.connection
+        with first.cursor() as cursor:
+            cursor.execute('CREATE TABLE item (name TEXT)')
+        first.set_autocommit(False)
+        with first.cursor() as cursor:
+            cursor.execute("INSERT INTO item VALUES ('uncommitted')")
+        first.close()
+
+        second = self.open()
+        self.assertIs(second.connection, raw)
+        self.assertTrue(second.pool_reused)
+        self.assertTrue(second.get_autocommit())
+        with second.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM item')
+            self.assertEqual(cursor.fetchone(), (0,))
+
+        # The pool is full while ``second`` waits there, so this one is really closed
+        third = self.open()
+        self.assertFalse(third.pool_reused)
+        second.close()
+        third.close()
+        self.assertEqual(PooledSQLiteWrapper._pools[('pooltest', self.settings_dict['NAME'])].qsize(), 1)
+
+    def test_broken_connections_are_discarded(self):
+        first = self.open()
+        raw = first.connection
+        first.close()
+        raw.close()
+
+        second = self.open()
+        self.assertIsNot(second.connection, raw)
+        self.assertFalse(second.pool_reused)
+
+
+SYNC_URLCONF, ASYNC_URLCONF = root_urlconf(views), root_urlconf(async_views)
+
+
+class LoadRunTests(TransactionTestCase):
+    """The load runner drives the real WSGI handler from several threads"""
+
+    def test_workers_and_thread_per_request(self):
+        for schedule in ('workers', 'thread per request'):
+            result = LoadRun(reverse('about'), 6, 3).run(schedule)
+            self.assertEqual((result['requests'], result['statuses']), (6, ['200 OK']))
+            self.assertGreaterEqual(result['p95_ms'], result['p50_ms'])
+
+    def test_asgi_with_async_views(self):
+        with override_settings(ROOT_URLCONF=ASYNC_URLCONF):
+            result = ASGILoadRun(reverse('search_posts') + '?q=post', 6, 3).run()
+        self.assertEqual((result['requests'], result['statuses']), (6, ['200']))
+
+
+@override_settings(ROOT_URLCONF=ASYNC_URLCONF)
+class AsyncViewTests(BlogTestCase):
+    """The async read views render the same pages as the sync ones"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(email='author@example.com', username='author', password='secret-pass')
+        cls.reader = CustomUser.objects.create_user(email='reader@example.com', username='reader', password='secret-pass')
+        cls.category = Category.objects.create(name='Technology')
+        cls.posts = [
+            BlogPost.objects.create(
+                author=cls.author, category=cls.category, title=f'Async post {i}', post='<p>Searchable body</p>', status='published',
+            )
+            for i in range(3)
+        ]
+        comment = Comment.objects.create(post=cls.posts[0], author=cls.reader, text='First!')
+        Comment.objects.create(post=cls.posts[0], author=cls.author, text='Thanks', parent=comment)
+        PostLike.objects.create(post=cls.posts[0], user=cls.reader)
+        cls.draft = BlogPost.objects.create(author=cls.author, title='Draft', post='<p>Body</p>', status='draft')
+
+    def test_pages_are_served_by_async_views(self):
+        self.assertIs(self.client.get(reverse('home')).resolver_match.func.__wrapped__, async_views.home.__wrapped__)
+
+    def test_pages_match_sync_views(self):
+        pages = [
+            (reverse('home'), 'posts'),
+            (reverse('post_detail', args=[self.posts[0].pk]), 'comments'),
+            (reverse('search_posts') + '?q=searchable', 'posts'),
+            (reverse('category_posts', args=['Technology']), 'posts'),
+            (reverse('about'), 'total_comments'),
+        ]
+        self.client.force_login(self.reader)
+        for url, key in pages:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                with override_settings(ROOT_URLCONF=SYNC_URLCONF):
+                    expected = self.client.get(url).context[key]
+                actual = response.context[key]
+                self.assertEqual(actual if isinstance(actual, int) else list(actual), expected if isinstance(expected, int) else list(expected))
+
+    def test_post_detail_context(self):
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse('post_detail', args=[self.posts[0].pk]))
+        self.assertTrue(response.context['liked_by_user'])
+        self.assertEqual([reply.text for reply in response.context['comments'][0].reply_list], ['Thanks'])
+        self.assertEqual(len(response.context['related_posts']), 3)
+
+    def test_search_counts_results(self):
+        response = self.client.get(reverse('search_posts') + '?q=searchable')
+        self.assertEqual(response.context['total_results'], 3)
+        self.assertContains(response, '<mark>', html=False)
+
+    def test_draft_redirects_other_users(self):
+        response = self.client.get(reverse('post_detail', args=[self.draft.pk]))
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+
+    def test_anonymous_pages_are_cached(self):
+        self.client.get(reverse('home'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Async post 2')
+
+        self.client.get(reverse('post_detail', args=[self.posts[1].pk]))
+        with self.assertNumQueries(1):  # only the journaled view
+            self.client.get(reverse('post_detail', args=[self.posts[1].pk]))
+        self.assertEqual(view_buffer.pending(), 2)
+
+
+class ConditionalGetTests(BlogTestCase):
+    """Unchanged pages are revalidated with 304 Not Modified before the view runs"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(email='author@example.com', username='author', password='secret-pass')
+        cls.reader = CustomUser.objects.create_user(email='reader@example.com', username='reader', password='secret-pass')
+        cls.category = Category.objects.create(name='Technology')
+        cls.post = BlogPost.objects.create(
+            author=cls.author, category=cls.category, title='Validated post', post='<p>Body</p>', status='published'
+        )
+
+    def revalidate(self, url, response, **headers):
+        return self.client.get(url, headers={'if-none-match': response['ETag'], **headers})
+
+    def test_anonymous_revalidation_skips_the_view(self):
+        url = reverse('post_detail', args=[self.post.pk])
+        response = self.client.get(url)
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertNotIn('private', response['Cache-Control'])
+
+        with self.assertNumQueries(1):  # only the journaled view
+            not_modified = self.revalidate(url, response)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+        self.assertEqual(view_buffer.pending(), 2)
+
+        not_modified = self.client.get(url, headers={'if-modified-since': response['Last-Modified']})
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_changes_give_a_fresh_page(self):
+        url = reverse('home')
+        response = self.client.get(url)
+        Comment.objects.create(post=self.post, author=self.reader, text='New comment')
+        fresh = self.revalidate(url, response)
+        self.assertEqual(fresh.status_code, 200)
+        self.assertNotEqual(fresh['ETag'], response['ETag'])
+        self.assertContains(fresh, 'New comment')
+
+        self.author.first_name = 'Renamed'
+        self.author.save()
+        self.assertEqual(self.revalidate(url, fresh).status_code, 200)
+
+    def test_authenticated_pages_vary_by_user_and_likes(self):
+        url = reverse('post_detail', args=[self.post.pk])
+        anonymous = self.client.get(url)
+        self.client.force_login(self.reader)
+        response = self.client.get(url)
+        self.assertNotEqual(response['ETag'], anonymous['ETag'])
+        self.assertIn('private', response['Cache-Control'])
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+        likes.toggle_post_like(self.post.pk, self.reader)
+        fresh = self.revalidate(url, response)
+        self.assertEqual(fresh.status_code, 200)
+        self.assertTrue(fresh.context['liked_by_user'])
+
+        self.client.force_login(self.author)
+        self.assertEqual(self.revalidate(url, fresh).status_code, 200)
+
+    def test_author_profile_and_category_pages(self):
+        self.client.force_login(self.author)
+        for url in (reverse('author_profile', args=['author']), reverse('category_posts', args=['Technology'])):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+    def test_flushed_views_give_a_fresh_page(self):
+        self.client.force_login(self.author)
+        pages = {url: self.client.get(url) for url in (
+            reverse('post_detail', args=[self.post.pk]), reverse('author_profile', args=['author']),
+        )}
+        view_buffer.record(self.post.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            view_buffer.flush()
+        for url, response in pages.items():
+            with self.subTest(url=url):
+                self.assertEqual(self.revalidate(url, response).status_code, 200)
+        profile = reverse('author_profile', args=['author'])
+        self.assertEqual(self.revalidate(profile, pages[profile]).context['stats'].views, 2)
+
+    def test_logging_in_does_not_invalidate_pages(self):
+        url = reverse('category_posts', args=['Technology'])
+        response = self.client.get(url)
+        self.client.login(username='reader@example.com', password='secret-pass')
+        self.client.logout()
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+    def test_pending_messages_get_the_full_page(self):
+        url = reverse('home')
+        response = self.client.get(url)
+        self.client.get(reverse('post_detail', args=[BlogPost.objects.create(
+            author=self.author, title='Draft', post='<p>Body</p>', status='draft',
+        ).pk]))
+        self.assertEqual(self.revalidate(url, response).status_code, 200)
+
+    @override_settings(ROOT_URLCONF=ASYNC_URLCONF)
+    def test_async_views(self):
+        url = reverse('post_detail', args=[self.post.pk])
+        response = self.client.get(url)
+        self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+
+class AuthorProfileTests(BlogTestCase):
+    """The profile page reads cached author statistics and builds forms only for its owner"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(email='author@example.com', username='author', password='secret-pass')
+        AuthorProfile.objects.create(user=cls.author, bio='Writes things')
+        cls.reader = CustomUser.objects.create_user(email='reader@example.com', username='reader', password='secret-pass')
+        cls.tech = Category.objects.create(name='Technology')
+        cls.travel = Category.objects.create(name='Travel')
+        cls.posts = [
+            BlogPost.objects.create(author=cls.author, category=category, title=f'Post {i}', post='<p>Body</p>', status=status)
+            for i, (category, status) in enumerate([
+                (cls.tech, 'published'), (cls.tech, 'published'), (cls.travel, 'published'), (cls.travel, 'draft'), (None, 'archived'),
+            ])
+        ]
+        BlogPost.objects.filter(pk=cls.posts[0].pk).update(view_count=7)
+        comment = Comment.objects.create(post=cls.posts[0], author=cls.reader, text='Hi')
+        Comment.objects.create(post=cls.posts[0], author=cls.author, text='Hello', parent=comment)
+        PostLike.objects.create(post=cls.posts[1], user=cls.reader)
+        cls.other = CustomUser.objects.create_user(email='other@example.com', username='other', password='secret-pass')
+        cls.related = BlogPost.objects.create(author=cls.other, category=cls.travel, title='Elsewhere', post='<p>Body</p>', status='published')
+
+    def test_stats(self):
+        with self.assertNumQueries(2):
+            stats = author_stats(self.author)
+        self.assertEqual(
+            (stats.published_posts, stats.visible_posts, stats.comments, stats.likes, stats.views),
+            (3, 4, 2, 1, 7),
+        )
+        self.assertEqual(stats.top_categories, [(self.tech.pk, 'Technology', 2), (self.travel.pk, 'Travel', 1)])
+        self.assertIsNone(stats.suggested_topics)
+
+        with self.assertNumQueries(0):
+            author_stats(self.author)
+        Comment.objects.create(post=self.posts[2], author=self.reader, text='Another')
+        self.assertEqual(author_stats(self.author).comments, 3)
+
+    def test_suggested_topics_for_readers(self):
+        self.assertEqual([category.name for category in author_stats(self.reader).suggested_topics], ['Technology'])
+
+    def test_visitor_page(self):
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse('author_profile', args=['author']))
+        self.assertEqual(response.context['total_posts'], 3)
+        self.assertEqual([post.title for post in response.context['related_posts']], ['Elsewhere'])
+        self.assertIsNone(response.context['user_form'])
+        self.assertIsNone(response.context['password_form'])
+        self.assertNotContains(response, 'form_type')
+
+    def test_owner_page_and_settings(self):
+        self.client.force_login(self.author)
+        url = reverse('author_profile', args=['author'])
+        response = self.client.get(url)
+        self.assertEqual(response.context['total_posts'], 4)
+        self.assertIsNotNone(response.context['author_profile_form'])
+
+        response = self.client.post(url, {
+            'form_type': 'user_settings', 'username': 'author', 'email': 'author@example.com', 'first_name': 'Ada',
+        })
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.first_name, 'Ada')
+
+        response = self.client.post(url, {'form_type': 'change_password', 'old_password': 'wrong'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['password_form'].errors)
+        self.assertFalse(response.context['user_form'].is_bound)
+
+
+class UserStatsTests(BlogTestCase):
+    """Dashboard totals follow like, comment, post and view events and can be reconciled"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = CustomUser.objects.create_user(email='author@example.com', username='author', password='secret-pass')
+        AuthorProfile.objects.create(user=cls.author)
+        cls.reader = CustomUser.objects.create_user(email='reader@example.com', username='reader', password='secret-pass')
+
+    def stats(self, user):
+        return UserStats.objects.values(*user_stats.COUNTERS).get(pk=user.pk)
+
+    def assertStatsAccurate(self):
+        for user in (self.author, self.reader):
+            self.assertEqual(self.stats(user), user_stats.compute_user_stats([user.pk])[user.pk], user.username)
+
+    def test_events_keep_totals_in_step(self):
+        post = BlogPost.objects.create(author=self.author, title='Post', post='<p>Body</p>', status='published')
+        draft = BlogPost.objects.create(author=self.author, title='Draft', post='<p>Body</p>', status='draft')
+        draft.status = 'archived'
+        draft.save()
+        comment = Comment.objects.create(post=post, author=self.reader, text='Hi')
+        reply = Comment.objects.create(post=post, author=self.author, text='Hello', parent=comment)
+        PostLike.objects.create(post=post, user=self.reader)
+        likes.toggle_comment_like(comment.pk, self.author)
+        likes.set_likes(self.reader, [('comment', reply.pk, True)])
+        view_buffer.record(post.pk, self.reader.pk)
+        view_buffer.record(post.pk, self.reader.pk)
+        view_buffer.flush()
+
+        self.assertEqual(self.stats(self.author), {'posts': 1, 'post_likes': 1, 'comments': 1, 'comment_likes': 1, 'posts_viewed': 0})
+        self.assertEqual(self.stats(self.reader), {'posts': 0, 'post_likes': 0, 'comments': 1, 'comment_likes': 1, 'posts_viewed': 1})
+
+        likes.toggle_post_like(post.pk, self.reader)
+        comment.delete()
+        self.assertStatsAccurate()
+        post.delete()
+        self.assertStatsAccurate()
+
+    def test_reassigned_post_moves_between_authors(self):
+        post = BlogPost.objects.create(author=self.author, title='Post', post='<p>Body</p>', status='published')
+        likes.toggle_post_like(post.pk, self.reader)
+        post.refresh_from_db()
+
+        post.author = self.reader
+        post.save()
+        self.assertEqual(self.stats(self.author)['posts'], 0)
+        self.assertEqual(self.stats(self.reader)['post_likes'], 1)
+        self.assertStatsAccurate()
+
+        post.author, post.status = self.author, 'archived'
+        post.save()
+        self.assertStatsAccurate()
+
+    def test_thread_delete_updates_stats_once(self):
+        post = BlogPost.objects.create(author=self.author, title='Post', post='<p>Body</p>', status='published')
+        node = root = Comment.objects.create(post=post, author=self.reader, text='Root')
+        for i in range(20):
+            node = Comment.objects.create(post=post, author=self.reader if i % 2 else self.author, text=f'{i}', parent=node)
+        with CaptureQueriesContext(connection) as queries:
+            root.delete()
+        self.assertEqual(sum('userstats' in query['sql'] for query in queries), 1)
+        self.assertStatsAccurate()
+
+    def test_dashboard_reads_one_stats_row(self):
+        BlogPost.objects.create(author=self.author, title='Post', post='<p>Body</p>', status='published')
+        self.client.force_login(self.author)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('user_dashboard'))
+        self.assertEqual(response.context['total_posts'], 1)
+        self.assertFalse([query['sql'] for query in queries if 'COUNT(' in query['sql']])
+        self.assertEqual(sum('firstblog_userstats' in query['sql'] for query in queries), 1)
+
+    def test_reconcile_fixes_drift_and_missing_rows(self):
+        post = BlogPost.objects.create(author=self.author, title='Post', post='<p>Body</p>', status='published')
+        PostLike.objects.bulk_create([PostLike(post=post, user=self.reader)])  # no signals
+        UserStats.objects.filter(pk=self.reader.pk).delete()
+
+        self.assertEqual(user_stats.reconcile_user_stats(), 2)
+        self.assertStatsAccurate()
+        self.assertEqual(user_stats.reconcile_user_stats(), 0)
+
+        out = StringIO()
+        call_command('reconcile_user_stats', stdout=out)
+        self.assertIn('0 rows created or corrected', out.getvalue())
+
+    def test_stats_for_creates_a_missing_row(self):
+        UserStats.objects.filter(pk=self.reader.pk).delete()
+        Comment.objects.create(post=BlogPost.objects.create(author=self.author, title='Post', post='<p>Body</p>'), author=self.reader, text='Hi')
+        self.assertEqual(user_stats.stats_for(self.reader).comments, 1)
+
+
+class SiteStatsTests(BlogTestCase):
+    """The about page totals follow post and comment events and can be reconciled"""
+
+    @classmethod
+    def setUpTestData(cls):
+        site_stats.reconcile_site_stats()
+        cls.author = CustomUser.objects.create_user(email='author@example.com', username='author', password='secret-pass')
+        cls.other = CustomUser.objects.create_user(email='other@example.com', username='other', password='secret-pass')
+
+    def assertTotalsAccurate(self):
+        self.assertEqual(SiteStats.objects.values(*site_stats.COUNTERS).get(), site_stats.compute_site_stats())
+
+    def create_post(self, author, title='Post'):
+        return BlogPost.objects.create(author=author, title=title, post='<p>Body</p>', status='published')
+
+    def test_events_keep_totals_in_step(self):
+        first = self.create_post(self.author)
+        second = self.create_post(self.author)
+        self.create_post(self.other)
+        comment = Comment.objects.create(post=first, author=self.other, text='Hi')
+        Comment.objects.create(post=first, author=self.author, text='Hello', parent=comment)
+        self.assertEqual(SiteStats.objects.values(*site_stats.COUNTERS).get(), {'posts': 3, 'authors': 2, 'comments': 2})
+
+        second.author = self.other
+        second.save()
+        self.assertTotalsAccurate()
+        first.author = self.other
+        first.save()
+        self.assertTotalsAccurate()
+
+        comment.delete()
+        self.assertTotalsAccurate()
+        first.delete()
+        self.assertTotalsAccurate()
+
+        self.create_post(self.author)
+        BlogPost.objects.filter(author=self.other).delete()
+        self.assertTotalsAccurate()
+        self.author.delete()
+        self.assertTotalsAccurate()
+
+    def test_about_reads_one_stats_row(self):
+        Comment.objects.create(post=self.create_post(self.author), author=self.other, text='Hi')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('about'))
+        self.assertEqual(
+            [response.context[key] for key in ('total_posts', 'total_authors', 'total_comments')], [1, 1, 1],
+        )
+        self.assertEqual([query['sql'] for query in queries if 'COUNT(' in query['sql']], [])
+        self.assertEqual(sum('firstblog_sitestats' in query['sql'] for query in queries), 1)
+
+    def test_reconcile_fixes_drift(self):
+        post = self.create_post(self.author)
+        Comment.objects.bulk_create([Comment(post=post, author=self.other, text='Bulk')])  # no signals
+        self.assertTrue(site_stats.reconcile_site_stats())
+        self.assertTotalsAccurate()
+        self.assertFalse(site_stats.reconcile_site_stats())
+
+        out = StringIO()
+        call_command('reconcile_site_stats', stdout=out)
+        self.assertIn('already accurate', out.getvalue())
+
+    def test_missing_row_falls_back_to_counting(self):
+        SiteStats.objects.all().delete()
+        self.create_post(self.author)
+        self.assertEqual(site_stats.site_totals(), {'total_posts': 1, 'total_authors': 1, 'total_comments': 0})
+
+
+class AdminChangelistTests(BlogTestCase):
+    """Every changelist renders a full page of rows in a fixed number of queries"""
+
+    ROWS = 100
+    MAX_QUERIES = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        n = range(cls.ROWS)
+        cls.admin = CustomUser.objects.create_superuser(email='admin@example.com', username='admin', password='secret-pass')
+        users = CustomUser.objects.bulk_create(CustomUser(email=f'user{i}@example.com', username=f'user{i}') for i in n)
+        categories = Category.objects.bulk_create(Category(name=f'Category {i}') for i in n)
+        posts = BlogPost.objects.bulk_create(
+            BlogPost(author=users[i], category=categories[i], title=f'Post {i}', post='<p>Body</p>') for i in n
+        )
+        roots = Comment.objects.bulk_create(Comment(post=posts[i], author=users[i], text='Root') for i in n[:cls.ROWS // 2])
+        replies = Comment.objects.bulk_create(
+            Comment(post=root.post, author=users[-i - 1], text='Reply', parent=root) for i, root in enumerate(roots)
+        )
+        comments = roots + replies
+        PostLike.objects.bulk_create(PostLike(user=users[i], post=posts[-i - 1]) for i in n)
+        CommentLike.objects.bulk_create(CommentLike(user=users[i], comment=comments[-i - 1]) for i in n)
+        UserPostView.objects.bulk_create(UserPostView(user=users[i], post=posts[i]) for i in n)
+        AuthorProfile.objects.bulk_create(AuthorProfile(user=user) for user in users)
+        AuthorApplication.objects.bulk_create(
+            AuthorApplication(user=users[i], name=f'User {i}', email=f'user{i}@example.com', bio='Bio', sample_work_link='https://example.com') for i in n
+        )
+        OutboundEmail.objects.bulk_create(OutboundEmail(subject=f'Mail {i}', to=[f'user{i}@example.com']) for i in n)
+        Group.objects.bulk_create(Group(name=f'Group {i}') for i in n)
+        app = SocialApp.objects.create(provider='google', name='Google', client_id='id', secret='secret')
+        accounts = SocialAccount.objects.bulk_create(SocialAccount(user=users[i], provider='google', uid=str(i)) for i in n)
+        SocialToken.objects.bulk_create(SocialToken(app=app, account=account, token=f'token{i}') for i, account in enumerate(accounts))
+        EmailAddress.objects.bulk_create(EmailAddress(user=users[i], email=f'user{i}@example.com') for i in n)
+
+    def test_changelists_have_a_query_ceiling(self):
+        self.client.force_login(self.admin)
+        for model in custom_admin_site._registry:
+            meta = model._meta
+            with self.subTest(model=meta.label):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(reverse(f'custom_admin_site:{meta.app_label}_{meta.model_name}_changelist'))
+                self.assertEqual(response.status_code, 200)
+                self.assertGreaterEqual(response.context['cl'].result_count, 1)
+                self.assertLessEqual(len(queries), self.MAX_QUERIES, '\n'.join(query['sql'] for query in queries))
+
+    def test_count_columns_sort_on_stored_counters(self):
+        self.client.force_login(self.admin)
+        changelist = reverse('custom_admin_site:firstblog_blogpost_changelist')
+        admin = custom_admin_site._registry[BlogPost]
+        for column in ('comment_count', 'likes_count', 'view_count'):
+            with self.subTest(column=column):
+                response = self.client.get(changelist, {'o': admin.list_display.index(column) + 1})  # after the action checkbox
+                self.assertEqual(response.status_code, 200)
+                self.assertIn(column, str(response.context['cl'].queryset.query).split('ORDER BY')[1])
@@ -1,45 +1,52 @@
 # urls.py
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
 
-urlpatterns = [
-    # Authentication URLs
-    path('signup/', views.signup, name='signup'),
-    path('login/', views.SignIn, name='login'),
-    path('logout/', views.logout_view, name='logout'),
+
+def build_urlpatterns(read_views=views):
+    """URL patterns with the home, post, search, category and about pages served by ``read_views``"""
+    return [
+        # Authentication URLs
+        path('signup/', views.signup, name='signup'),
+        path('login/', views.SignIn, name='login'),
+        path('logout/', views.logout_view, name='logout'),
     
-    # Home
-    path('', views.home, name='home'),
+        # Home
+        path('', read_views.home, name='home'),
     
-    # Post URLs
-    path('post/<int:pk>/', views.post_detail, name='post_detail'),
-    path('post/create/', views.create_post, name='create_post'),
-    path('post/<int:pk>/update/', views.update_post, name='update_post'),
-    path('post/<int:pk>/delete/', views.delete_post, name='delete_post'),
-    path('post/<int:post_pk>/like/', views.toggle_post_like, name='toggle_post_like'),
+        # Post URLs
+        path('post/<int:pk>/', read_views.post_detail, name='post_detail'),
+        path('post/create/', views.create_post, name='create_post'),
+        path('post/<int:pk>/update/', views.update_post, name='update_post'),
+        path('post/<int:pk>/delete/', views.delete_post, name='delete_post'),
+        path('post/<int:post_pk>/like/', views.toggle_post_like, name='toggle_post_like'),
     
-    # Search & Filter URLs
-    path('search/', views.search_posts, name='search_posts'),
-    path('category/<str:category_name>/', views.category_posts, name='category_posts'),
-    path('author/<path:username>/', views.author_profile, name='author_profile'),
-    path('archived-posts/', views.archived_posts_list, name='archived_posts'),
+        # Search & Filter URLs
+        path('search/', read_views.search_posts, name='search_posts'),
+        path('category/<str:category_name>/', read_views.category_posts, name='category_posts'),
+        path('author/<path:username>/', views.author_profile, name='author_profile'),
+        path('archived-posts/', views.archived_posts_list, name='archived_posts'),
 
-    # Comment URLs
-    path('post/<int:pk>/comment/', views.add_comment_to_post, name='add_comment_to_post'),
-    path('comment/<int:comment_pk>/reply/', views.add_reply_to_comment, name='add_reply_to_comment'),
-    path('comment/<int:comment_pk>/delete/', views.delete_comment, name='delete_comment'),
-    path('comment/<int:comment_pk>/like/', views.toggle_comment_like, name='toggle_comment_like'),
-    
-    # User Dashboard
-    path('dashboard/', views.user_dashboard, name='user_dashboard'),
+        # Comment URLs
+        path('post/<int:pk>/comment/', views.add_comment_to_post, name='add_comment_to_post'),
+        path('comment/<int:comment_pk>/reply/', views.add_reply_to_comment, name='add_reply_to_comment'),
+        path('comment/<int:comment_pk>/delete/', views.delete_comment, name='delete_comment'),
+        path('comment/<int:comment_pk>/like/', views.toggle_comment_like, name='toggle_comment_like'),
+        path('likes/', views.batch_likes, name='batch_likes'),
     
-    # Other Pages
-    path('about/', views.about, name='about'),
-    path('contact/', views.contact, name='contact'),
-    path('apply-to-write/', views.author_application_view, name='author_application'),
+        # User Dashboard
+        path('dashboard/', views.user_dashboard, name='user_dashboard'),
     
-    # Legacy view (optional - for backwards compatibility)
-    path('post/<int:pk>/comments/', views.ViewComment, name='view_comments'),
+        # Other Pages
+        path('about/', read_views.about, name='about'),
+        path('contact/', views.contact, name='contact'),
+        path('apply-to-write/', views.author_application_view, name='author_application'),
     
+        # Legacy view (optional - for backwards compatibility)
+        path('post/<int:pk>/comments/', views.ViewComment, name='view_comments'),
+    ]
+
 
-]
\ No newline at end of file
+# ASYNC_VIEWS (set by blogproject/asgi.py) serves the read pages from async_views.py
+urlpatterns = build_urlpatterns(async_views if getattr(settings, 'ASYNC_VIEWS', False) else views)
@@ -0,0 +1,143 @@
+# user_stats.py
+"""
+Per-user dashboard totals.
+
+``UserStats`` holds one row per user with the counts the dashboard shows,
+so the page reads them with a single primary-key lookup instead of
+counting rows in ``BlogPost``, ``PostLike``, ``Comment``, ``CommentLike``
+and ``UserPostView`` on every load.
+
+The counters move with the events that change them: ``signals.py`` for
+posts, comments and likes saved through the ORM, ``likes.py`` for the
+toggles and batches that skip the signals, and the view counter's flush
+for newly viewed posts (and deleting a post takes it off its viewers'
+totals). Each change is a single ``UPDATE`` on the
+affected user's row (the author is looked up in a subquery where the
+event only knows the post or comment), floored at zero. Bulk deletions
+run inside ``deferred()`` to fold those into one ``UPDATE`` per counter.
+
+Anything that bypasses those paths (bulk loads, cascades without signals,
+manual SQL) can let a row drift, so ``reconcile_user_stats`` recomputes
+rows from the source tables in batches with grouped counts and rewrites
+those that differ. Run ``manage.py reconcile_user_stats`` periodically.
+"""
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from django.apps import apps as global_apps
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Subquery, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import UserStats
+
+COUNTERS = ('posts', 'post_likes', 'comments', 'comment_likes', 'posts_viewed')
+
+_pending = ContextVar('user_stats_pending', default=None)
+
+
+def author_of(model, pk):
+    """Subquery for the author of ``model`` row ``pk``, usable wherever a user id is expected"""
+    return Subquery(model.objects.filter(pk=pk).values('author_id')[:1])
+
+
+@contextmanager
+def deferred():
+    """Collect ``adjust`` calls for known user ids and apply them as one ``UPDATE`` per counter on exit.
+
+    Deleting a long comment thread sends a signal per comment; inside this
+    block they add up instead of updating the same rows one by one.
+    """
+    if _pending.get() is not None:
+        yield
+        return
+    pending = defaultdict(Counter)
+    token = _pending.set(pending)
+    try:
+        yield
+    finally:
+        _pending.reset(token)
+    for field, deltas in pending.items():
+        adjust_many(field, deltas)
+
+
+def adjust(user, field, delta):
+    """Add ``delta`` to ``field`` for ``user`` (an id or an ``author_of`` subquery), never going below zero"""
+    pending = _pending.get()
+    if pending is not None and isinstance(user, int):
+        pending[field][user] += delta
+    elif user is not None and delta:
+        UserStats.objects.filter(pk=user).update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def adjust_many(field, deltas):
+    """Apply ``{user_id: delta}`` to ``field`` in one ``UPDATE`` (or add them to the ``deferred()`` block)"""
+    deltas = {pk: delta for pk, delta in deltas.items() if pk is not None and delta}
+    pending = _pending.get()
+    if pending is not None:
+        pending[field].update(deltas)
+    elif deltas:
+        UserStats.objects.filter(pk__in=deltas).update(**{field: Greatest(F(field) + Case(
+            *[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()],
+            default=Value(0), output_field=IntegerField(),
+        ), 0)})
+
+
+def count_by(queryset, field):
+    return dict(queryset.order_by().values_list(field).annotate(total=Count('pk')))
+
+
+def compute_user_stats(user_ids, apps=global_apps):
+    """``{user_id: {counter: value}}`` for ``user_ids`` from the source tables"""
+    model = partial(apps.get_model, 'firstblog')
+    counts = {
+        'posts': count_by(model('BlogPost').objects.filter(author_id__in=user_ids).exclude(status='archived'), 'author_id'),
+        'post_likes': count_by(model('PostLike').objects.filter(post__author_id__in=user_ids), 'post__author_id'),
+        'comments': count_by(model('Comment').objects.filter(author_id__in=user_ids), 'author_id'),
+        'comment_likes': count_by(model('CommentLike').objects.filter(comment__author_id__in=user_ids), 'comment__author_id'),
+        'posts_viewed': count_by(model('UserPostView').objects.filter(user_id__in=user_ids), 'user_id'),
+    }
+    return {pk: {field: counts[field].get(pk, 0) for field in COUNTERS} for pk in user_ids}
+
+
+def reconcile_user_stats(user_ids=None, batch_size=1000, apps=global_apps):
+    """Recompute stats rows (all users when ``user_ids`` is None); returns how many were created or corrected"""
+    model = partial(apps.get_model, 'firstblog')
+    stats_model = model('UserStats')  # the historical model when called from a migration
+    if user_ids is None:
+        user_ids = model('CustomUser').objects.order_by('pk').values_list('pk', flat=True)
+    user_ids = list(user_ids)
+
+    corrected = 0
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        with transaction.atomic():
+            # Lock the rows so increments made meanwhile land on top of the recomputed values
+            current = {
+                row[0]: dict(zip(COUNTERS, row[1:])) for row in
+                stats_model.objects.select_for_update().filter(pk__in=batch).order_by('pk').values_list('pk', *COUNTERS)
+            }
+            now = timezone.now()
+            changed = [
+                stats_model(user_id=pk, date_reconciled=now, **values)
+                for pk, values in compute_user_stats(batch, apps).items() if current.get(pk) != values
+            ]
+            stats_model.objects.bulk_create(
+                changed, update_conflicts=True, unique_fields=['user'], update_fields=[*COUNTERS, 'date_reconciled'],
+            )
+            stats_model.objects.filter(pk__in=current).exclude(pk__in=[stats.pk for stats in changed]).update(date_reconciled=now)
+        corrected += len(changed)
+    return corrected
+
+
+def stats_for(user):
+    """The stats row for ``user``, computed on the spot if it does not exist yet"""
+    stats = UserStats.objects.filter(pk=user.pk).first()
+    if stats is None:
+        reconcile_user_stats([user.pk])
+        stats = UserStats.objects.get(pk=user.pk)
+    return stats
+
@@ -0,0 +1,171 @@
+# view_counter.py
+"""
+Buffered post view counting.
+
+Every post_detail hit used to run an UPDATE, a get_or_create and a
+refresh_from_db. Views are now appended to a journal table
+(``PendingView``, one INSERT with no index but the primary key, stamped
+with the time of the view) and written to the database in batches: one
+``UPDATE ... CASE`` for the view counts and one
+``bulk_create(ignore_conflicts=True)`` for the unique-viewer rows not
+already stored, dated by the viewer's first journaled view. Their number
+is added to each viewer's dashboard totals (``user_stats.py``).
+
+A request that finds a flush due only asks for one; it runs from the
+``request_finished`` signal (``signals.py``), once the response has been
+sent, in whichever request of the process finishes next. The
+``flush_view_counts`` command flushes on demand. Once a batch commits, the
+``post:{pk}`` groups of its posts and the ``author:{username}`` groups of
+their authors are bumped so pages showing those totals revalidate; the
+flush cadence (``VIEW_COUNT_FLUSH_SIZE`` / ``VIEW_COUNT_FLUSH_INTERVAL``)
+bounds how often that happens.
+
+The journal lives in the database rather than the cache so that no view
+is lost to cache eviction or a worker restart, and every worker shares
+it. A flush claims the oldest rows with ``SELECT ... FOR UPDATE SKIP
+LOCKED`` and deletes them in the same transaction as the write, so each
+view is counted exactly once even when workers flush concurrently, and a
+view whose INSERT has not committed yet is simply left for the next
+flush. The cache only holds when the last flush ran and how far it got,
+to decide when the next one is due; losing those merely flushes early.
+"""
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Value, When
+
+from . import user_stats
+from .caching import invalidate
+from .popularity import refresh_popularity
+
+
+class ViewCountBuffer:
+    key_prefix = 'firstblog:views'
+    batch_size = 1000
+
+    def __init__(self, cache_alias='default'):
+        self.cache_alias = cache_alias
+        self.flush_requested = False
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    @property
+    def flush_size(self):
+        return getattr(settings, 'VIEW_COUNT_FLUSH_SIZE', 100)
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'VIEW_COUNT_FLUSH_INTERVAL', 60)
+
+    def _key(self, *parts):
+        return ':'.join([self.key_prefix, *map(str, parts)])
+
+    def record(self, post_id, user_id=None):
+        """Add one view of ``post_id`` (by ``user_id`` if logged in) to the journal"""
+        from .models import PendingView
+
+        self.cache.add(self._key('last_flush'), time.time(), timeout=None)
+        view = PendingView.objects.create(post_id=post_id, user_id=user_id)
+        if self.flush_due(view.pk):
+            self.flush_requested = True
+
+    def flush_if_requested(self):
+        """Flush when a recorded view found one due; returns how many views were written"""
+        with self._lock:
+            requested, self.flush_requested = self.flush_requested, False
+        return self.flush() if requested else 0
+
+    def pending(self):
+        """Number of journaled views that have not been written yet"""
+        from .models import PendingView
+
+        return PendingView.objects.count()
+
+    def flush_due(self, seq):
+        if seq - self.cache.get(self._key('flushed'), 0) >= self.flush_size:
+            return True
+        last_flush = self.cache.get(self._key('last_flush'))
+        return last_flush is None or time.time() - last_flush >= self.flush_interval
+
+    def flush(self):
+        """Write journaled views to the database, returning how many were written"""
+        self.flush_requested = False
+        written = 0
+        try:
+            while True:
+                batch = self.flush_batch()
+                written += batch
+                if batch < self.batch_size:
+                    break
+        finally:
+            self.cache.set(self._key('last_flush'), time.time(), timeout=None)
+        return written
+
+    def flush_batch(self):
+        """Write and remove the oldest unclaimed journal rows in one transaction"""
+        from .models import PendingView
+
+        with transaction.atomic():
+            rows = list(
+                PendingView.objects.select_for_update(skip_locked=True).order_by('pk')
+                .values_list('pk', 'post_id', 'user_id', 'viewed_at')[:self.batch_size]
+            )
+            if not rows:
+                return 0
+            self.write([row[1:] for row in rows])
+            PendingView.objects.filter(pk__in=[row[0] for row in rows]).delete()
+        self.cache.set(self._key('flushed'), rows[-1][0], timeout=None)
+        return len(rows)
+
+    def write(self, views):
+        """Apply a batch of ``(post_id, user_id, viewed_at)`` views (called inside ``flush_batch``'s transaction)"""
+        from .models import BlogPost, CustomUser, UserPostView
+
+        counts = {}
+        viewers = {}  # (user_id, post_id) -> first view in the batch
+        for post_id, user_id, viewed_at in views:
+            counts[post_id] = counts.get(post_id, 0) + 1
+            if user_id is not None and viewers.get((user_id, post_id), viewed_at) >= viewed_at:
+                viewers[user_id, post_id] = viewed_at
+        if not counts:
+            return
+
+        authors = dict(BlogPost.objects.filter(pk__in=counts).values_list('pk', 'author__username'))
+        existing_posts = set(authors)
+        viewers = {key: viewed_at for key, viewed_at in viewers.items() if key[1] in existing_posts}
+        if viewers:
+            # Journal rows have no foreign key constraints, so skip viewers deleted since
+            existing_users = set(CustomUser.objects.filter(
+                pk__in={user_id for user_id, _ in viewers},
+            ).values_list('pk', flat=True))
+            viewers = {key: viewed_at for key, viewed_at in viewers.items() if key[0] in existing_users}
+        if viewers:
+            for key in UserPostView.objects.filter(
+                user_id__in={user_id for user_id, _ in viewers}, post_id__in={post_id for _, post_id in viewers},
+            ).values_list('user_id', 'post_id'):
+                viewers.pop(key, None)
+        BlogPost.objects.filter(pk__in=existing_posts).update(
+            view_count=F('view_count') + Case(
+                *[When(pk=post_id, then=Value(count)) for post_id, count in counts.items()],
+                default=Value(0),
+                output_field=PositiveIntegerField(),
+            )
+        )
+        UserPostView.objects.bulk_create(
+            [UserPostView(user_id=user_id, post_id=post_id, viewed_at=viewed_at) for (user_id, post_id), viewed_at in viewers.items()],
+            ignore_conflicts=True,
+        )
+        user_stats.adjust_many('posts_viewed', Counter(user_id for user_id, _ in viewers))
+        refresh_popularity(existing_posts)
+        groups = [f'post:{pk}' for pk in existing_posts] + [f'author:{username}' for username in set(authors.values()) if username]
+        transaction.on_commit(lambda: invalidate(*groups))
+
+
+view_buffer = ViewCountBuffer()
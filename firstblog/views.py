@@ -1,14 +1,21 @@
 # views.py
-from django.http import JsonResponse
+import json
+
+from django.http import Http404, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout, get_user
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.db.models import Count, Q
+from django.db.models import prefetch_related_objects
 from django.views.decorators.http import require_POST
-from django.core.paginator import Paginator
 
-from blogproject import settings
+from django.conf import settings
+from . import likes, search, site_stats, user_stats
+from .author_stats import author_stats
+from .caching import cache_public_page, cached_fragment, conditional_page
+from .comments import load_comment_tree
+from .pagination import paginate
+from .view_counter import view_buffer
 from .forms import UserForm, BlogPostForm, ContactForm, UserSettingsForm, ChangePasswordForm, AuthorApplicationForm
 
 from django.contrib.auth import update_session_auth_hash
@@ -42,8 +49,7 @@ def contact(request):
         form = ContactForm()
 
     return render(request, 'main/contact.html', {'form': form})
-from .models import BlogPost, PostLike, CustomUser, UserPostView, Comment, CommentLike, Category
-from django.db.models import F
+from .models import BlogPost, PostLike, CustomUser, UserPostView, Comment, Category
 
 
 # Utility function to check if user is an author
@@ -107,25 +113,18 @@ def logout_view(request):
 
 
 # Home View
+@conditional_page('feed', 'categories', 'recent', 'popular', 'authors')
+@cache_public_page('feed', 'categories', 'recent', 'popular')
 def home(request):
     """Display all blog posts with comments and search functionality"""
-    posts_list = BlogPost.objects.filter(status='published').select_related('author').prefetch_related(
-        'comments__author',
-        'comments__replies__author',
-        'comments__likes',
-    ).order_by('-date_updated', '-date_created')
-
-    # Build a mapping from post pk to whether the current user liked the post
-    liked_by_user = {str(post.pk): post.is_liked_by(request.user) for post in posts_list}
+    posts_list = BlogPost.objects.filter(status='published').select_related('author').defer(*BlogPost.LISTING_DEFERRED).order_by('-date_updated', '-date_created')
     
     # Search functionality
     search_query = request.GET.get('search', '').strip()
     if search_query:
-        posts_list = posts_list.filter(
-            Q(title__icontains=search_query) |
-            Q(post__icontains=search_query) |
-            Q(author__username__icontains=search_query)
-        )
+        posts_list, search_terms = search.search_posts(posts_list, search_query)
+        if search_terms:
+            posts_list = posts_list.order_by('-search_rank', '-date_created')
     
     # Category filter
     category_filter = request.GET.get('category', '').strip()
@@ -133,18 +132,35 @@ def home(request):
         posts_list = posts_list.filter(category__name=category_filter)
     
     # Pagination
-    paginator = Paginator(posts_list, 5)  # 5 posts per page
-    page_number = request.GET.get('page')
-    posts = paginator.get_page(page_number)
+    posts = paginate(request, posts_list, 5)  # 5 posts per page
+
+    # Load comments and replies for the current page only
+    prefetch_related_objects(
+        posts.object_list,
+        'comments__author',
+        'comments__replies__author',
+    )
+
+    # Build a mapping from post pk to whether the current user liked the post
+    liked_post_ids = set()
+    if request.user.is_authenticated:
+        liked_post_ids = set(PostLike.objects.filter(
+            user=request.user, post__in=posts.object_list
+        ).values_list('post_id', flat=True))
+    liked_by_user = {str(post.pk): post.pk in liked_post_ids for post in posts.object_list}
     
     # Get categories
-    categories = Category.objects.all()
+    categories = cached_fragment('sidebar:categories', ['categories'], lambda: list(Category.objects.all()))
     
     # Get recent posts for sidebar
-    recent_posts = BlogPost.objects.filter(status='published').order_by('-date_created')[:5]
+    recent_posts = cached_fragment('sidebar:recent', ['recent'], lambda: list(
+        BlogPost.objects.filter(status='published').only('id', 'title').order_by('-date_created')[:5]
+    ))
 
     # Get popular posts for sidebar
-    popular_posts = BlogPost.objects.filter(status='published').annotate(like_count=Count('post_likes'),popularity_score=F('view_count') + Count('post_likes') * 10).order_by('-popularity_score')[:5]
+    popular_posts = cached_fragment('sidebar:popular', ['popular'], lambda: list(
+        BlogPost.objects.filter(status='published').only('id', 'title').order_by('-popularity_score')[:5]
+    ))
 
     context = {
         'posts': posts,
@@ -158,7 +174,14 @@ def home(request):
     return render(request, 'main/index.html', context)
 
 
+def record_cached_view(request, pk):
+    """Count a view served from the page cache"""
+    view_buffer.record(pk)
+
+
 # Single Post View
+@conditional_page('post:{pk}', 'recent', 'authors', on_hit=record_cached_view)
+@cache_public_page('post:{pk}', on_hit=record_cached_view)
 def post_detail(request, pk):
     """Display a single blog post with all its comments"""
     post = get_object_or_404(BlogPost, pk=pk)
@@ -171,8 +194,8 @@ def post_detail(request, pk):
     # Increment view count and track user view
     post.increment_view_count(request.user)
     
-    # Rest of your existing post_detail view code...
-    comments = post.comments.filter(parent=None).order_by('-date_created')
+    # Whole thread in two queries (see comments.py)
+    comments = load_comment_tree(post, request.user)
     related_posts = BlogPost.objects.filter(
         author=post.author
     ).exclude(pk=post.pk).order_by('-date_created')[:3]
@@ -193,17 +216,14 @@ def search_posts(request):
     search_query = request.GET.get('q', '').strip()
     category_filter = request.GET.get('category', '')
     author_filter = request.GET.get('author', '')
-    sort_by = request.GET.get('sort', '-date_created')
+    sort_by = request.GET.get('sort', 'relevance' if search_query else '-date_created')
     
-    posts_list = BlogPost.objects.filter(status='published').select_related('author').prefetch_related('comments')
+    posts_list = BlogPost.objects.filter(status='published').select_related('author', 'search_document').defer(*BlogPost.LISTING_DEFERRED)
     
-    # Apply search filter
+    # Apply full-text search filter
+    search_terms = []
     if search_query:
-        posts_list = posts_list.filter(
-            Q(title__icontains=search_query) |
-            Q(post__icontains=search_query) |
-            Q(author__username__icontains=search_query)
-        )
+        posts_list, search_terms = search.search_posts(posts_list, search_query)
     
     # Apply category filter
     if category_filter:
@@ -215,15 +235,20 @@ def search_posts(request):
     
     # Apply sorting
     valid_sorts = ['-date_created', 'date_created', '-date_updated', 'title', '-title']
-    if sort_by in valid_sorts:
+    if sort_by == 'relevance' and search_terms:
+        posts_list = posts_list.order_by('-search_rank', '-date_created')
+    elif sort_by in valid_sorts:
         posts_list = posts_list.order_by(sort_by)
     else:
         posts_list = posts_list.order_by('-date_created')
     
     # Pagination
-    paginator = Paginator(posts_list, 10)
-    page_number = request.GET.get('page')
-    posts = paginator.get_page(page_number)
+    posts = paginate(request, posts_list, 10)
+
+    # Highlighted snippets for the current page
+    for post in posts:
+        document = getattr(post, 'search_document', None) if search_terms else None
+        post.search_snippet = search.highlight(document.text, search_terms) if document else ''
     
     # Get all categories and authors for filters
     categories = Category.objects.all()
@@ -237,84 +262,67 @@ def search_posts(request):
         'category_filter': category_filter,
         'author_filter': author_filter,
         'sort_by': sort_by,
-        'total_results': posts_list.count(),
+        'total_results': posts.approximate_count,
     }
     return render(request, 'main/search.html', context)
 
 
 # Author Profile View
 from .forms import UserForm, BlogPostForm, ContactForm, UserSettingsForm, ChangePasswordForm, AuthorApplicationForm, AuthorProfileForm
-from .models import AuthorProfile
 
 # ... existing views ...
 
 @login_required
+@conditional_page('feed', 'categories', 'authors', 'author:{username}')
 def author_profile(request, username):
-    author = get_object_or_404(CustomUser, username=username)
+    author = get_object_or_404(CustomUser.objects.select_related('author_profile'), username=username)
     author_profile_instance = getattr(author, 'author_profile', None)
+    is_owner = request.user == author
+
+    # Settings forms are only shown to the profile owner
+    user_form = password_form = author_profile_form = None
+    if is_owner:
+        form_type = request.POST.get('form_type') if request.method == 'POST' else None
+        user_form = UserSettingsForm(request.POST if form_type == 'user_settings' else None, instance=author)
+        password_form = ChangePasswordForm(author, request.POST if form_type == 'change_password' else None)
+        if author_profile_instance:
+            author_profile_form = AuthorProfileForm(
+                *((request.POST, request.FILES) if form_type == 'author_profile' else ()), instance=author_profile_instance,
+            )
 
-    if request.method == 'POST' and request.user == author:
-        form_type = request.POST.get('form_type')
-        if form_type == 'user_settings':
-            user_form = UserSettingsForm(request.POST, instance=author)
-            password_form = ChangePasswordForm(author)
-            author_profile_form = AuthorProfileForm(instance=author_profile_instance) if author_profile_instance else None
-            if user_form.is_valid():
-                user_form.save()
-                messages.success(request, 'Your profile has been updated successfully!')
-                return redirect('author_profile', username=author.username)
-        elif form_type == 'change_password':
-            user_form = UserSettingsForm(instance=author)
-            password_form = ChangePasswordForm(author, request.POST)
-            author_profile_form = AuthorProfileForm(instance=author_profile_instance) if author_profile_instance else None
-            if password_form.is_valid():
-                user = password_form.save()
-                update_session_auth_hash(request, user)
-                messages.success(request, 'Your password was successfully updated!')
-                return redirect('author_profile', username=author.username)
-        elif form_type == 'author_profile' and author_profile_instance:
-            user_form = UserSettingsForm(instance=author)
-            password_form = ChangePasswordForm(author)
-            author_profile_form = AuthorProfileForm(request.POST, request.FILES, instance=author_profile_instance)
-            if author_profile_form.is_valid():
-                author_profile_form.save()
-                messages.success(request, 'Your author profile has been updated successfully!')
-                return redirect('author_profile', username=author.username)
-        else:
-            # Fallback for GET or invalid form_type
-            user_form = UserSettingsForm(instance=author)
-            password_form = ChangePasswordForm(author)
-            author_profile_form = AuthorProfileForm(instance=author_profile_instance) if author_profile_instance else None
-    else:
-        # GET request
-        user_form = UserSettingsForm(instance=author)
-        password_form = ChangePasswordForm(author)
-        author_profile_form = AuthorProfileForm(instance=author_profile_instance) if author_profile_instance else None
-
-    posts_list = BlogPost.objects.filter(author=author).exclude(status='archived')
-    if request.user != author:
+        if form_type == 'user_settings' and user_form.is_valid():
+            user_form.save()
+            messages.success(request, 'Your profile has been updated successfully!')
+            return redirect('author_profile', username=author.username)
+        if form_type == 'change_password' and password_form.is_valid():
+            user = password_form.save()
+            update_session_auth_hash(request, user)
+            messages.success(request, 'Your password was successfully updated!')
+            return redirect('author_profile', username=author.username)
+        if form_type == 'author_profile' and author_profile_form and author_profile_form.is_valid():
+            author_profile_form.save()
+            messages.success(request, 'Your author profile has been updated successfully!')
+            return redirect('author_profile', username=author.username)
+
+    # Totals, categories and suggested topics: two or three aggregate queries, cached (see author_stats.py)
+    stats = author_stats(author)
+
+    posts_list = BlogPost.objects.filter(author=author).exclude(status='archived').select_related('author').defer(*BlogPost.LISTING_DEFERRED)
+    if not is_owner:
         posts_list = posts_list.filter(status='published')
-    posts_list = posts_list.order_by('-date_created')
-    paginator = Paginator(posts_list, 10)
-    page_number = request.GET.get('page')
-    posts = paginator.get_page(page_number)
-    total_posts = posts_list.count()
-    total_comments = Comment.objects.filter(post__author=author).count()
-    author_categories = Category.objects.filter(posts__author=author).distinct()
-    related_posts = BlogPost.objects.filter(category__in=author_categories).exclude(author=author).distinct().order_by('-date_created')[:5]
-    suggested_topics = None
-    if not author.is_author:
-        liked_posts_categories = Category.objects.filter(posts__post_likes__user=author).distinct()
-        commented_posts_categories = Category.objects.filter(posts__comments__author=author).distinct()
-        suggested_topics = (liked_posts_categories | commented_posts_categories).distinct()
+    posts = paginate(request, posts_list.order_by('-date_created'), 10)
+    related_posts = BlogPost.objects.filter(
+        category_id__in=stats.category_ids, status='published'
+    ).exclude(author=author).select_related('author').defer(*BlogPost.LISTING_DEFERRED).order_by('-date_created')[:5] if stats.categories else []
 
     context = {
         'author': author,
         'posts': posts,
-        'total_posts': total_posts,
-        'total_comments': total_comments,
+        'total_posts': stats.visible_posts if is_owner else stats.published_posts,
+        'total_comments': stats.comments,
+        'stats': stats,
         'related_posts': related_posts,
-        'suggested_topics': suggested_topics,
+        'suggested_topics': stats.suggested_topics,
         'user_form': user_form,
         'password_form': password_form,
         'author_profile_form': author_profile_form,
@@ -323,18 +331,18 @@ def author_profile(request, username):
 
 
 # Category View
+@conditional_page('feed', 'categories', 'authors')
+@cache_public_page('feed', 'categories')
 def category_posts(request, category_name):
     """Display all posts in a specific category"""
     category = get_object_or_404(Category, name=category_name)
     
     posts_list = BlogPost.objects.filter(
         category=category, status='published'
-    ).select_related('author').order_by('-date_created')
+    ).select_related('author').defer(*BlogPost.LISTING_DEFERRED).order_by('-date_created')
     
     # Pagination
-    paginator = Paginator(posts_list, 10)
-    page_number = request.GET.get('page')
-    posts = paginator.get_page(page_number)
+    posts = paginate(request, posts_list, 10)
     
     context = {
         'category': category,
@@ -346,28 +354,17 @@ def category_posts(request, category_name):
 @require_POST
 def toggle_post_like(request, post_pk):
     """Toggle like on a post (AJAX endpoint)"""
-    post = get_object_or_404(BlogPost, pk=post_pk)
-    
     try:
-        # Check if user already liked the comment
-        like = PostLike.objects.get(post=post, user=request.user)
-        like.delete()
-        liked = False
-        message = 'Like removed'
-    except PostLike.DoesNotExist:
-        # Create new like
-        PostLike.objects.create(post=post, user=request.user)
-        liked = True
-        message = 'Post liked'
-    liked_by_user = post.is_liked_by(request.user)
-
+        liked, likes_count = likes.toggle_post_like(post_pk, request.user)
+    except BlogPost.DoesNotExist:
+        raise Http404('No BlogPost matches the given query.')
 
     return JsonResponse({
         'success': True,
         'liked': liked,
-        'likes_count': post.likes_count,
-        'Liked_by_user':liked_by_user,
-        'message': message
+        'likes_count': likes_count,
+        'Liked_by_user': liked,
+        'message': 'Post liked' if liked else 'Like removed'
     })
 # Blog Post Views
 @login_required
@@ -498,6 +495,8 @@ def delete_comment(request, comment_pk):
         comment.delete()
         messages.success(request, 'Comment deleted successfully!')
     else:
+        messages.error(request, 'You do not have permission to delete this comment.')
+    
     next_url = request.POST.get('next', request.META.get('HTTP_REFERER', 'home'))
     return redirect(next_url)
 
@@ -525,25 +524,44 @@ def update_comment(request, comment_pk):
 @require_POST
 def toggle_comment_like(request, comment_pk):
     """Toggle like on a comment (AJAX endpoint)"""
-    comment = get_object_or_404(Comment, pk=comment_pk)
-    
     try:
-        # Check if user already liked the comment
-        like = CommentLike.objects.get(comment=comment, user=request.user)
-        like.delete()
-        liked = False
-        message = 'Like removed'
-    except CommentLike.DoesNotExist:
-        # Create new like
-        CommentLike.objects.create(comment=comment, user=request.user)
-        liked = True
-        message = 'Comment liked'
-    
+        liked, likes_count = likes.toggle_comment_like(comment_pk, request.user)
+    except Comment.DoesNotExist:
+        raise Http404('No Comment matches the given query.')
+
     return JsonResponse({
         'success': True,
         'liked': liked,
-        'likes_count': comment.likes_count,
-        'message': message
+        'likes_count': likes_count,
+        'message': 'Comment liked' if liked else 'Like removed'
+    })
+
+
+@login_required
+@require_POST
+def batch_likes(request):
+    """Apply queued like/unlike operations in one request (AJAX endpoint).
+
+    Expects ``{"operations": [{"type": "post"|"comment", "id": 1, "liked": true}, ...]}``
+    and answers with the resulting state of every item that exists.
+    """
+    try:
+        operations = [
+            (op['type'], int(op['id']), op['liked']) for op in json.loads(request.body)['operations']
+        ]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'success': False, 'error': 'Invalid operations.'}, status=400)
+    if not 0 < len(operations) <= likes.MAX_BATCH or \
+       any(like_type not in likes.LIKE_TYPES or not isinstance(liked, bool) for like_type, _, liked in operations):
+        return JsonResponse({'success': False, 'error': f'Send 1 to {likes.MAX_BATCH} post or comment operations.'}, status=400)
+
+    results = likes.set_likes(request.user, operations)
+    return JsonResponse({
+        'success': True,
+        'results': [
+            {'type': like_type, 'id': pk, 'liked': liked, 'likes_count': likes_count}
+            for like_type, states in results.items() for pk, (liked, likes_count) in states.items()
+        ],
     })
 
 
@@ -552,27 +570,26 @@ def toggle_comment_like(request, comment_pk):
 def user_dashboard(request):
     """Display user's own posts, comments, and viewing statistics"""
     user = request.user
+    # Every total on the page comes from the user's stats row (see user_stats.py)
+    stats = user_stats.stats_for(user)
     
     if user.is_author:
         # Author user data
         user_posts = BlogPost.objects.filter(author=user).exclude(status='archived').order_by('-date_created')
-        total_posts = user_posts.count()
-        total_post_likes = PostLike.objects.filter(post__author=user).count()
+        total_posts = stats.posts
+        total_post_likes = stats.post_likes
         
         # Pagination for posts
-        paginator = Paginator(user_posts, 5)
-        page_number = request.GET.get('page')
-        posts = paginator.get_page(page_number)
+        posts = paginate(request, user_posts, 5)
         
         recently_viewed = None
     else:
         # Regular user data - viewing statistics
-        user_posts = None
         posts = None
         total_post_likes = 0  # Not relevant for regular users
         
         # Total viewed posts
-        total_posts = UserPostView.objects.filter(user=user).count()
+        total_posts = stats.posts_viewed
         
         # Recently viewed posts for display
         recently_viewed = UserPostView.objects.filter(
@@ -581,33 +598,23 @@ def user_dashboard(request):
     
     # Common data for all users
     user_comments = Comment.objects.filter(author=user).select_related('post').order_by('-date_created')[:10]
-    total_comments = Comment.objects.filter(author=user).count()
-    total_comment_likes = CommentLike.objects.filter(comment__author=user).count()
     
     context = {
         'posts': posts,
         'recent_comments': user_comments,
         'recently_viewed': recently_viewed,  # Add this for template
         'total_posts': total_posts,
-        'total_comments': total_comments,
-        'total_comment_likes': total_comment_likes,
+        'total_comments': stats.comments,
+        'total_comment_likes': stats.comment_likes,
         'total_post_likes': total_post_likes,
     }
     
     return render(request, 'main/dashboard.html', context)
 # About Page
+@cache_public_page('totals')
 def about(request):
     """Display about page"""
-    # Get some statistics
-    total_posts = BlogPost.objects.count()
-    total_authors = CustomUser.objects.filter(blogpost__isnull=False).distinct().count()
-    total_comments = Comment.objects.count()
-    
-    context = {
-        'total_posts': total_posts,
-        'total_authors': total_authors,
-        'total_comments': total_comments,
-    }
+    context = cached_fragment('about:totals', ['totals'], site_stats.site_totals)
     return render(request, 'main/about.html', context)
 
 
@@ -616,7 +623,7 @@ def about(request):
 def ViewComment(request, pk):
     """View all comments for a specific post"""
     post = get_object_or_404(BlogPost, pk=pk)
-    comments = post.comments.filter(parent=None).prefetch_related('replies')
+    comments = post.comments.filter(parent=None).select_related('author')
     
     context = {
         'post': post,
@@ -659,11 +666,9 @@ def author_application_view(request):
 @user_passes_test(lambda u: u.is_staff)
 def archived_posts_list(request):
     """Display a list of all archived posts for staff review."""
-    archived_posts = BlogPost.objects.filter(status='archived').order_by('-date_updated')
+    archived_posts = BlogPost.objects.filter(status='archived').select_related('author').defer(*BlogPost.LISTING_DEFERRED).order_by('-date_updated')
     
-    paginator = Paginator(archived_posts, 20)  # 20 posts per page
-    page_number = request.GET.get('page')
-    posts = paginator.get_page(page_number)
+    posts = paginate(request, archived_posts, 20)  # 20 posts per page
     
     context = {
         'posts': posts,